@@ -1,3 +1,4 @@
+import multiprocessing
 import os
 
 from easymtl.config import DEFAULT_MODEL
@@ -12,4 +13,5 @@ def run_app():
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     run_app()
@@ -0,0 +1,74 @@
+import hashlib
+import json
+import os
+import threading
+
+from .utils import get_app_data_dir
+
+JOURNALS_DIR_NAME = "journals"
+_JOURNAL_LOCK = threading.Lock()
+
+
+def get_journals_dir():
+    journals_dir = os.path.join(get_app_data_dir(), JOURNALS_DIR_NAME)
+    os.makedirs(journals_dir, exist_ok=True)
+    return journals_dir
+
+
+def get_journal_identity(epub_path, start_chapter, end_chapter, model_name):
+    return {
+        "book": os.path.abspath(epub_path),
+        "mtime": os.path.getmtime(epub_path),
+        "start_chapter": start_chapter,
+        "end_chapter": end_chapter,
+        "model": model_name,
+    }
+
+
+def get_journal_path(epub_path, start_chapter, end_chapter, model_name):
+    identity = get_journal_identity(epub_path, start_chapter, end_chapter, model_name)
+    identity_key = json.dumps(identity, sort_keys=True).encode("utf-8")
+    journal_name = hashlib.sha256(identity_key).hexdigest()[:32] + ".jsonl"
+    return os.path.join(get_journals_dir(), journal_name)
+
+
+def load_journal(journal_path):
+    translations = {}
+    if not os.path.exists(journal_path):
+        return translations
+
+    with open(journal_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # A crash can leave the last line half-written.
+                continue
+            if "chapter_id" in entry and "key" in entry and "text" in entry:
+                translations[entry["chapter_id"]] = (entry["key"], entry["text"])
+    return translations
+
+
+def create_journal(journal_path, identity):
+    if os.path.exists(journal_path):
+        return
+    with open(journal_path, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"identity": identity}, ensure_ascii=False) + "\n")
+
+
+def append_to_journal(journal_path, translations):
+    # Parallel local sequences finish chapters from several threads.
+    with _JOURNAL_LOCK, open(journal_path, "a", encoding="utf-8") as f:
+        for chapter_id, (content_key, text) in translations.items():
+            entry = {"chapter_id": chapter_id, "key": content_key, "text": text}
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def delete_journal(journal_path):
+    try:
+        os.remove(journal_path)
+        return True
+    except FileNotFoundError:
+        return False
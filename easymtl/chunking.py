@@ -0,0 +1,110 @@
+def _count_chunks(token_counts, capacity, max_chapters):
+    chunk_count, current_tokens, current_chapters = 0, 0, 0
+    for tokens in token_counts:
+        if current_chapters and (
+            current_tokens + tokens > capacity or current_chapters >= max_chapters
+        ):
+            chunk_count += 1
+            current_tokens, current_chapters = 0, 0
+        current_tokens += tokens
+        current_chapters += 1
+    return chunk_count + (1 if current_chapters else 0)
+
+
+def _split_chunks(chapter_data_list, capacity, max_chapters):
+    chunks, current_chunk_data, current_chunk_tokens = [], [], 0
+    for chapter_data in chapter_data_list:
+        if current_chunk_data and (
+            current_chunk_tokens + chapter_data["tokens"] > capacity
+            or len(current_chunk_data) >= max_chapters
+        ):
+            chunks.append(current_chunk_data)
+            current_chunk_data, current_chunk_tokens = [], 0
+        current_chunk_data.append(chapter_data)
+        current_chunk_tokens += chapter_data["tokens"]
+    if current_chunk_data:
+        chunks.append(current_chunk_data)
+    return chunks
+
+
+def count_greedy_chunks(chapter_data_list, safe_token_limit, max_chapters):
+    return _count_chunks(
+        [data["tokens"] for data in chapter_data_list], safe_token_limit, max_chapters
+    )
+
+
+def plan_chunks(chapter_data_list, safe_token_limit, max_chapters):
+    if not chapter_data_list:
+        return []
+
+    # Greedy first-fit already gives the fewest contiguous chunks, so keep
+    # that count and search for the smallest per-chunk load that achieves it.
+    token_counts = [data["tokens"] for data in chapter_data_list]
+    target_count = _count_chunks(token_counts, safe_token_limit, max_chapters)
+    low, high = 1, max(1, safe_token_limit)
+    while low < high:
+        middle = (low + high) // 2
+        if _count_chunks(token_counts, middle, max_chapters) <= target_count:
+            high = middle
+        else:
+            low = middle + 1
+
+    return _split_chunks(chapter_data_list, low, max_chapters)
+
+
+def iter_planned_chunks(
+    chapter_data_iter, safe_token_limit, max_chapters, window_chunks
+):
+    window, window_tokens = [], 0
+    window_chunks = max(2, window_chunks)
+    first_chunk_sent = False
+
+    for chapter_data in chapter_data_iter:
+        # The first first-fit chunk is sent as soon as it is full, so the
+        # first request does not wait for a whole window of analysis. Only
+        # the chunks after it are balanced, which leaves the request count
+        # unchanged.
+        if not first_chunk_sent:
+            if window and (
+                window_tokens + chapter_data["tokens"] > safe_token_limit
+                or len(window) >= max_chapters
+            ):
+                yield window
+                window, window_tokens = [], 0
+                first_chunk_sent = True
+            window.append(chapter_data)
+            window_tokens += chapter_data["tokens"]
+            continue
+
+        window.append(chapter_data)
+        window_tokens += chapter_data["tokens"]
+        if (
+            window_tokens < safe_token_limit * window_chunks
+            and len(window) < max_chapters * window_chunks
+        ):
+            continue
+
+        # The last first-fit chunk may still merge with chapters that have not
+        # been analyzed yet, so it is carried over into the next window. Only
+        # the chapters before it are balanced, which keeps the request count
+        # equal to a first-fit pass over the whole book.
+        greedy_chunks = _split_chunks(window, safe_token_limit, max_chapters)
+        carried_data = greedy_chunks[-1]
+        for chunk_data in plan_chunks(
+            window[: len(window) - len(carried_data)], safe_token_limit, max_chapters
+        ):
+            yield chunk_data
+        window = carried_data
+        window_tokens = sum(data["tokens"] for data in window)
+
+    for chunk_data in plan_chunks(window, safe_token_limit, max_chapters):
+        yield chunk_data
+
+
+def get_plan_stats(chunks, safe_token_limit):
+    request_count = len(chunks)
+    if not request_count or safe_token_limit <= 0:
+        return request_count, 0.0, 0
+    chunk_tokens = [sum(data["tokens"] for data in chunk_data) for chunk_data in chunks]
+    fill_ratio = min(1.0, sum(chunk_tokens) / (request_count * safe_token_limit))
+    return request_count, fill_ratio, max(chunk_tokens)
@@ -1,7 +1,74 @@
 APP_VERSION = "1.0.11"
 GITHUB_REPO = "FlamingWater35/EasyMTL"
 TOKEN_LIMIT_PERCENTAGE = 0.60
+LOCAL_TOKEN_LIMIT_PERCENTAGE = 0.40
+LOCAL_MIN_CONTEXT = 2048
+LOCAL_MAX_CONTEXT = 32768
+LOCAL_CONTEXT_ALIGNMENT = 256
+LOCAL_KV_CACHE_TYPE = None  # "f16", "q8_0" or "q4_0"
+# Chapters decoded at once, each in its own context with a share of the threads.
+LOCAL_PARALLEL_SEQUENCES = 1
+LOCAL_MAX_RESIDENT_MODELS = 2  # Models kept loaded at once, least recently used evicted
+LOCAL_MIN_FREE_MEMORY_BYTES = 2 * 1024 * 1024 * 1024  # RAM left free when loading
+LOCAL_THREADS = None  # Generation threads for all sequences; None = half the cores
+LOCAL_WORKER_PRIORITY = "below_normal"  # "idle", "below_normal" or "normal"
+LOCAL_WORKER_CPU_AFFINITY = None  # CPU indices for the inference worker process
+LOCAL_WORKER_CANCEL_TIMEOUT_SECONDS = 10
+LOCAL_TUNING_CONTEXT = 2048
+LOCAL_TUNING_GENERATION_TOKENS = 32
+LOCAL_BENCHMARK_GENERATION_TOKENS = 128
+LOCAL_STREAM_PROGRESS_INTERVAL = 0.5  # Seconds between live generation updates
+LOCAL_BATCH_MAX_CHAPTERS = 8  # Short chapters packed into one local request; 1 disables
+LOCAL_BATCH_MAX_CHAPTER_TOKENS = 1024  # Only chapters up to this size are packed
+LOCAL_CONSTRAIN_OUTPUT = True  # Grammar-constrain titles and image placeholders
+LOCAL_MAX_OUTPUT_RATIO = 3.0  # Output cap as a multiple of the source tokens
+LOCAL_MIN_OUTPUT_CAP_TOKENS = 256
+# A tail of this many characters made of one repeated block is a loop.
+LOCAL_WATCHDOG_LOOP_CHARS = 200
+LOCAL_WATCHDOG_MAX_PERIOD_CHARS = 300
+LOCAL_WATCHDOG_MIN_REPEATS = 3
+LOCAL_WATCHDOG_STALL_TOKENS = 64  # Tokens in a row without visible text
+LOCAL_WATCHDOG_RETRIES = 1
+LOCAL_SPECULATIVE_MODE = None  # None, "prompt_lookup" or "draft_model"
+LOCAL_PROMPT_LOOKUP_TOKENS = 10
+LOCAL_PROMPT_LOOKUP_NGRAM_SIZE = 3
+LOCAL_DRAFT_TOKENS = 6
+# Draft model for each main model. Both must share a tokenizer, so Gemma 2
+# models cannot draft for Gemma 3 ones.
+LOCAL_DRAFT_MODELS = {"gemma-3-12b-it-Q4_K_M.gguf": "gemma-3-4b-it-Q4_K_M.gguf"}
+LOCAL_SPECULATIVE_MAX_MEMORY_FRACTION = 0.5  # Of free RAM, for drafting logits
+LOCAL_SPECULATIVE_BENCHMARK_CONTEXT = 4096
+LOCAL_SPECULATIVE_BENCHMARK_TOKENS = 256
+# English output tokens expected per source token, by source language.
+LOCAL_OUTPUT_RESERVE_RATIOS = {"zh": 1.5, "ja": 1.3, "ko": 1.2, "default": 1.3}
 MAX_CHAPTERS_PER_CHUNK = 20
+CHUNK_PLANNER_WINDOW_CHUNKS = 8
+MAX_CACHED_BOOKS = 2
+PREPROCESS_PARALLEL_MIN_CHAPTERS = 50
+PREPROCESS_MAX_WORKERS = None
+CLOUD_MAX_CONCURRENT_REQUESTS = 4
+# OpenAI-compatible server (llama-server, vLLM, Ollama). OPENAI_BASE_URL
+# overrides the URL, and OPENAI_API_KEY is sent when set.
+OPENAI_COMPAT_BASE_URL = None  # e.g. "http://127.0.0.1:8080/v1"
+OPENAI_COMPAT_MODEL_PREFIX = "openai:"
+OPENAI_COMPAT_MAX_CONCURRENT_REQUESTS = 8
+OPENAI_COMPAT_OUTPUT_TOKEN_LIMIT = 8192
+OPENAI_COMPAT_TIMEOUT_SECONDS = 600
+MODEL_RATE_LIMITS = {
+    "gemini-2.5-pro": {"rpm": 5, "tpm": 250000},
+    "gemini-2.5-flash": {"rpm": 10, "tpm": 250000},
+    "gemini-2.5-flash-lite": {"rpm": 15, "tpm": 250000},
+    "gemma-3": {"rpm": 30, "tpm": 15000},
+    "openai:": {"rpm": 600, "tpm": 10000000},  # Self-hosted, no quota
+}
+DEFAULT_RATE_LIMIT = {"rpm": 10, "tpm": 250000}
+RATE_LIMIT_BURST_FRACTION = 0.2
+RATE_LIMIT_AIMD_INCREASE_STEP = 0.05
+RATE_LIMIT_AIMD_DECREASE_FACTOR = 0.5
+RATE_LIMIT_MIN_SCALE = 0.1
+RATE_LIMIT_DEFAULT_BACKOFF_SECONDS = 30
+PROMPT_VERSION = 2
+TRANSLATION_CACHE_MAX_BYTES = 512 * 1024 * 1024
 DEFAULT_MODEL = "models/gemini-2.5-flash"
 AVAILABLE_GEMMA_MODELS = {
     "Gemma 2 - 2B (bartowski)": {
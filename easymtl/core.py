@@ -1,7 +1,10 @@
 import os
+import queue
 import re
 import threading
 import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from bs4 import BeautifulSoup
 from ebooklib import epub, ITEM_DOCUMENT
 import dearpygui.dearpygui as dpg
@@ -9,11 +12,18 @@ import dearpygui.dearpygui as dpg
 from .config import (
     AVAILABLE_GEMMA_MODELS,
     TOKEN_LIMIT_PERCENTAGE,
+    LOCAL_TOKEN_LIMIT_PERCENTAGE,
+    LOCAL_BATCH_MAX_CHAPTERS,
     MAX_CHAPTERS_PER_CHUNK,
+    CHUNK_PLANNER_WINDOW_CHUNKS,
+    CLOUD_MAX_CONCURRENT_REQUESTS,
+    OPENAI_COMPAT_MAX_CONCURRENT_REQUESTS,
+    OPENAI_COMPAT_OUTPUT_TOKEN_LIMIT,
     DEFAULT_MODEL,
 )
 from .utils import (
     delete_local_model,
+    download_model_from_hub,
     format_time,
     get_reverse_model_map,
     log_message,
@@ -22,22 +32,82 @@ from .utils import (
 )
 from .epub_handler import (
     create_cover_page_from_metadata,
-    extract_content_from_chapters,
     create_translated_epub,
+    load_epub,
+)
+from .chunking import (
+    count_greedy_chunks,
+    get_plan_stats,
+    iter_planned_chunks,
+)
+from .preprocessing import (
+    get_preprocess_worker_count,
+    iter_preprocessed_chapters,
+    preprocess_chapter,
+    split_chapter_record,
 )
 from .translator import (
-    estimate_tokens_fast,
     get_model_output_limit,
     list_models,
     translate_text_with_gemini,
     parse_translated_text,
 )
-from .local_translator import (
-    download_model_from_hub,
+from .checkpoint import (
+    append_to_journal,
+    create_journal,
+    delete_journal,
+    get_journal_identity,
+    get_journal_path,
+    load_journal,
+)
+from .model_registry import forget_model_info
+from .openai_translator import (
+    get_base_url,
+    is_server_model,
+    list_server_models,
+    translate_text_with_server,
+)
+from .prompt_cache import delete_prefix_state
+from .rate_limiter import get_rate_limiter
+from .translation_cache import (
+    get_cache_stats,
+    get_cached_translation,
+    get_chapter_text,
+    make_cache_key,
+    reset_cache_stats,
+    store_translation,
+)
+from .local_batching import (
+    is_batch_candidate,
+    join_batch_content,
+    plan_local_units,
+    split_batch_output,
+)
+from .local_budget import (
+    estimate_translation_seconds,
+    get_local_sequence_count,
+    get_output_reserve_ratio,
+)
+from .local_worker import (
+    benchmark_local_models,
+    benchmark_speculative_decoding,
+    cancel_local_generation,
+    clear_local_cancel,
+    count_local_tokens,
+    count_local_tokens_many,
+    get_local_input_budget,
+    get_resident_models,
+    load_model_benchmark,
+    prepare_local_model,
+    release_local_model,
     translate_text_with_local_model,
+    tune_local_model,
 )
 
 _TRANSLATION_STOP_EVENT = threading.Event()
+_PENDING_TRANSLATION_ARGS = None
+_LOCAL_STREAM_STATUS = {}
+_LOCAL_STREAM_STATUS_LOCK = threading.Lock()
 
 
 def is_local_model(model_name):
@@ -72,274 +142,973 @@ def _update_elapsed_time_continuously(start_time, stop_event):
         time.sleep(1)
 
 
-def _process_with_local_model(
-    chapters_to_translate, start_time, log_message, stop_event
+def _update_progress(
+    chapters_processed, total_chapters_to_process, start_time, chapters_analyzed=None
 ):
-    total_chapters_to_process = len(chapters_to_translate)
-    chapters_processed = 0
-    translation_map, all_extraction_data = {}, []
+    if not dpg.is_dearpygui_running():
+        return
 
-    log_message("Pre-processing all chapters for local translation...")
-    chapter_data_list = []
-    for item in chapters_to_translate:
-        item_content, item_extraction_data = extract_content_from_chapters(
-            [item], log_message, verbose=False
+    progress = (
+        chapters_processed / total_chapters_to_process
+        if total_chapters_to_process > 0
+        else 0
+    )
+    percent = int(progress * 100)
+    overlay_text = f"{chapters_processed}/{total_chapters_to_process} ({percent}%)"
+    if chapters_analyzed is not None and chapters_analyzed < total_chapters_to_process:
+        overlay_text += f" - Analyzed {chapters_analyzed}/{total_chapters_to_process}"
+    dpg.set_value("progress_bar", progress)
+    dpg.configure_item("progress_bar", overlay=overlay_text)
+    if chapters_processed > 0 and progress < 1.0:
+        elapsed_seconds = time.time() - start_time
+        time_per_chapter = elapsed_seconds / chapters_processed
+        remaining_chapters = total_chapters_to_process - chapters_processed
+        eta_seconds = time_per_chapter * remaining_chapters
+        dpg.set_value("eta_time_text", f"ETA: {format_time(eta_seconds)}")
+
+
+def _get_resumed_translation(chapter_data, model_name, resumed_map):
+    # Part boundaries depend on the token budget, so a saved entry only
+    # counts when it was translated from exactly the same text.
+    saved_entry = resumed_map.get(chapter_data["chapter_id"])
+    if saved_entry and saved_entry[0] == make_cache_key(
+        get_chapter_text(chapter_data["content"]), model_name
+    ):
+        return saved_entry[1]
+    return None
+
+
+def _find_saved_translation(chapter_data, model_name, resumed_map):
+    resumed_text = _get_resumed_translation(chapter_data, model_name, resumed_map)
+    if resumed_text:
+        return resumed_text
+    if chapter_data["content"].strip():
+        return get_cached_translation(
+            get_chapter_text(chapter_data["content"]), model_name
         )
-        chapter_data_list.append(
-            {
-                "item": item,
-                "content": item_content,
-                "extraction_data": item_extraction_data[0],
-            }
+    return None
+
+
+def _log_saved_translation_stats(resumed_count, log_message):
+    if resumed_count:
+        log_message(
+            f"Resumed {resumed_count} chapters from the checkpoint journal.",
+            level="SUCCESS",
         )
-    log_message("Pre-processing complete.", level="SUCCESS")
+    stats = get_cache_stats()
+    log_message(
+        f"Translation cache: {stats['hits']} hits, {stats['misses']} misses.",
+        level="SUCCESS" if stats["hits"] else "INFO",
+    )
 
-    for i, chapter_data in enumerate(chapter_data_list):
-        if stop_event.is_set():
-            log_message("Translation stopped by user.", level="WARNING")
-            break
 
-        log_message(f"--- Processing Chapter {i + 1}/{total_chapters_to_process} ---")
-        response = translate_text_with_local_model(chapter_data["content"], log_message)
+def _apply_cached_translations(chapter_data_list, model_name, resumed_map, log_message):
+    reset_cache_stats()
+    cached_map, remaining_data = {}, []
+    resumed_count = 0
+    for chapter_data in chapter_data_list:
+        if _get_resumed_translation(chapter_data, model_name, resumed_map):
+            resumed_count += 1
+        cached_text = _find_saved_translation(chapter_data, model_name, resumed_map)
+        if cached_text:
+            cached_map[chapter_data["chapter_id"]] = cached_text
+        else:
+            remaining_data.append(chapter_data)
+
+    _log_saved_translation_stats(resumed_count, log_message)
+    return cached_map, remaining_data
 
-        if response["status"] == "SUCCESS" and response["text"]:
-            translated_text = response["text"].strip()
-            if translated_text:
-                chapter_id = chapter_data["item"].get_name()
-                translation_map[chapter_id] = translated_text
-                all_extraction_data.append(chapter_data["extraction_data"])
-            else:
+
+def _register_chapter_parts(chapter_id, part_ids, part_ids_by_chapter, part_parents):
+    part_ids_by_chapter[chapter_id] = part_ids
+    for part_id in part_ids:
+        part_parents[part_id] = chapter_id
+
+
+def _complete_units(unit_ids, part_ids_by_chapter, part_parents):
+    # Split chapters count as processed once their last part is done.
+    completed_chapters = 0
+    for unit_id in unit_ids:
+        chapter_id = part_parents.pop(unit_id, None)
+        if chapter_id is None:
+            completed_chapters += 1
+        elif not any(
+            part_id in part_parents for part_id in part_ids_by_chapter[chapter_id]
+        ):
+            completed_chapters += 1
+    return completed_chapters
+
+
+def _assemble_translations(
+    chapter_data_list, translation_map, part_ids_by_chapter, log_message
+):
+    ordered_translation_map, all_extraction_data = {}, []
+    for data in chapter_data_list:
+        chapter_id = data["chapter_id"]
+        part_ids = part_ids_by_chapter.get(chapter_id)
+        if part_ids:
+            missing_parts = [
+                part_id for part_id in part_ids if part_id not in translation_map
+            ]
+            if missing_parts:
                 log_message(
-                    f"Local model returned an empty string for chapter {i+1}. Skipping.",
+                    f"Chapter {chapter_id} is missing {len(missing_parts)} of {len(part_ids)} "
+                    "translated parts. Keeping the original.",
                     level="WARNING",
                 )
-        else:
-            log_message(
-                f"Translation failed for chapter {i+1}. Skipping.", level="ERROR"
+                continue
+            translation_map[chapter_id] = "\n".join(
+                translation_map[part_id].strip() for part_id in part_ids
             )
 
-        chapters_processed += 1
+        if chapter_id in translation_map:
+            ordered_translation_map[chapter_id] = translation_map[chapter_id]
+            all_extraction_data.append(data["extraction_data"])
+    return ordered_translation_map, all_extraction_data
 
-        if dpg.is_dearpygui_running():
-            progress = (
-                chapters_processed / total_chapters_to_process
-                if total_chapters_to_process > 0
-                else 0
-            )
-            percent = int(progress * 100)
-            overlay_text = (
-                f"{chapters_processed}/{total_chapters_to_process} ({percent}%)"
+
+def _record_chunk_translations(
+    chunk_data, chunk_translation_map, model_name, journal_path, log_message
+):
+    completed_map = {}
+    for data in chunk_data:
+        chapter_id = data["chapter_id"]
+        if chapter_id in chunk_translation_map:
+            chapter_text = get_chapter_text(data["content"])
+            completed_map[chapter_id] = (
+                make_cache_key(chapter_text, model_name),
+                chunk_translation_map[chapter_id],
             )
-            dpg.set_value("progress_bar", progress)
+            if data["content"].strip():
+                store_translation(
+                    chapter_text,
+                    model_name,
+                    chunk_translation_map[chapter_id],
+                    log_message,
+                )
+
+    if completed_map:
+        try:
+            append_to_journal(journal_path, completed_map)
+        except OSError as e:
+            log_message(f"Could not write checkpoint journal: {e}", level="WARNING")
+
+
+def _preprocess_chapters(chapters_to_translate, log_message, stop_event):
+    total_chapters = len(chapters_to_translate)
+    worker_count = get_preprocess_worker_count(total_chapters)
+    if worker_count > 1:
+        log_message(f"Analyzing chapters with {worker_count} worker processes...")
+
+    chapter_data_list = []
+    for i, chapter_data in enumerate(
+        iter_preprocessed_chapters(chapters_to_translate, stop_event)
+    ):
+        chapter_data_list.append(chapter_data)
+        if dpg.is_dearpygui_running():
+            overlay_text = f"Analyzed {i + 1}/{total_chapters}..."
             dpg.configure_item("progress_bar", overlay=overlay_text)
-            if chapters_processed > 0 and progress < 1.0:
-                elapsed_seconds = time.time() - start_time
-                time_per_chapter = elapsed_seconds / chapters_processed
-                remaining_chapters = total_chapters_to_process - chapters_processed
-                eta_seconds = time_per_chapter * remaining_chapters
-                dpg.set_value("eta_time_text", f"ETA: {format_time(eta_seconds)}")
 
-    return translation_map, all_extraction_data, chapters_processed
+    if stop_event.is_set():
+        log_message("Translation stopped by user.", level="WARNING")
+        return None
+    return chapter_data_list
 
 
-def _process_with_cloud_model(
-    chapters_to_translate, start_time, log_message, stop_event
+def _show_local_stream_status(chapter_number, status_text):
+    with _LOCAL_STREAM_STATUS_LOCK:
+        if status_text is None:
+            _LOCAL_STREAM_STATUS.pop(chapter_number, None)
+        else:
+            _LOCAL_STREAM_STATUS[chapter_number] = status_text
+        lines = [_LOCAL_STREAM_STATUS[key] for key in sorted(_LOCAL_STREAM_STATUS)]
+    if dpg.is_dearpygui_running():
+        dpg.set_value("chapter_progress_text", "\n".join(lines))
+
+
+def _make_local_progress_callback(chapter_number):
+    def report_progress(
+        generated_tokens, expected_tokens, tokens_per_second, remaining_seconds
+    ):
+        _show_local_stream_status(
+            chapter_number,
+            f"Chapter {chapter_number}: {generated_tokens}/~{expected_tokens} tokens, "
+            f"{tokens_per_second:.1f} tokens/s, about {format_time(remaining_seconds)} left",
+        )
+
+    return report_progress
+
+
+def _translate_local_unit(
+    unit_data, chapter_number, model_name, journal_path, log_message, token_stats
 ):
-    total_chapters_to_process = len(chapters_to_translate)
-    max_output_tokens = get_model_output_limit(log_message)
-    safe_token_limit = int(max_output_tokens * TOKEN_LIMIT_PERCENTAGE)
+    response = translate_text_with_local_model(
+        unit_data["content"],
+        log_message,
+        _make_local_progress_callback(chapter_number),
+    )
+    _show_local_stream_status(chapter_number, None)
+    with token_stats["lock"]:
+        token_stats["generated"] += response.get("tokens", 0)
+
+    if response["status"] == "SUCCESS" and response["text"]:
+        translated_text = response["text"].strip()
+        if translated_text:
+            _record_chunk_translations(
+                [unit_data],
+                {unit_data["chapter_id"]: translated_text},
+                model_name,
+                journal_path,
+                log_message,
+            )
+            return response["status"], translated_text
+        log_message(
+            f"Local model returned an empty string for chapter {chapter_number}. Skipping.",
+            level="WARNING",
+        )
+    elif response["status"] == "CANCELLED":
+        if response["text"]:
+            log_message(
+                f"Stopped chapter {chapter_number} mid-generation. Its partial translation "
+                "is discarded; finished chapters are kept for resuming.",
+                level="WARNING",
+            )
+    elif response["status"] not in ("TOKEN_LIMIT_EXCEEDED", "OUTPUT_TRUNCATED"):
+        log_message(
+            f"Translation failed for chapter {chapter_number}. Skipping.",
+            level="ERROR",
+        )
+    return response["status"], None
 
-    log_message(f"Using a safe input token limit of {safe_token_limit} per chunk.")
 
-    log_message("Pre-processing chapters to estimate token usage...")
-    chapter_data_list = []
+def _count_worker_tokens(texts):
+    token_counts = count_local_tokens_many(texts)
+    if token_counts is None:
+        raise ChildProcessError("The local inference worker is not available.")
+    return token_counts
 
-    for i, item in enumerate(chapters_to_translate):
-        if stop_event.is_set():
-            log_message("Translation stopped by user.", level="WARNING")
-            return {}, [], 0
 
-        item_content, item_extraction_data = extract_content_from_chapters(
-            [item], log_message, verbose=False
+def _split_local_record(record, token_limit):
+    # The worker can exit between two token counts, for example when a Stop
+    # terminates it, which leaves nothing to measure the parts against.
+    try:
+        return split_chapter_record(
+            record, token_limit, count_tokens=_count_worker_tokens
         )
+    except ChildProcessError:
+        return None
 
-        estimated_count = estimate_tokens_fast(item_content)
 
-        if not item_content.strip() and estimated_count == 0:
-            estimated_count = 0
-        else:
-            estimated_count = max(1, estimated_count)
+def _translate_local_parts(
+    parts,
+    chapter_number,
+    model_name,
+    journal_path,
+    resumed_map,
+    log_message,
+    stop_event,
+    token_stats,
+):
+    pending_parts = deque(parts)
+    part_translations = []
+    while pending_parts:
+        if stop_event.is_set():
+            return None
 
-        chapter_data_list.append(
-            {
-                "item": item,
-                "content": item_content,
-                "tokens": estimated_count,
-                "extraction_data": item_extraction_data[0],
-            }
+        part_data = pending_parts.popleft()
+        translated_text = None
+        if part_data.get("parent_id"):
+            translated_text = _find_saved_translation(
+                part_data, model_name, resumed_map
+            )
+        if translated_text:
+            part_translations.append(translated_text)
+            continue
+
+        status, translated_text = _translate_local_unit(
+            part_data,
+            chapter_number,
+            model_name,
+            journal_path,
+            log_message,
+            token_stats,
         )
+        if translated_text:
+            part_translations.append(translated_text)
+            continue
+
+        # Text that does not fit the context is split in half and retried
+        # instead of letting llama.cpp overflow the context.
+        if status in ("TOKEN_LIMIT_EXCEEDED", "OUTPUT_TRUNCATED"):
+            part_tokens = count_local_tokens(part_data["content"])
+            smaller_parts = None
+            if part_tokens is not None:
+                smaller_parts = _split_local_record(part_data, max(1, part_tokens // 2))
+            if smaller_parts is None:
+                if not stop_event.is_set():
+                    log_message(
+                        f"Could not split chapter {chapter_number} because the local worker is not available. Skipping.",
+                        level="ERROR",
+                    )
+                return None
+            if len(smaller_parts) > 1:
+                log_message(
+                    f"Splitting part of chapter {chapter_number} into {len(smaller_parts)} smaller requests.",
+                    level="WARNING",
+                )
+                pending_parts.extendleft(reversed(smaller_parts))
+                continue
+            log_message(
+                f"Chapter {chapter_number} contains text that cannot be split to fit the context. Skipping.",
+                level="ERROR",
+            )
+        return None
+    return part_translations
 
-        if dpg.is_dearpygui_running():
-            overlay_text = f"Analyzed {i + 1}/{total_chapters_to_process}..."
-            dpg.configure_item("progress_bar", overlay=overlay_text)
 
-    log_message("Pre-processing complete (Local estimation used).", level="SUCCESS")
+def _translate_local_chapter(
+    chapter_data,
+    chapter_number,
+    model_name,
+    journal_path,
+    resumed_map,
+    log_message,
+    stop_event,
+    token_stats,
+):
+    parts = [chapter_data]
+    local_token_limit = get_local_input_budget(chapter_data["content"])
+    if local_token_limit:
+        parts = _split_local_record(chapter_data, local_token_limit)
+        if parts is None:
+            if not stop_event.is_set():
+                log_message(
+                    f"Could not measure chapter {chapter_number} because the local worker is not available. Skipping.",
+                    level="ERROR",
+                )
+            return None
+    if len(parts) > 1:
+        log_message(
+            f"Chapter {chapter_number} does not fit the local context with room for the translation. "
+            f"Translating it in {len(parts)} parts of up to {local_token_limit} tokens."
+        )
 
-    log_message(f"Building dynamic chunks with a token limit of {safe_token_limit}...")
-    chunks = []
-    current_chunk_data, current_chunk_tokens = [], 0
-    for chapter_data in chapter_data_list:
-        if current_chunk_data and (
-            current_chunk_tokens + chapter_data["tokens"] > safe_token_limit
-            or len(current_chunk_data) >= MAX_CHAPTERS_PER_CHUNK
-        ):
-            chunks.append(current_chunk_data)
-            current_chunk_data, current_chunk_tokens = [], 0
-        current_chunk_data.append(chapter_data)
-        current_chunk_tokens += chapter_data["tokens"]
-    if current_chunk_data:
-        chunks.append(current_chunk_data)
+    part_translations = _translate_local_parts(
+        parts,
+        chapter_number,
+        model_name,
+        journal_path,
+        resumed_map,
+        log_message,
+        stop_event,
+        token_stats,
+    )
+    if part_translations:
+        return "\n".join(text.strip() for text in part_translations)
+    if len(parts) > 1 and not stop_event.is_set():
+        log_message(
+            f"Not every part of chapter {chapter_number} was translated. Keeping the original.",
+            level="WARNING",
+        )
+    return None
 
-    log_message(f"Created {len(chunks)} chunks for processing.", level="SUCCESS")
 
-    translation_map, all_extraction_data = {}, []
-    chapters_processed = 0
+def _translate_local_batch(
+    batch_data,
+    chapter_numbers,
+    model_name,
+    journal_path,
+    resumed_map,
+    log_message,
+    stop_event,
+    token_stats,
+):
+    first_number, last_number = chapter_numbers[0], chapter_numbers[-1]
+    chapter_ids = [data["chapter_id"] for data in batch_data]
+    response = translate_text_with_local_model(
+        join_batch_content(batch_data),
+        log_message,
+        _make_local_progress_callback(first_number),
+    )
+    _show_local_stream_status(first_number, None)
+    with token_stats["lock"]:
+        token_stats["generated"] += response.get("tokens", 0)
+
+    if response["status"] == "CANCELLED":
+        return {}
+    if response["status"] == "SUCCESS" and response["text"]:
+        batch_map = split_batch_output(response["text"], chapter_ids)
+        if batch_map is not None:
+            _record_chunk_translations(
+                batch_data, batch_map, model_name, journal_path, log_message
+            )
+            return batch_map
+        log_message(
+            f"Translation of chapters {first_number}-{last_number} did not keep every chapter tag. "
+            "Translating them one by one.",
+            level="WARNING",
+        )
+    else:
+        log_message(
+            f"Chapters {first_number}-{last_number} could not be translated together. "
+            "Translating them one by one.",
+            level="WARNING",
+        )
 
-    while chunks:
+    translations = {}
+    for chapter_data, chapter_number in zip(batch_data, chapter_numbers):
         if stop_event.is_set():
-            log_message("Translation stopped by user.", level="WARNING")
             break
+        translated_text = _translate_local_chapter(
+            chapter_data,
+            chapter_number,
+            model_name,
+            journal_path,
+            resumed_map,
+            log_message,
+            stop_event,
+            token_stats,
+        )
+        if translated_text:
+            translations[chapter_data["chapter_id"]] = translated_text
+    return translations
 
-        chunk_data = chunks.pop(0)
-        chunk_items = [data["item"] for data in chunk_data]
-        chunk_content = "".join([data["content"] for data in chunk_data])
-        log_message(f"--- Processing Chunk (Size: {len(chunk_items)} chapters) ---")
 
-        chunk_translation_map = None
-        max_retries = 3
+def _get_local_batch_token_limit(chapter_data_list, cached_map):
+    if LOCAL_BATCH_MAX_CHAPTERS <= 1:
+        return None
+    short_data_list = [
+        data for data in chapter_data_list if is_batch_candidate(data, cached_map)
+    ]
+    if len(short_data_list) < 2:
+        return None
+    return get_local_input_budget(short_data_list[0]["content"])
 
-        for attempt in range(max_retries):
-            if stop_event.is_set():
-                break
 
-            response = translate_text_with_gemini(
-                chunk_content, log_message, is_retry=(attempt > 0)
-            )
-            status = response["status"]
+def _log_local_throughput(token_stats, generation_start, sequence_count, log_message):
+    elapsed_seconds = time.time() - generation_start
+    if elapsed_seconds <= 0 or not token_stats["generated"]:
+        return
+    tokens_per_second = token_stats["generated"] / elapsed_seconds
+    message = f"Local throughput: {tokens_per_second:.1f} tokens/s"
+    if sequence_count > 1:
+        message += f" across {sequence_count} parallel sequences"
+    log_message(message + f" ({token_stats['generated']} tokens generated).")
 
-            if status == "SUCCESS" or status == "OUTPUT_TRUNCATED":
-                chunk_translation_map = parse_translated_text(response["text"])
-                break
 
-            elif status == "QUOTA_EXCEEDED":
-                if attempt < max_retries - 1:
+def _process_with_local_model(
+    chapters_to_translate,
+    start_time,
+    log_message,
+    stop_event,
+    journal_path,
+    resumed_map,
+):
+    total_chapters_to_process = len(chapters_to_translate)
+    chapters_processed = 0
+    translation_map = {}
+
+    log_message("Pre-processing all chapters for local translation...")
+    chapter_data_list = _preprocess_chapters(
+        chapters_to_translate, log_message, stop_event
+    )
+    if chapter_data_list is None:
+        return {}, [], 0
+    log_message("Pre-processing complete.", level="SUCCESS")
+
+    model_name = os.getenv("GEMINI_MODEL_NAME")
+    cached_map, _ = _apply_cached_translations(
+        chapter_data_list, model_name, resumed_map, log_message
+    )
+    _log_projected_local_times(
+        [data for data in chapter_data_list if data["chapter_id"] not in cached_map],
+        log_message,
+    )
+
+    # Size the context for the longest chapter that still needs translating
+    # instead of the model's full trained context.
+    longest_chapter_tokens = max(
+        (
+            data["tokens"]
+            for data in chapter_data_list
+            if data["chapter_id"] not in cached_map
+        ),
+        default=0,
+    )
+    prepare_local_model(
+        int(longest_chapter_tokens / LOCAL_TOKEN_LIMIT_PERCENTAGE), log_message
+    )
+
+    units = plan_local_units(
+        chapter_data_list,
+        cached_map,
+        _get_local_batch_token_limit(chapter_data_list, cached_map),
+        count_local_tokens_many,
+    )
+    batch_count = sum(1 for unit in units if len(unit) > 1)
+    if batch_count:
+        batched_chapters = sum(len(unit) for unit in units if len(unit) > 1)
+        log_message(
+            f"Packing {batched_chapters} short chapters into {batch_count} batched requests."
+        )
+
+    sequence_count = get_local_sequence_count()
+    if sequence_count > 1:
+        log_message(f"Translating up to {sequence_count} requests at once.")
+    token_stats = {"generated": 0, "lock": threading.Lock()}
+    generation_start = time.time()
+    chapter_numbers = {
+        data["chapter_id"]: number
+        for number, data in enumerate(chapter_data_list, start=1)
+    }
+    pending_units = deque(units)
+    in_flight = {}
+
+    # Short chapters finish and free their sequence while long ones are still
+    # decoding, so the next chapter starts without waiting for the slowest.
+    with ThreadPoolExecutor(max_workers=sequence_count) as executor:
+        while pending_units or in_flight:
+            if stop_event.is_set():
+                pending_units.clear()
+
+            while pending_units and len(in_flight) < sequence_count:
+                unit_data = pending_units.popleft()
+                unit_numbers = [
+                    chapter_numbers[data["chapter_id"]] for data in unit_data
+                ]
+                if len(unit_data) > 1:
                     log_message(
-                        f"Quota exceeded. Waiting 65s before retry ({attempt + 1}/{max_retries})...",
-                        level="WARNING",
+                        f"--- Processing Chapters {unit_numbers[0]}-{unit_numbers[-1]}"
+                        f"/{total_chapters_to_process} ---"
                     )
-                    for _ in range(65):
-                        if stop_event.is_set():
-                            break
-                        time.sleep(1)
-                else:
-                    log_message(
-                        "Quota retries exhausted for this chunk.", level="ERROR"
+                    future = executor.submit(
+                        _translate_local_batch,
+                        unit_data,
+                        unit_numbers,
+                        model_name,
+                        journal_path,
+                        resumed_map,
+                        log_message,
+                        stop_event,
+                        token_stats,
                     )
-                    break
+                    in_flight[future] = [data["chapter_id"] for data in unit_data]
+                    continue
+
+                chapter_data, chapter_number = unit_data[0], unit_numbers[0]
+                chapter_id = chapter_data["chapter_id"]
+                if chapter_id in cached_map:
+                    translation_map[chapter_id] = cached_map[chapter_id]
+                    chapters_processed += 1
+                    continue
 
-            elif status == "TOKEN_LIMIT_EXCEEDED":
                 log_message(
-                    "Input text too large (Token Limit). Stopping retry to split chunk.",
-                    level="ERROR",
+                    f"--- Processing Chapter {chapter_number}/{total_chapters_to_process} ---"
                 )
-                break
+                future = executor.submit(
+                    _translate_local_chapter,
+                    chapter_data,
+                    chapter_number,
+                    model_name,
+                    journal_path,
+                    resumed_map,
+                    log_message,
+                    stop_event,
+                    token_stats,
+                )
+                in_flight[future] = [chapter_id]
 
+            if in_flight:
+                done, _ = wait(in_flight, timeout=0.5, return_when=FIRST_COMPLETED)
             else:
-                if attempt < max_retries - 1:
-                    wait_time = 5 * (attempt + 1)
-                    log_message(
-                        f"API call failed. Retrying in {wait_time}s ({attempt + 1}/{max_retries})...",
-                        level="WARNING",
-                    )
-                    time.sleep(wait_time)
-                else:
-                    log_message("Generic retries exhausted.", level="ERROR")
-
-        if chunk_translation_map:
-            translation_map.update(chunk_translation_map)
-            translated_ids = set(chunk_translation_map.keys())
-            for data in chunk_data:
-                if data["item"].get_name() in translated_ids:
-                    all_extraction_data.append(data["extraction_data"])
-            chapters_processed += len(translated_ids)
-
-            untranslated_data = [
-                data
-                for data in chunk_data
-                if data["item"].get_name() not in translated_ids
-            ]
-            if untranslated_data:
-                log_message(
-                    f"Model response was incomplete. Re-queuing {len(untranslated_data)} missing chapters.",
-                    level="WARNING",
-                )
-                if len(untranslated_data) > 1:
-                    mid_point = len(untranslated_data) // 2
-                    first_half = untranslated_data[:mid_point]
-                    second_half = untranslated_data[mid_point:]
-                    chunks.insert(0, second_half)
-                    chunks.insert(0, first_half)
-                    log_message(
-                        f"Split remainder into two new chunks of size {len(first_half)} and {len(second_half)}."
+                done = set()
+
+            for future in done:
+                unit_ids = in_flight.pop(future)
+                result = future.result()
+                if len(unit_ids) > 1:
+                    translation_map.update(result)
+                elif result:
+                    translation_map[unit_ids[0]] = result
+                chapters_processed += len(unit_ids)
+                if not stop_event.is_set():
+                    _log_local_throughput(
+                        token_stats, generation_start, sequence_count, log_message
                     )
-                else:
-                    chunks.insert(0, untranslated_data)
 
-        else:
+            _update_progress(chapters_processed, total_chapters_to_process, start_time)
+
+    if stop_event.is_set():
+        log_message("Translation stopped by user.", level="WARNING")
+
+    ordered_translation_map, all_extraction_data = _assemble_translations(
+        chapter_data_list, translation_map, {}, log_message
+    )
+    return ordered_translation_map, all_extraction_data, chapters_processed
+
+
+def _translate_chunk_with_retries(
+    chunk_content,
+    estimated_tokens,
+    log_message,
+    stop_event,
+    rate_limiter,
+    translate_function=translate_text_with_gemini,
+):
+    max_retries, max_quota_retries = 3, 10
+    attempt, quota_hits = 0, 0
+
+    while attempt < max_retries:
+        if stop_event.is_set():
+            break
+        if not rate_limiter.acquire(estimated_tokens, stop_event):
+            break
+
+        response = translate_function(
+            chunk_content, log_message, is_retry=(attempt > 0)
+        )
+        status = response["status"]
+
+        if status == "SUCCESS" or status == "OUTPUT_TRUNCATED":
+            rate_limiter.on_success()
+            return parse_translated_text(response["text"])
+
+        elif status == "QUOTA_EXCEEDED":
+            quota_hits += 1
+            if quota_hits > max_quota_retries:
+                log_message("Quota retries exhausted for this chunk.", level="ERROR")
+                break
+            pause = rate_limiter.on_quota_exceeded(response.get("retry_after"))
+            log_message(
+                f"Quota exceeded. Reducing send rate to {int(rate_limiter.rate_scale * 100)}% "
+                f"and pausing {pause:.0f}s before retry ({quota_hits}/{max_quota_retries})...",
+                level="WARNING",
+            )
+
+        elif status == "TOKEN_LIMIT_EXCEEDED":
             log_message(
-                f"Translation failed for chunk of {len(chunk_data)} chapters. Splitting and re-queuing.",
+                "Input text too large (Token Limit). Stopping retry to split chunk.",
                 level="ERROR",
             )
-            if len(chunk_data) > 1:
-                mid_point = len(chunk_data) // 2
-                first_half = chunk_data[:mid_point]
-                second_half = chunk_data[mid_point:]
-                chunks.insert(0, second_half)
-                chunks.insert(0, first_half)
+            break
+
+        else:
+            attempt += 1
+            if attempt < max_retries:
+                wait_time = 5 * attempt
                 log_message(
-                    f"Split into two new chunks of size {len(first_half)} and {len(second_half)}."
+                    f"API call failed. Retrying in {wait_time}s ({attempt}/{max_retries})...",
+                    level="WARNING",
                 )
+                time.sleep(wait_time)
             else:
+                log_message("Generic retries exhausted.", level="ERROR")
+
+    return None
+
+
+def _produce_cloud_chunks(
+    chapters_to_translate,
+    safe_token_limit,
+    model_name,
+    resumed_map,
+    stop_event,
+    work_queue,
+):
+    reset_cache_stats()
+    resumed_count = 0
+    untranslated_data_list, planned_chunks = [], []
+
+    def find_saved_translation(chapter_data):
+        nonlocal resumed_count
+        if _get_resumed_translation(chapter_data, model_name, resumed_map):
+            resumed_count += 1
+        return _find_saved_translation(chapter_data, model_name, resumed_map)
+
+    def iter_untranslated_chapters():
+        for chapter_data in iter_preprocessed_chapters(
+            chapters_to_translate, stop_event
+        ):
+            saved_text = find_saved_translation(chapter_data)
+            if saved_text:
+                work_queue.put(("chapter", (chapter_data, saved_text, [])))
+                continue
+
+            parts = split_chapter_record(chapter_data, safe_token_limit)
+            part_ids = [part["chapter_id"] for part in parts] if len(parts) > 1 else []
+            work_queue.put(("chapter", (chapter_data, None, part_ids)))
+            for part in parts:
+                part_text = find_saved_translation(part) if part_ids else None
+                if part_text:
+                    work_queue.put(("part", (part["chapter_id"], part_text)))
+                else:
+                    untranslated_data_list.append(part)
+                    yield part
+
+    try:
+        for chunk_data in iter_planned_chunks(
+            iter_untranslated_chapters(),
+            safe_token_limit,
+            MAX_CHAPTERS_PER_CHUNK,
+            CHUNK_PLANNER_WINDOW_CHUNKS,
+        ):
+            planned_chunks.append(chunk_data)
+            work_queue.put(("chunk", chunk_data))
+    except Exception as e:
+        work_queue.put(("error", e))
+    finally:
+        greedy_count = count_greedy_chunks(
+            untranslated_data_list, safe_token_limit, MAX_CHAPTERS_PER_CHUNK
+        )
+        plan_stats = get_plan_stats(planned_chunks, safe_token_limit)
+        work_queue.put(("done", (resumed_count, greedy_count, plan_stats)))
+
+
+def _process_with_cloud_model(
+    chapters_to_translate,
+    start_time,
+    log_message,
+    stop_event,
+    journal_path,
+    resumed_map,
+):
+    total_chapters_to_process = len(chapters_to_translate)
+    model_name = os.getenv("GEMINI_MODEL_NAME", DEFAULT_MODEL)
+    # A self-hosted server batches concurrent requests itself, so it gets
+    # more of them in flight than the cloud API.
+    if is_server_model(model_name):
+        translate_function = translate_text_with_server
+        max_output_tokens = OPENAI_COMPAT_OUTPUT_TOKEN_LIMIT
+        max_workers = max(1, OPENAI_COMPAT_MAX_CONCURRENT_REQUESTS)
+        log_message(f"Translating with {model_name} on {get_base_url()}.")
+    else:
+        translate_function = translate_text_with_gemini
+        max_output_tokens = get_model_output_limit(log_message)
+        max_workers = max(1, CLOUD_MAX_CONCURRENT_REQUESTS)
+    safe_token_limit = int(max_output_tokens * TOKEN_LIMIT_PERCENTAGE)
+
+    log_message(f"Using a safe input token limit of {safe_token_limit} per chunk.")
+
+    rate_limiter = get_rate_limiter(model_name)
+    log_message(
+        f"Pacing requests to {rate_limiter.requests_per_minute} RPM and "
+        f"{rate_limiter.tokens_per_minute} TPM for {model_name}."
+    )
+
+    worker_count = get_preprocess_worker_count(total_chapters_to_process)
+    if worker_count > 1:
+        log_message(f"Analyzing chapters with {worker_count} worker processes...")
+    log_message(
+        f"Analyzing chapters and building chunks with a token limit of {safe_token_limit}. "
+        "Chunks are sent as soon as they are ready..."
+    )
+
+    # Chapters are analyzed and packed in a background thread while this
+    # thread sends the chunks that are already complete.
+    work_queue = queue.Queue()
+    producer_thread = threading.Thread(
+        target=_produce_cloud_chunks,
+        args=(
+            chapters_to_translate,
+            safe_token_limit,
+            model_name,
+            resumed_map,
+            stop_event,
+            work_queue,
+        ),
+        daemon=True,
+    )
+    producer_thread.start()
+
+    translation_map, chapter_data_list = {}, []
+    part_ids_by_chapter, part_parents = {}, {}
+    chapters_processed, chapters_analyzed = 0, 0
+    producer_done = False
+    analysis_error = None
+    pending_chunks = deque()
+    in_flight = {}
+    log_message(f"Dispatching chunks with up to {max_workers} concurrent requests.")
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while not producer_done or pending_chunks or in_flight:
+            block = not pending_chunks and not in_flight
+            while not producer_done:
+                try:
+                    kind, payload = work_queue.get(block=block, timeout=0.5)
+                except queue.Empty:
+                    break
+                block = False
+
+                if kind == "chapter":
+                    chapter_data, saved_text, part_ids = payload
+                    chapter_data_list.append(chapter_data)
+                    chapters_analyzed += 1
+                    if saved_text:
+                        translation_map[chapter_data["chapter_id"]] = saved_text
+                        chapters_processed += 1
+                    elif part_ids:
+                        _register_chapter_parts(
+                            chapter_data["chapter_id"],
+                            part_ids,
+                            part_ids_by_chapter,
+                            part_parents,
+                        )
+                        log_message(
+                            f"Chapter {chapter_data['chapter_id']} exceeds the token limit. "
+                            f"Split it into {len(part_ids)} parts at paragraph boundaries."
+                        )
+                elif kind == "part":
+                    part_id, part_text = payload
+                    translation_map[part_id] = part_text
+                    chapters_processed += _complete_units(
+                        [part_id], part_ids_by_chapter, part_parents
+                    )
+                elif kind == "chunk":
+                    pending_chunks.append(payload)
+                elif kind == "error":
+                    # The book cannot be completed without the remaining
+                    # chapters, so only the chunks already sent are finished
+                    # and journaled before the run fails.
+                    analysis_error = payload
+                    producer_done = True
+                    log_message(
+                        f"Chapter analysis failed: {payload}. Finishing the chunks already sent.",
+                        level="ERROR",
+                    )
+                elif kind == "done":
+                    producer_done = True
+                    resumed_count, greedy_count, plan_stats = payload
+                    chunk_count, fill_ratio, largest_chunk = plan_stats
+                    _log_saved_translation_stats(resumed_count, log_message)
+                    log_message(
+                        f"Analysis complete. Created {chunk_count} chunks for processing.",
+                        level="SUCCESS",
+                    )
+                    if chunk_count:
+                        log_message(
+                            f"Chunk plan: {chunk_count} requests (first-fit: {greedy_count}), "
+                            f"{int(fill_ratio * 100)}% average fill, largest chunk "
+                            f"{largest_chunk}/{safe_token_limit} tokens."
+                        )
+
+            if stop_event.is_set() or analysis_error is not None:
+                pending_chunks.clear()
+
+            while pending_chunks and len(in_flight) < max_workers:
+                chunk_data = pending_chunks.popleft()
+                chunk_content = "".join([data["content"] for data in chunk_data])
                 log_message(
-                    f"Unable to translate chapter {chunk_data[0]['item'].get_name()} after 3 attempts. Skipping.",
-                    level="ERROR",
+                    f"--- Processing Chunk (Size: {len(chunk_data)} chapters) ---"
+                )
+                future = executor.submit(
+                    _translate_chunk_with_retries,
+                    chunk_content,
+                    sum(data["tokens"] for data in chunk_data),
+                    log_message,
+                    stop_event,
+                    rate_limiter,
+                    translate_function,
                 )
-                chapters_processed += 1
+                in_flight[future] = chunk_data
 
-        if dpg.is_dearpygui_running():
-            progress = (
-                chapters_processed / total_chapters_to_process
-                if total_chapters_to_process > 0
-                else 0
-            )
-            percent = int(progress * 100)
-            overlay_text = (
-                f"{chapters_processed}/{total_chapters_to_process} ({percent}%)"
+            if in_flight:
+                done, _ = wait(in_flight, timeout=0.5, return_when=FIRST_COMPLETED)
+            else:
+                done = set()
+
+            for future in done:
+                chunk_data = in_flight.pop(future)
+                chunk_translation_map = future.result()
+
+                if chunk_translation_map:
+                    translation_map.update(chunk_translation_map)
+                    _record_chunk_translations(
+                        chunk_data,
+                        chunk_translation_map,
+                        model_name,
+                        journal_path,
+                        log_message,
+                    )
+                    translated_ids = {
+                        data["chapter_id"]
+                        for data in chunk_data
+                        if data["chapter_id"] in chunk_translation_map
+                    }
+                    chapters_processed += _complete_units(
+                        translated_ids, part_ids_by_chapter, part_parents
+                    )
+
+                    untranslated_data = [
+                        data
+                        for data in chunk_data
+                        if data["chapter_id"] not in translated_ids
+                    ]
+                    if untranslated_data:
+                        log_message(
+                            f"Model response was incomplete. Re-queuing {len(untranslated_data)} missing chapters.",
+                            level="WARNING",
+                        )
+                        if len(untranslated_data) > 1:
+                            mid_point = len(untranslated_data) // 2
+                            first_half = untranslated_data[:mid_point]
+                            second_half = untranslated_data[mid_point:]
+                            pending_chunks.appendleft(second_half)
+                            pending_chunks.appendleft(first_half)
+                            log_message(
+                                f"Split remainder into two new chunks of size {len(first_half)} and {len(second_half)}."
+                            )
+                        else:
+                            pending_chunks.appendleft(untranslated_data)
+
+                else:
+                    if stop_event.is_set():
+                        continue
+                    log_message(
+                        f"Translation failed for chunk of {len(chunk_data)} chapters. Splitting and re-queuing.",
+                        level="ERROR",
+                    )
+                    if len(chunk_data) > 1:
+                        mid_point = len(chunk_data) // 2
+                        first_half = chunk_data[:mid_point]
+                        second_half = chunk_data[mid_point:]
+                        pending_chunks.appendleft(second_half)
+                        pending_chunks.appendleft(first_half)
+                        log_message(
+                            f"Split into two new chunks of size {len(first_half)} and {len(second_half)}."
+                        )
+                    else:
+                        log_message(
+                            f"Unable to translate chapter {chunk_data[0]['chapter_id']} after 3 attempts. Skipping.",
+                            level="ERROR",
+                        )
+                        chapters_processed += _complete_units(
+                            [chunk_data[0]["chapter_id"]],
+                            part_ids_by_chapter,
+                            part_parents,
+                        )
+
+            _update_progress(
+                chapters_processed,
+                total_chapters_to_process,
+                start_time,
+                chapters_analyzed,
             )
-            dpg.set_value("progress_bar", progress)
-            dpg.configure_item("progress_bar", overlay=overlay_text)
-            if chapters_processed > 0 and progress < 1.0:
-                elapsed_seconds = time.time() - start_time
-                time_per_chapter = elapsed_seconds / chapters_processed
-                remaining_chapters = total_chapters_to_process - chapters_processed
-                eta_seconds = time_per_chapter * remaining_chapters
-                dpg.set_value("eta_time_text", f"ETA: {format_time(eta_seconds)}")
-        time.sleep(1)
 
-    return translation_map, all_extraction_data, chapters_processed
+    producer_thread.join()
+    if analysis_error is not None:
+        raise analysis_error
+    if stop_event.is_set():
+        log_message("Translation stopped by user.", level="WARNING")
+
+    ordered_translation_map, all_extraction_data = _assemble_translations(
+        chapter_data_list, translation_map, part_ids_by_chapter, log_message
+    )
+    return ordered_translation_map, all_extraction_data, chapters_processed
 
 
-def run_translation_process(epub_path, start_chapter, end_chapter, stop_event):
+def run_translation_process(
+    epub_path, start_chapter, end_chapter, stop_event, resume=False
+):
     start_time = time.time()
     chapters_processed = 0
     total_chapters_to_process = 0
@@ -359,7 +1128,7 @@ def run_translation_process(epub_path, start_chapter, end_chapter, stop_event):
             dpg.set_value("eta_time_text", "ETA: --:--")
 
         log_message("--- Starting Translation Process ---")
-        book = epub.read_epub(epub_path)
+        book = load_epub(epub_path)
         all_chapters = list(book.get_items_of_type(ITEM_DOCUMENT))
         chapters_to_translate_items = all_chapters[start_chapter - 1 : end_chapter]
         total_chapters_to_process = len(chapters_to_translate_items)
@@ -368,19 +1137,42 @@ def run_translation_process(epub_path, start_chapter, end_chapter, stop_event):
         )
 
         model_name = os.getenv("GEMINI_MODEL_NAME", DEFAULT_MODEL)
+        journal_path = get_journal_path(
+            epub_path, start_chapter, end_chapter, model_name
+        )
+        resumed_map = {}
+        if resume:
+            resumed_map = load_journal(journal_path)
+        else:
+            delete_journal(journal_path)
+        create_journal(
+            journal_path,
+            get_journal_identity(epub_path, start_chapter, end_chapter, model_name),
+        )
+
         translation_map, all_extraction_data = {}, []
 
         if is_local_model(model_name):
             translation_map, all_extraction_data, chapters_processed = (
                 _process_with_local_model(
-                    chapters_to_translate_items, start_time, log_message, stop_event
+                    chapters_to_translate_items,
+                    start_time,
+                    log_message,
+                    stop_event,
+                    journal_path,
+                    resumed_map,
                 )
             )
         else:
             try:
                 translation_map, all_extraction_data, chapters_processed = (
                     _process_with_cloud_model(
-                        chapters_to_translate_items, start_time, log_message, stop_event
+                        chapters_to_translate_items,
+                        start_time,
+                        log_message,
+                        stop_event,
+                        journal_path,
+                        resumed_map,
                     )
                 )
             except InterruptedError:
@@ -392,14 +1184,19 @@ def run_translation_process(epub_path, start_chapter, end_chapter, stop_event):
                 "Process was stopped by user. No EPUB file will be created.",
                 level="WARNING",
             )
+            log_message(
+                f"Progress for {len(translation_map)} chapters is saved. Start the same chapter range again to resume.",
+                level="WARNING",
+            )
         elif translation_map:
-            create_translated_epub(
+            if create_translated_epub(
                 epub_path,
                 translation_map,
                 chapters_to_translate_items,
                 all_extraction_data,
                 log_message,
-            )
+            ):
+                delete_journal(journal_path)
         else:
             log_message(
                 "Translation failed for all chapters. No EPUB file will be created.",
@@ -412,6 +1209,9 @@ def run_translation_process(epub_path, start_chapter, end_chapter, stop_event):
     finally:
         log_message("--- Process Finished ---")
         timer_stop_event.set()
+        clear_local_cancel()
+        with _LOCAL_STREAM_STATUS_LOCK:
+            _LOCAL_STREAM_STATUS.clear()
         if dpg.is_dearpygui_running():
             if not process_halted and total_chapters_to_process > 0:
                 final_progress, final_chapters, final_percent = (
@@ -434,6 +1234,7 @@ def run_translation_process(epub_path, start_chapter, end_chapter, stop_event):
             dpg.set_value("progress_bar", final_progress)
             dpg.configure_item("progress_bar", overlay=final_overlay)
             dpg.set_value("eta_time_text", "ETA: --:--")
+            dpg.set_value("chapter_progress_text", "")
             dpg.configure_item("start_button", enabled=True)
             dpg.configure_item(
                 "stop_button", show=False, enabled=False, label="Stop Translation"
@@ -441,8 +1242,19 @@ def run_translation_process(epub_path, start_chapter, end_chapter, stop_event):
 
 
 def start_translation_thread():
+    global _PENDING_TRANSLATION_ARGS
     model_name = os.getenv("GEMINI_MODEL_NAME", DEFAULT_MODEL)
-    if not is_local_model(model_name) and not os.getenv("GOOGLE_API_KEY"):
+    if is_server_model(model_name) and not get_base_url():
+        log_message(
+            "ERROR: No OpenAI-compatible server URL is set. Set OPENAI_BASE_URL to use server models.",
+            level="ERROR",
+        )
+        return
+    if (
+        not is_local_model(model_name)
+        and not is_server_model(model_name)
+        and not os.getenv("GOOGLE_API_KEY")
+    ):
         log_message(
             "ERROR: API Key is not set. Please set it to use cloud models.",
             level="ERROR",
@@ -467,6 +1279,32 @@ def start_translation_thread():
         )
         return
 
+    journal_path = get_journal_path(epub_path, start_chapter, end_chapter, model_name)
+    saved_chapters = len(load_journal(journal_path))
+    if saved_chapters:
+        _PENDING_TRANSLATION_ARGS = (epub_path, start_chapter, end_chapter)
+        dpg.set_value(
+            "resume_info_text",
+            f"Saved progress was found for {saved_chapters} chapters of this range.",
+        )
+        dpg.configure_item("resume_modal", show=True)
+        return
+
+    _launch_translation_thread(epub_path, start_chapter, end_chapter, resume=False)
+
+
+def confirm_resume_translation(resume):
+    global _PENDING_TRANSLATION_ARGS
+    dpg.configure_item("resume_modal", show=False)
+    if _PENDING_TRANSLATION_ARGS is None:
+        return
+
+    epub_path, start_chapter, end_chapter = _PENDING_TRANSLATION_ARGS
+    _PENDING_TRANSLATION_ARGS = None
+    _launch_translation_thread(epub_path, start_chapter, end_chapter, resume=resume)
+
+
+def _launch_translation_thread(epub_path, start_chapter, end_chapter, resume):
     dpg.configure_item("start_button", enabled=False)
     dpg.configure_item("stop_button", show=True, enabled=True)
 
@@ -474,7 +1312,7 @@ def start_translation_thread():
 
     thread = threading.Thread(
         target=run_translation_process,
-        args=(epub_path, start_chapter, end_chapter, _TRANSLATION_STOP_EVENT),
+        args=(epub_path, start_chapter, end_chapter, _TRANSLATION_STOP_EVENT, resume),
     )
     thread.start()
 
@@ -485,6 +1323,8 @@ def request_translation_stop():
             "Stop request received. Finishing current chapter/chunk...", level="INFO"
         )
         _TRANSLATION_STOP_EVENT.set()
+        if is_local_model(os.getenv("GEMINI_MODEL_NAME", DEFAULT_MODEL)):
+            cancel_local_generation()
         if dpg.is_dearpygui_running():
             dpg.configure_item("stop_button", enabled=False, label="Stopping...")
 
@@ -494,7 +1334,7 @@ def run_proofreading_tool(epub_path):
         if dpg.is_dearpygui_running():
             dpg.configure_item("proofread_tool_button", enabled=False)
         log_message("--- Starting Proofreading Tool ---")
-        book = epub.read_epub(epub_path)
+        book = load_epub(epub_path)
         chapters = list(book.get_items_of_type(ITEM_DOCUMENT))
 
         non_english_errors = []
@@ -656,10 +1496,16 @@ def start_stylesheet_fix_thread(epub_path):
 
 
 def fetch_models_from_api():
+    server_models = list_server_models(log_message)
+    if server_models:
+        log_message(
+            f"Found {len(server_models)} models on {get_base_url()}.", level="SUCCESS"
+        )
+
     if not os.getenv("GOOGLE_API_KEY"):
         log_message("Cannot fetch cloud models: API Key is not set.", level="WARNING")
         if dpg.is_dearpygui_running():
-            dpg.configure_item("model_combo", items=[DEFAULT_MODEL])
+            dpg.configure_item("model_combo", items=[DEFAULT_MODEL] + server_models)
             dpg.set_value("model_combo", DEFAULT_MODEL)
         return
 
@@ -670,7 +1516,7 @@ def fetch_models_from_api():
 
     models = list_models(log_message)
     if dpg.is_dearpygui_running():
-        dpg.configure_item("model_combo", items=models)
+        dpg.configure_item("model_combo", items=models + server_models)
         current_model = os.getenv("GEMINI_MODEL_NAME", models[0])
         if not is_local_model(current_model):
             dpg.set_value("model_combo", current_model)
@@ -687,7 +1533,12 @@ def run_delete_process(filename):
         if dpg.is_dearpygui_running():
             dpg.configure_item("delete_model_button", enabled=False)
 
+        release_local_model(filename)
         success = delete_local_model(filename, log_message)
+        if success:
+            delete_prefix_state(filename)
+            forget_model_info(filename)
+            refresh_resident_models()
 
         if success and dpg.is_dearpygui_running():
             local_model_files = scan_for_local_models()
@@ -722,6 +1573,225 @@ def start_delete_thread(filename):
     thread.start()
 
 
+def refresh_resident_models():
+    try:
+        resident_models = get_resident_models()
+    except Exception as e:
+        log_message(f"Could not read the loaded local models: {e}", level="WARNING")
+        return
+    if not dpg.is_dearpygui_running():
+        return
+
+    reverse_map = get_reverse_model_map()
+    lines = []
+    for model in resident_models:
+        line = (
+            f"{reverse_map.get(model['file'], model['file'])}: "
+            f"{model['memory_bytes'] / 1024**3:.1f} GB, {model['context']}-token context"
+        )
+        if model["sequences"] > 1:
+            line += f" x{model['sequences']}"
+        if model["active"]:
+            line += " (in use)"
+        lines.append(line)
+    dpg.set_value(
+        "resident_models_text",
+        (
+            "Loaded in memory:\n" + "\n".join(lines)
+            if lines
+            else "No local models are loaded in memory."
+        ),
+    )
+
+
+def start_resident_models_refresh_thread():
+    thread = threading.Thread(target=refresh_resident_models, daemon=True)
+    thread.start()
+
+
+def _log_projected_local_times(chapter_data_list, log_message):
+    input_tokens, output_tokens = 0, 0
+    for chapter_data in chapter_data_list:
+        input_tokens += chapter_data["tokens"]
+        output_tokens += chapter_data["tokens"] * get_output_reserve_ratio(
+            chapter_data["content"]
+        )
+    if not input_tokens:
+        return
+
+    projections = []
+    for model_filename in scan_for_local_models():
+        benchmark = load_model_benchmark(model_filename, log_message)
+        if benchmark:
+            seconds = estimate_translation_seconds(
+                benchmark, input_tokens, output_tokens
+            )
+            projections.append((seconds, model_filename))
+    if not projections:
+        log_message(
+            "Benchmark the local models in the local models window to see projected translation times."
+        )
+        return
+
+    reverse_map = get_reverse_model_map()
+    selected_model = os.getenv("GEMINI_MODEL_NAME")
+    log_message(
+        f"Projected local translation time for {len(chapter_data_list)} chapters "
+        f"(about {input_tokens} source tokens):"
+    )
+    for seconds, model_filename in sorted(projections):
+        marker = " (selected)" if model_filename == selected_model else ""
+        log_message(
+            f"  {reverse_map.get(model_filename, model_filename)}: {format_time(seconds)}{marker}"
+        )
+
+
+def run_time_estimate_process():
+    try:
+        chapter_items = _get_selected_chapter_items()
+        if not chapter_items:
+            log_message("Select an EPUB and a chapter range first.", level="WARNING")
+            return
+        chapter_data_list = list(
+            iter_preprocessed_chapters(chapter_items, threading.Event())
+        )
+        _log_projected_local_times(chapter_data_list, log_message)
+    except Exception as e:
+        log_message(
+            f"An unexpected error occurred while estimating translation time: {e}",
+            level="ERROR",
+        )
+
+
+def start_time_estimate_thread():
+    thread = threading.Thread(target=run_time_estimate_process)
+    thread.start()
+
+
+def run_model_benchmark_process():
+    if dpg.is_dearpygui_running() and dpg.is_item_shown("stop_button"):
+        log_message(
+            "Wait for the translation to finish before benchmarking.", level="WARNING"
+        )
+        return
+
+    local_model_files = scan_for_local_models()
+    if not local_model_files:
+        log_message("No local models are downloaded.", level="WARNING")
+        return
+
+    try:
+        if dpg.is_dearpygui_running():
+            dpg.configure_item("benchmark_models_button", enabled=False)
+        log_message(
+            f"Benchmarking {len(local_model_files)} local models. This can take several minutes..."
+        )
+        benchmark_local_models(local_model_files, log_message)
+        if dpg.get_value("app_state_filepath"):
+            run_time_estimate_process()
+    except Exception as e:
+        log_message(
+            f"An unexpected error occurred during the model benchmark: {e}",
+            level="ERROR",
+        )
+    finally:
+        if dpg.is_dearpygui_running():
+            dpg.configure_item("benchmark_models_button", enabled=True)
+
+
+def start_model_benchmark_thread():
+    thread = threading.Thread(target=run_model_benchmark_process)
+    thread.start()
+
+
+def run_tuning_process(filename):
+    if dpg.is_dearpygui_running() and dpg.is_item_shown("stop_button"):
+        log_message(
+            "Wait for the translation to finish before tuning.", level="WARNING"
+        )
+        return
+
+    try:
+        if dpg.is_dearpygui_running():
+            dpg.configure_item("tune_model_button", enabled=False)
+        log_message(
+            "Timing llama.cpp settings on this machine. This can take several minutes..."
+        )
+        tune_local_model(filename, log_message)
+    except Exception as e:
+        log_message(
+            f"An unexpected error occurred during runtime tuning: {e}", level="ERROR"
+        )
+    finally:
+        if dpg.is_dearpygui_running():
+            dpg.configure_item("tune_model_button", enabled=True)
+
+
+def start_tuning_thread(filename):
+    thread = threading.Thread(target=run_tuning_process, args=(filename,))
+    thread.start()
+
+
+def _get_selected_chapter_items():
+    epub_path = dpg.get_value("app_state_filepath")
+    if not epub_path:
+        return []
+
+    book = load_epub(epub_path)
+    all_chapters = list(book.get_items_of_type(ITEM_DOCUMENT))
+    start_chapter = max(1, dpg.get_value("start_chapter_input"))
+    end_chapter = min(len(all_chapters), dpg.get_value("end_chapter_input"))
+    return all_chapters[start_chapter - 1 : end_chapter]
+
+
+def _load_benchmark_sample():
+    # The first chapter of the selected range with any text is the sample.
+    for item in _get_selected_chapter_items():
+        content = preprocess_chapter(item.get_name(), item.get_content())["content"]
+        if content.strip():
+            return content
+    return None
+
+
+def run_speculative_benchmark_process(filename):
+    if dpg.is_dearpygui_running() and dpg.is_item_shown("stop_button"):
+        log_message(
+            "Wait for the translation to finish before benchmarking.", level="WARNING"
+        )
+        return
+
+    try:
+        if dpg.is_dearpygui_running():
+            dpg.configure_item("speculative_benchmark_button", enabled=False)
+        sample_text = _load_benchmark_sample()
+        if not sample_text:
+            log_message(
+                "Select an EPUB and a chapter range first. The benchmark translates "
+                "the first chapter of the range.",
+                level="WARNING",
+            )
+            return
+        log_message(
+            "Comparing speculative decoding modes on a sample chapter. This can take several minutes..."
+        )
+        benchmark_speculative_decoding(filename, sample_text, log_message)
+    except Exception as e:
+        log_message(
+            f"An unexpected error occurred during the speculative decoding benchmark: {e}",
+            level="ERROR",
+        )
+    finally:
+        if dpg.is_dearpygui_running():
+            dpg.configure_item("speculative_benchmark_button", enabled=True)
+
+
+def start_speculative_benchmark_thread(filename):
+    thread = threading.Thread(
+        target=run_speculative_benchmark_process, args=(filename,)
+    )
+    thread.start()
+
+
 def run_cover_creation_process(epub_path):
     try:
         if dpg.is_dearpygui_running():
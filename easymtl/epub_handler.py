@@ -1,7 +1,40 @@
 import os
 import re
+import threading
+from collections import OrderedDict
 from ebooklib import epub, ITEM_COVER, ITEM_DOCUMENT
-from bs4 import BeautifulSoup
+from lxml import etree
+
+from .config import MAX_CACHED_BOOKS
+
+_BOOK_CACHE = OrderedDict()
+_BOOK_CACHE_LOCK = threading.Lock()
+
+
+def _get_book_cache_key(epub_path):
+    stat = os.stat(epub_path)
+    return (os.path.abspath(epub_path), stat.st_size, stat.st_mtime_ns)
+
+
+def load_epub(epub_path):
+    cache_key = _get_book_cache_key(epub_path)
+    with _BOOK_CACHE_LOCK:
+        if cache_key in _BOOK_CACHE:
+            _BOOK_CACHE.move_to_end(cache_key)
+            return _BOOK_CACHE[cache_key]
+
+        book = epub.read_epub(epub_path)
+        _BOOK_CACHE[cache_key] = book
+        while len(_BOOK_CACHE) > MAX_CACHED_BOOKS:
+            _BOOK_CACHE.popitem(last=False)
+        return book
+
+
+def release_epub(epub_path):
+    abs_path = os.path.abspath(epub_path)
+    with _BOOK_CACHE_LOCK:
+        for cache_key in [key for key in _BOOK_CACHE if key[0] == abs_path]:
+            del _BOOK_CACHE[cache_key]
 
 
 def _update_toc_recursive(toc_list, title_map):
@@ -16,55 +49,129 @@ def _update_toc_recursive(toc_list, title_map):
             item.title = title_map[item.href]
 
 
-def extract_content_from_chapters(chapter_items, logger, verbose=True):
-    if verbose:
-        logger("Extracting content and filtering empty chapters...")
-    full_content_for_api = ""
-    extraction_data = []
+_BODY_TAG_PATTERN = re.compile(r"<body[\s/>]", re.IGNORECASE)
+_XML_DECLARATION_PATTERN = re.compile(r"^\s*<\?xml[^>]*\?>")
+_XML_ENCODING_PATTERN = re.compile(
+    rb"^\s*<\?.*encoding=['\"](.*?)['\"].*\?>", re.IGNORECASE
+)
+_HTML_META_CHARSET_PATTERN = re.compile(
+    rb"<\s*meta[^>]+charset\s*=\s*[\"']?([^>]*?)[ /;'\">]", re.IGNORECASE
+)
+_LXML_HTML_PARSER = etree.HTMLParser()
+# Strings inside these tags are not part of BeautifulSoup's get_text() output.
+_HIDDEN_TEXT_TAGS = {"script", "style", "template", "rt", "rp"}
+_BOLD_TAGS = {"b", "strong"}
+_ITALIC_TAGS = {"i", "em"}
+_MULTI_VALUED_IMG_ATTRIBUTES = {"class", "accesskey", "dropzone"}
+_FORMAT_ALL, _FORMAT_BOLD_ONLY, _FORMAT_NONE = 0, 1, 2
+
+
+def _decode_chapter_content(content):
+    if isinstance(content, str):
+        return content
+
+    candidates = []
+    if content.startswith(b"\xef\xbb\xbf"):
+        candidates.append("utf-8-sig")
+    head = content[:1024]
+    declared = _XML_ENCODING_PATTERN.search(head) or _HTML_META_CHARSET_PATTERN.search(
+        head
+    )
+    if declared:
+        candidates.append(declared.group(1).decode("ascii", "ignore").lower())
+    candidates.extend(["utf-8", "windows-1252"])
+
+    for encoding in candidates:
+        try:
+            return content.decode(encoding)
+        except (LookupError, UnicodeDecodeError):
+            continue
+    return content.decode("utf-8", "replace")
+
+
+def _serialize_img_tag(img):
+    html = "<img"
+    for name, value in sorted(img.attrib.items()):
+        if name in _MULTI_VALUED_IMG_ATTRIBUTES:
+            value = " ".join(value.split())
+        value = value.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+        quote = '"'
+        if '"' in value:
+            if "'" in value:
+                value = value.replace('"', "&quot;")
+            else:
+                quote = "'"
+        html += f" {name}={quote}{value}{quote}"
+    return html + "/>"
+
+
+def _collect_text_pieces(element, pieces, image_tags, format_mode, hidden):
+    if element.text and not hidden:
+        pieces.append(element.text)
+
+    for child in element:
+        tag = child.tag if isinstance(child.tag, str) else None
+
+        if tag == "img":
+            pieces.append(f"\n[IMAGE_PLACEHOLDER_{len(image_tags)}]\n")
+            image_tags.append(_serialize_img_tag(child))
+        elif tag in _BOLD_TAGS and format_mode != _FORMAT_NONE:
+            inner_pieces = []
+            _collect_text_pieces(child, inner_pieces, image_tags, _FORMAT_NONE, hidden)
+            text = "".join(inner_pieces)
+            pieces.append(f"**{text}**" if text.strip() else text)
+        elif tag in _ITALIC_TAGS and format_mode == _FORMAT_ALL:
+            inner_pieces = []
+            _collect_text_pieces(
+                child, inner_pieces, image_tags, _FORMAT_BOLD_ONLY, hidden
+            )
+            text = "".join(inner_pieces)
+            pieces.append(f"*{text}*" if text.strip() else text)
+        elif tag is not None:
+            _collect_text_pieces(
+                child,
+                pieces,
+                image_tags,
+                format_mode,
+                hidden or tag in _HIDDEN_TEXT_TAGS,
+            )
 
-    for item in chapter_items:
-        chapter_id = item.get_name()
+        if child.tail and not hidden:
+            pieces.append(child.tail)
 
-        soup = BeautifulSoup(item.get_content(), "html.parser")
-        body = soup.find("body")
-        if not body:
-            continue
 
-        image_tags_for_chapter = []
-        for i, img in enumerate(body.find_all("img")):
-            placeholder = f"\n[IMAGE_PLACEHOLDER_{i}]\n"
-            image_tags_for_chapter.append(str(img))
-            img.replace_with(placeholder)
+def _extract_chapter_with_lxml(content):
+    markup = _XML_DECLARATION_PATTERN.sub("", _decode_chapter_content(content), 1)
+    if not _BODY_TAG_PATTERN.search(markup):
+        return None, []
 
-        for tag in body.find_all(["b", "strong"]):
-            text = tag.get_text()
-            if text.strip():
-                tag.replace_with(f"**{text}**")
+    root = etree.fromstring(markup, _LXML_HTML_PARSER)
+    body = root.find(".//body") if root is not None else None
+    if body is None:
+        return None, []
 
-        for tag in body.find_all(["i", "em"]):
-            text = tag.get_text()
-            if text.strip():
-                tag.replace_with(f"*{text}*")
+    # One walk produces the same strings that the BeautifulSoup version gets
+    # after replacing images, then bold tags, then italic tags.
+    pieces, image_tags = [], []
+    _collect_text_pieces(body, pieces, image_tags, _FORMAT_ALL, False)
+    stripped_pieces = (piece.strip() for piece in pieces)
+    return "\n".join(piece for piece in stripped_pieces if piece), image_tags
 
-        chapter_text = body.get_text(separator="\n", strip=True)
 
-        text_check = chapter_text
-        for i in range(len(image_tags_for_chapter)):
-            text_check = text_check.replace(f"[IMAGE_PLACEHOLDER_{i}]", "")
+def extract_chapter_content(chapter_id, raw_content):
+    chapter_text, image_tags_for_chapter = _extract_chapter_with_lxml(raw_content)
+    if chapter_text is None:
+        return "", None
 
-        if not text_check.strip():
-            if verbose:
-                logger(f"Skipping empty or image-only chapter: {chapter_id}")
-            extraction_data.append((chapter_id, image_tags_for_chapter))
-            continue
+    text_check = chapter_text
+    for i in range(len(image_tags_for_chapter)):
+        text_check = text_check.replace(f"[IMAGE_PLACEHOLDER_{i}]", "")
 
-        id_tag = f"[CHAPTER_ID::{chapter_id}]"
-        full_content_for_api += f"{id_tag}\n{chapter_text}\n---\n"
-        extraction_data.append((chapter_id, image_tags_for_chapter))
+    if not text_check.strip():
+        return "", (chapter_id, image_tags_for_chapter)
 
-    if verbose:
-        logger("Content extracted successfully.", level="SUCCESS")
-    return full_content_for_api, extraction_data
+    id_tag = f"[CHAPTER_ID::{chapter_id}]"
+    return f"{id_tag}\n{chapter_text}\n---\n", (chapter_id, image_tags_for_chapter)
 
 
 def create_translated_epub(
@@ -76,8 +183,25 @@ def create_translated_epub(
         dir_name, os.path.splitext(file_name)[0] + "_translated.epub"
     )
 
-    book = epub.read_epub(original_path)
+    # Reuse the parsed book the chapters came from. It is modified in place
+    # below, so it is dropped from the cache once the new file is written.
+    book = load_epub(original_path)
+    try:
+        return _write_translated_book(
+            book,
+            new_file_path,
+            translation_map,
+            chapters_to_replace,
+            extraction_data,
+            logger,
+        )
+    finally:
+        release_epub(original_path)
 
+
+def _write_translated_book(
+    book, new_file_path, translation_map, chapters_to_replace, extraction_data, logger
+):
     style_item = book.get_item_with_id("style_default")
     if not style_item:
         logger("Stylesheet not found, creating a new one.")
@@ -218,8 +342,10 @@ img {
     try:
         epub.write_epub(new_file_path, book, {})
         logger(f"Translated e-book saved as: {new_file_path}", level="SUCCESS")
+        return True
     except Exception as e:
         logger(f"Could not write translated EPUB file: {e}", level="ERROR")
+        return False
 
 
 def create_cover_page_from_metadata(epub_path, logger):
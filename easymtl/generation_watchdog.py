@@ -0,0 +1,46 @@
+from .config import (
+    LOCAL_WATCHDOG_LOOP_CHARS,
+    LOCAL_WATCHDOG_MAX_PERIOD_CHARS,
+    LOCAL_WATCHDOG_MIN_REPEATS,
+    LOCAL_WATCHDOG_STALL_TOKENS,
+)
+
+
+class GenerationWatchdog:
+    def __init__(self):
+        self._window_chars = max(
+            LOCAL_WATCHDOG_LOOP_CHARS,
+            LOCAL_WATCHDOG_MAX_PERIOD_CHARS * LOCAL_WATCHDOG_MIN_REPEATS,
+        )
+        self._tail = ""
+        self._blank_tokens = 0
+
+    def _find_loop(self):
+        tail = self._tail
+        for period in range(1, LOCAL_WATCHDOG_MAX_PERIOD_CHARS + 1):
+            span = max(LOCAL_WATCHDOG_LOOP_CHARS, period * LOCAL_WATCHDOG_MIN_REPEATS)
+            if len(tail) < span:
+                return False
+            # Cheap check first, since almost every period fails on the
+            # last character already.
+            if tail[-1] != tail[-1 - period]:
+                continue
+            segment = tail[-span:]
+            if segment[period:] == segment[:-period]:
+                return True
+        return False
+
+    def check(self, token_text):
+        # A token that adds no visible text does not move the translation
+        # forward, and a long run of them means the model is stuck.
+        if token_text.strip():
+            self._blank_tokens = 0
+        else:
+            self._blank_tokens += 1
+            if self._blank_tokens >= LOCAL_WATCHDOG_STALL_TOKENS:
+                return "stalled"
+
+        if not token_text:
+            return None
+        self._tail = (self._tail + token_text)[-self._window_chars :]
+        return "repetition" if self._find_loop() else None
@@ -0,0 +1,140 @@
+import struct
+
+GGUF_MAGIC = b"GGUF"
+
+_SCALAR_FORMATS = {
+    0: "<B",
+    1: "<b",
+    2: "<H",
+    3: "<h",
+    4: "<I",
+    5: "<i",
+    6: "<f",
+    7: "<?",
+    10: "<Q",
+    11: "<q",
+    12: "<d",
+}
+_STRING_TYPE = 8
+_ARRAY_TYPE = 9
+# llama.cpp's llama_ftype values, stored as general.file_type.
+_FILE_TYPE_NAMES = {
+    0: "F32",
+    1: "F16",
+    2: "Q4_0",
+    3: "Q4_1",
+    7: "Q8_0",
+    8: "Q5_0",
+    9: "Q5_1",
+    10: "Q2_K",
+    11: "Q3_K_S",
+    12: "Q3_K_M",
+    13: "Q3_K_L",
+    14: "Q4_K_S",
+    15: "Q4_K_M",
+    16: "Q5_K_S",
+    17: "Q5_K_M",
+    18: "Q6_K",
+    19: "IQ2_XXS",
+    20: "IQ2_XS",
+    21: "Q2_K_S",
+    22: "IQ3_XS",
+    23: "IQ3_XXS",
+    24: "IQ1_S",
+    25: "IQ4_NL",
+    26: "IQ3_S",
+    27: "IQ3_M",
+    28: "IQ2_S",
+    29: "IQ2_M",
+    30: "IQ4_XS",
+    31: "IQ1_M",
+    32: "BF16",
+    36: "TQ1_0",
+    37: "TQ2_0",
+    38: "MXFP4_MOE",
+}
+
+
+def _read_exact(f, size):
+    data = f.read(size)
+    if len(data) != size:
+        raise ValueError("Unexpected end of file while reading GGUF header.")
+    return data
+
+
+def _read_scalar(f, value_type):
+    value_format = _SCALAR_FORMATS[value_type]
+    return struct.unpack(value_format, _read_exact(f, struct.calcsize(value_format)))[0]
+
+
+def _read_string(f):
+    length = _read_scalar(f, 10)
+    return _read_exact(f, length).decode("utf-8", errors="replace")
+
+
+def _read_value(f, value_type):
+    if value_type == _STRING_TYPE:
+        return _read_string(f)
+    if value_type in _SCALAR_FORMATS:
+        return _read_scalar(f, value_type)
+    if value_type != _ARRAY_TYPE:
+        raise ValueError(f"Unknown GGUF value type {value_type}.")
+
+    item_type = _read_scalar(f, 4)
+    item_count = _read_scalar(f, 10)
+    # Vocabulary arrays hold hundreds of thousands of entries, so they are
+    # skipped and only their length is kept.
+    if item_type in _SCALAR_FORMATS:
+        f.seek(item_count * struct.calcsize(_SCALAR_FORMATS[item_type]), 1)
+    else:
+        for _ in range(item_count):
+            _read_value(f, item_type)
+    return item_count
+
+
+def _read_header(f, model_path):
+    if _read_exact(f, 4) != GGUF_MAGIC:
+        raise ValueError(f"{model_path} is not a GGUF file.")
+    version = _read_scalar(f, 4)
+    if version < 2:
+        raise ValueError(f"GGUF version {version} is not supported.")
+
+    tensor_count = _read_scalar(f, 10)
+    kv_count = _read_scalar(f, 10)
+    metadata = {"gguf.version": version}
+    for _ in range(kv_count):
+        key = _read_string(f)
+        value_type = _read_scalar(f, 4)
+        metadata[key] = _read_value(f, value_type)
+    return metadata, tensor_count
+
+
+def read_gguf_header(model_path):
+    # The tensor descriptions follow the metadata, so the parameter count can
+    # be summed from their shapes without touching the weights.
+    with open(model_path, "rb") as f:
+        metadata, tensor_count = _read_header(f, model_path)
+        parameter_count = 0
+        for _ in range(tensor_count):
+            _read_string(f)
+            dimension_count = _read_scalar(f, 4)
+            element_count = 1
+            for _ in range(dimension_count):
+                element_count *= _read_scalar(f, 10)
+            _read_scalar(f, 4)
+            _read_scalar(f, 10)
+            parameter_count += element_count
+    return metadata, parameter_count
+
+
+def get_file_type_name(file_type):
+    if file_type is None:
+        return None
+    return _FILE_TYPE_NAMES.get(file_type, f"type {file_type}")
+
+
+def get_context_length(metadata):
+    architecture = metadata.get("general.architecture")
+    if architecture:
+        return metadata.get(f"{architecture}.context_length")
+    return None
@@ -3,26 +3,34 @@ import os
 import dearpygui.dearpygui as dpg
 import pywinstyles
 from win32 import win32gui
-from ebooklib import epub, ITEM_DOCUMENT
+from ebooklib import ITEM_DOCUMENT
 
 from easymtl.config import APP_VERSION, AVAILABLE_GEMMA_MODELS
 from easymtl.updater import start_download_and_update_thread, start_update_check_thread
 
+from .epub_handler import load_epub
 from .utils import (
     get_reverse_model_map,
     resource_path,
     log_message,
-    scan_for_local_models,
 )
+from .local_worker import shutdown_local_worker
+from .model_registry import describe_model, get_local_model_info, list_local_models
 from .core import (
+    confirm_resume_translation,
     request_translation_stop,
     start_cover_creation_thread,
     start_delete_thread,
     start_download_thread,
+    start_model_benchmark_thread,
     start_model_fetch_thread,
     start_proofreading_thread,
+    start_resident_models_refresh_thread,
+    start_speculative_benchmark_thread,
     start_stylesheet_fix_thread,
+    start_time_estimate_thread,
     start_translation_thread,
+    start_tuning_thread,
 )
 
 
@@ -88,6 +96,7 @@ def setup_themes():
     dpg.bind_item_theme("model_select_modal_content", window_theme)
     dpg.bind_item_theme("local_models_modal_content", window_theme)
     dpg.bind_item_theme("about_modal_content", window_theme)
+    dpg.bind_item_theme("resume_modal_content", window_theme)
 
 
 def select_file_callback(sender, app_data):
@@ -95,7 +104,7 @@ def select_file_callback(sender, app_data):
     dpg.set_value("epub_path_text", f"Selected: {os.path.basename(filepath)}")
     dpg.set_value("app_state_filepath", filepath)
     try:
-        book = epub.read_epub(filepath)
+        book = load_epub(filepath)
         chapters = list(book.get_items_of_type(ITEM_DOCUMENT))
         total_chapters = len(chapters)
 
@@ -165,7 +174,9 @@ def save_model_callback():
 
 
 def open_local_models_callback():
-    local_model_files = scan_for_local_models()
+    # Listing the models also reads and caches their GGUF headers, so the
+    # details panel does not have to open each file on selection.
+    local_model_files = [filename for filename, _ in list_local_models()]
     reverse_map = get_reverse_model_map()
     display_names = [reverse_map.get(f, f) for f in local_model_files]
     dpg.configure_item("local_model_listbox", items=display_names)
@@ -180,6 +191,28 @@ def open_local_models_callback():
     if downloadable_models:
         dpg.set_value("gemma_model_to_download_combo", downloadable_models[0])
     dpg.configure_item("local_models_modal", show=True)
+    show_model_details_callback()
+    start_resident_models_refresh_thread()
+
+
+def show_model_details_callback():
+    selected_display_name = dpg.get_value("local_model_listbox")
+    if not selected_display_name:
+        dpg.set_value("model_details_text", "")
+        return
+    selected_filename = next(
+        (
+            info["file"]
+            for name, info in AVAILABLE_GEMMA_MODELS.items()
+            if name == selected_display_name
+        ),
+        selected_display_name,
+    )
+    try:
+        model_info = get_local_model_info(selected_filename)
+    except (OSError, ValueError):
+        model_info = None
+    dpg.set_value("model_details_text", describe_model(model_info))
 
 
 def download_selected_model_callback():
@@ -227,6 +260,38 @@ def delete_selected_model_callback():
     start_delete_thread(filename_to_delete)
 
 
+def tune_selected_model_callback():
+    selected_display_name = dpg.get_value("local_model_listbox")
+    if not selected_display_name:
+        log_message("No model selected to tune.", level="WARNING")
+        return
+    filename_to_tune = next(
+        (
+            info["file"]
+            for name, info in AVAILABLE_GEMMA_MODELS.items()
+            if name == selected_display_name
+        ),
+        selected_display_name,
+    )
+    start_tuning_thread(filename_to_tune)
+
+
+def benchmark_selected_model_callback():
+    selected_display_name = dpg.get_value("local_model_listbox")
+    if not selected_display_name:
+        log_message("No model selected to benchmark.", level="WARNING")
+        return
+    filename_to_benchmark = next(
+        (
+            info["file"]
+            for name, info in AVAILABLE_GEMMA_MODELS.items()
+            if name == selected_display_name
+        ),
+        selected_display_name,
+    )
+    start_speculative_benchmark_thread(filename_to_benchmark)
+
+
 def open_about_callback():
     dpg.configure_item("about_modal", show=True)
     dpg.set_value("update_status_text", "")
@@ -529,7 +594,14 @@ def build_gui():
             dpg.add_separator()
 
             dpg.add_text("Manage Downloaded Models", wrap=0)
-            dpg.add_listbox(tag="local_model_listbox", items=[], num_items=5, width=-1)
+            dpg.add_listbox(
+                tag="local_model_listbox",
+                items=[],
+                num_items=5,
+                width=-1,
+                callback=show_model_details_callback,
+            )
+            dpg.add_text("", tag="model_details_text", color=(200, 200, 200), wrap=0)
             with dpg.group(horizontal=True):
                 dpg.add_button(
                     label="Use Selected Model", callback=select_local_model_callback
@@ -539,6 +611,28 @@ def build_gui():
                     tag="delete_model_button",
                     callback=delete_selected_model_callback,
                 )
+                dpg.add_button(
+                    label="Tune for This PC",
+                    tag="tune_model_button",
+                    callback=tune_selected_model_callback,
+                )
+                dpg.add_button(
+                    label="Benchmark Speculation",
+                    tag="speculative_benchmark_button",
+                    callback=benchmark_selected_model_callback,
+                )
+            with dpg.group(horizontal=True):
+                dpg.add_button(
+                    label="Benchmark All Models",
+                    tag="benchmark_models_button",
+                    callback=start_model_benchmark_thread,
+                )
+                dpg.add_button(
+                    label="Estimate Book Time",
+                    callback=start_time_estimate_thread,
+                )
+            dpg.add_spacer(height=5)
+            dpg.add_text("", tag="resident_models_text", color=(200, 200, 200), wrap=0)
 
     about_modal_width = dpg.get_viewport_width() / 2.5
     about_modal_height = dpg.get_viewport_height() / 3
@@ -585,6 +679,43 @@ def build_gui():
                 callback=download_and_update_callback,
             )
 
+    resume_modal_width = dpg.get_viewport_width() / 2
+    resume_modal_height = dpg.get_viewport_height() / 3.5
+    with dpg.window(
+        label="Resume Translation",
+        modal=True,
+        show=False,
+        tag="resume_modal",
+        no_close=True,
+        width=resume_modal_width,
+        height=resume_modal_height,
+        pos=[
+            (dpg.get_viewport_width() / 2) - (resume_modal_width / 2),
+            (dpg.get_viewport_height() / 2) - (resume_modal_height / 2),
+        ],
+    ):
+        with dpg.child_window(
+            tag="resume_modal_content", autosize_x=True, autosize_y=True
+        ):
+            dpg.add_text("", tag="resume_info_text", wrap=0)
+            dpg.add_text(
+                "Resume to translate only the missing chapters, or start over to translate the whole range again.",
+                wrap=0,
+            )
+            dpg.add_spacer(height=20)
+
+            with dpg.group(horizontal=True):
+                dpg.add_button(
+                    label="Resume",
+                    width=120,
+                    callback=lambda: confirm_resume_translation(True),
+                )
+                dpg.add_button(
+                    label="Start Over",
+                    width=120,
+                    callback=lambda: confirm_resume_translation(False),
+                )
+
     with dpg.window(tag="primary_window", label="EasyMTL Translator"):
         with dpg.menu_bar():
             with dpg.menu(label="Settings"):
@@ -682,6 +813,7 @@ def build_gui():
                 with dpg.group():
                     dpg.add_text("", tag="elapsed_time_text")
                     dpg.add_text("", tag="eta_time_text")
+            dpg.add_text("", tag="chapter_progress_text")
             dpg.add_spacer(height=5)
 
             with dpg.collapsing_header(label="Logs", default_open=True):
@@ -712,3 +844,4 @@ def build_gui():
     dpg.set_primary_window("primary_window", True)
     dpg.start_dearpygui()
     dpg.destroy_context()
+    shutdown_local_worker()
@@ -0,0 +1,74 @@
+from .chunking import plan_chunks
+from .config import LOCAL_BATCH_MAX_CHAPTERS, LOCAL_BATCH_MAX_CHAPTER_TOKENS
+from .translator import parse_translated_text
+
+
+def is_batch_candidate(chapter_data, cached_map):
+    return (
+        chapter_data["chapter_id"] not in cached_map
+        and chapter_data["tokens"] <= LOCAL_BATCH_MAX_CHAPTER_TOKENS
+    )
+
+
+def plan_local_units(chapter_data_list, cached_map, batch_token_limit, count_tokens):
+    # Runs of short chapters are packed into batches, so the prompt setup is
+    # paid once per batch instead of once per chapter. Cached and long
+    # chapters stay on their own and keep the book order.
+    #
+    # The batch limit is counted with the model's tokenizer, while
+    # data["tokens"] is only a fast estimate, so candidates are measured with
+    # count_tokens, all in one call, before they are packed against it.
+    token_counts = {}
+    if batch_token_limit:
+        candidates = [
+            data for data in chapter_data_list if is_batch_candidate(data, cached_map)
+        ]
+        counts = None
+        if candidates:
+            counts = count_tokens([data["content"] for data in candidates])
+        if counts is not None:
+            token_counts = {
+                data["chapter_id"]: count for data, count in zip(candidates, counts)
+            }
+
+    units, short_run = [], []
+    for chapter_data in chapter_data_list:
+        token_count = token_counts.get(chapter_data["chapter_id"])
+        if token_count is not None and token_count <= batch_token_limit:
+            short_run.append({**chapter_data, "tokens": token_count})
+            continue
+        if short_run:
+            units.extend(
+                plan_chunks(short_run, batch_token_limit, LOCAL_BATCH_MAX_CHAPTERS)
+            )
+            short_run = []
+        units.append([chapter_data])
+    if short_run:
+        units.extend(
+            plan_chunks(short_run, batch_token_limit, LOCAL_BATCH_MAX_CHAPTERS)
+        )
+    return units
+
+
+def join_batch_content(batch_data):
+    return "".join(data["content"] for data in batch_data)
+
+
+def is_complete_batch_output(translated_text, batch_map, chapter_ids):
+    # A "---" the model wrote inside a chapter would silently cut it short
+    # in parse_translated_text, so the separator count has to match too.
+    separated_chunks = [
+        chunk for chunk in translated_text.split("---") if chunk.strip()
+    ]
+    return (
+        len(separated_chunks) == len(chapter_ids)
+        and set(batch_map) == set(chapter_ids)
+        and all(batch_map[chapter_id].strip() for chapter_id in chapter_ids)
+    )
+
+
+def split_batch_output(translated_text, chapter_ids):
+    batch_map = parse_translated_text(translated_text)
+    if not is_complete_batch_output(translated_text, batch_map, chapter_ids):
+        return None
+    return {chapter_id: batch_map[chapter_id].strip() for chapter_id in chapter_ids}
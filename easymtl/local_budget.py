@@ -0,0 +1,38 @@
+from .config import LOCAL_OUTPUT_RESERVE_RATIOS, LOCAL_PARALLEL_SEQUENCES
+
+
+def get_local_sequence_count():
+    return max(1, LOCAL_PARALLEL_SEQUENCES)
+
+
+def detect_source_language(text):
+    sample = text[:2000]
+    counts = {"ja": 0, "ko": 0, "zh": 0}
+    for char in sample:
+        code = ord(char)
+        if 0x3040 <= code <= 0x30FF:
+            counts["ja"] += 1
+        elif 0xAC00 <= code <= 0xD7AF:
+            counts["ko"] += 1
+        elif 0x4E00 <= code <= 0x9FFF:
+            counts["zh"] += 1
+
+    # Japanese text mixes kana with kanji, so any real amount of kana wins.
+    if counts["ja"] > len(sample) * 0.05:
+        return "ja"
+    language = max(counts, key=counts.get)
+    return language if counts[language] > len(sample) * 0.2 else "default"
+
+
+def get_output_reserve_ratio(text):
+    ratios = LOCAL_OUTPUT_RESERVE_RATIOS
+    return ratios.get(detect_source_language(text), ratios["default"])
+
+
+def estimate_translation_seconds(benchmark, input_tokens, output_tokens):
+    # The source is read once at prompt speed and the translation is
+    # generated token by token.
+    return (
+        input_tokens / benchmark["prompt_tokens_per_second"]
+        + output_tokens / benchmark["generation_tokens_per_second"]
+    )
@@ -1,117 +1,896 @@
 import os
-from llama_cpp import Llama
-from huggingface_hub import hf_hub_download
-from huggingface_hub.utils import GatedRepoError, HfHubHTTPError
+import queue
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+import psutil
+import llama_cpp
+from llama_cpp import Llama, LlamaGrammar, StoppingCriteriaList
+from .config import (
+    LOCAL_CONSTRAIN_OUTPUT,
+    LOCAL_CONTEXT_ALIGNMENT,
+    LOCAL_KV_CACHE_TYPE,
+    LOCAL_MAX_CONTEXT,
+    LOCAL_MAX_OUTPUT_RATIO,
+    LOCAL_MAX_RESIDENT_MODELS,
+    LOCAL_MIN_FREE_MEMORY_BYTES,
+    LOCAL_MIN_CONTEXT,
+    LOCAL_MIN_OUTPUT_CAP_TOKENS,
+    LOCAL_SPECULATIVE_BENCHMARK_CONTEXT,
+    LOCAL_SPECULATIVE_BENCHMARK_TOKENS,
+    LOCAL_SPECULATIVE_MODE,
+    LOCAL_STREAM_PROGRESS_INTERVAL,
+    LOCAL_THREADS,
+    LOCAL_WATCHDOG_RETRIES,
+)
+from .generation_watchdog import GenerationWatchdog
+from .local_budget import get_local_sequence_count, get_output_reserve_ratio
+from .model_registry import get_model_info
+from .output_grammar import CHAPTER_ID_PATTERN, build_output_grammar
+from .runtime_tuning import (
+    benchmark_model,
+    get_available_cpu_count,
+    get_default_gpu_layers,
+    load_tuning_profile,
+    tune_runtime_settings,
+)
+from .prompt_cache import load_prefix_state, make_prefix_state_key, save_prefix_state
+from .speculative import (
+    SPECULATIVE_MODES,
+    SpeculationStats,
+    check_speculative_mode,
+    create_drafter,
+)
 from .utils import get_models_dir
 
+# The most recently used model, which token counting and budgets refer to.
 _LOCAL_MODEL_INSTANCE = None
 _LOADED_MODEL_PATH = None
+# Loaded models by path, least recently used first. Each keeps its contexts,
+# an idle queue they wait in between chapters, and its prompt prefix state.
+_RESIDENT_MODELS = OrderedDict()
+_RESIDENT_MODELS_LOCK = threading.RLock()
+_MODEL_LOAD_LOCK = threading.Lock()
+_KV_CACHE_TYPES = {
+    "f16": llama_cpp.GGML_TYPE_F16,
+    "q8_0": llama_cpp.GGML_TYPE_Q8_0,
+    "q4_0": llama_cpp.GGML_TYPE_Q4_0,
+}
+_SAMPLING_OPTIONS = {
+    "temperature": 1.0,
+    "top_k": 64,
+    "top_p": 0.95,
+    "min_p": 0.0,
+    "repeat_penalty": 1.0,
+}
+# Used after a runaway generation, to steer the model out of the loop.
+_RETRY_SAMPLING_OPTIONS = {
+    "temperature": 0.7,
+    "top_k": 40,
+    "top_p": 0.9,
+    "min_p": 0.05,
+    "repeat_penalty": 1.15,
+}
+# Greedy decoding makes every benchmark mode produce the same translation, so
+# the timings compare like for like.
+_BENCHMARK_SAMPLING_OPTIONS = {"temperature": 0.0, "top_k": 1, "repeat_penalty": 1.0}
 
 
-def download_model_from_hub(repo_id, filename, logger):
-    models_dir = get_models_dir()
+def _get_kv_cache_options(logger):
+    if not LOCAL_KV_CACHE_TYPE:
+        return {}
 
+    ggml_type = _KV_CACHE_TYPES.get(LOCAL_KV_CACHE_TYPE.lower())
+    if ggml_type is None:
+        logger(
+            f"Unknown KV cache type '{LOCAL_KV_CACHE_TYPE}'. Using the default.",
+            level="WARNING",
+        )
+        return {}
+
+    # llama.cpp can only quantize the V cache with flash attention enabled.
+    return {"type_k": ggml_type, "type_v": ggml_type, "flash_attn": True}
+
+
+def get_trained_context_length(model_path, logger):
     try:
-        logger(f"Starting download of {filename} from {repo_id}...")
+        return get_model_info(model_path)["context_length"]
+    except (OSError, ValueError) as e:
+        logger(f"Could not read GGUF metadata: {e}", level="WARNING")
+        return None
 
-        hf_hub_download(
-            repo_id=repo_id,
-            filename=filename,
-            local_dir=models_dir,
-        )
 
-        logger(f"Successfully downloaded {filename}!", level="SUCCESS")
-        return True
-    except GatedRepoError as e:
-        logger(f"Access denied. This is a gated model.", level="ERROR")
-        logger(
-            "Please visit the model page on Hugging Face, accept the terms, and log in via your terminal using 'huggingface-cli login'.",
-            level="ERROR",
-        )
-        return False
-    except HfHubHTTPError as e:
-        if "401" in str(e):
-            logger(f"Authentication error (401).", level="ERROR")
+def choose_context_size(trained_context, required_tokens=None):
+    max_context = LOCAL_MAX_CONTEXT
+    if trained_context:
+        max_context = min(max_context, trained_context)
+    if required_tokens is None:
+        return max_context
+
+    context_size = (
+        -(-required_tokens // LOCAL_CONTEXT_ALIGNMENT) * LOCAL_CONTEXT_ALIGNMENT
+    )
+    return max(min(LOCAL_MIN_CONTEXT, max_context), min(context_size, max_context))
+
+
+def _get_llama_options(slot_count, profile):
+    # Each context gets an equal share of the cores, so parallel sequences do
+    # not oversubscribe the CPU.
+    cpu_count = get_available_cpu_count()
+    options = {"n_threads": LOCAL_THREADS or max(1, cpu_count // 2)}
+    options["n_threads_batch"] = cpu_count
+    if profile:
+        options.update(profile)
+    options["n_threads"] = max(1, options["n_threads"] // slot_count)
+    options["n_threads_batch"] = max(1, options["n_threads_batch"] // slot_count)
+    options["n_gpu_layers"] = get_default_gpu_layers()
+    return options
+
+
+def _get_mapped_bytes(model_path):
+    try:
+        memory_maps = psutil.Process().memory_maps(grouped=True)
+    except (AttributeError, OSError, psutil.Error):
+        return 0
+    model_path = os.path.normcase(os.path.abspath(model_path))
+    return sum(
+        memory_map.rss
+        for memory_map in memory_maps
+        if os.path.normcase(memory_map.path) == model_path
+    )
+
+
+def _is_model_busy(model):
+    return model["idle_slots"].qsize() < len(model["slots"])
+
+
+def _close_resident_model(model):
+    for llm in model["slots"]:
+        if isinstance(llm.draft_model, SpeculationStats):
+            llm.draft_model.close()
+        llm.close()
+
+
+def _unload_local_model(model_path=None):
+    global _LOCAL_MODEL_INSTANCE, _LOADED_MODEL_PATH
+
+    with _RESIDENT_MODELS_LOCK:
+        model_paths = [model_path] if model_path else list(_RESIDENT_MODELS)
+        for path in model_paths:
+            model = _RESIDENT_MODELS.pop(path, None)
+            # Contexts still in use by another sequence are left to finish and
+            # are freed once nothing references them.
+            if model is not None and not _is_model_busy(model):
+                _close_resident_model(model)
+        if _LOADED_MODEL_PATH in model_paths:
+            _LOCAL_MODEL_INSTANCE, _LOADED_MODEL_PATH = None, None
+
+
+def _evict_resident_models(keep_path, required_bytes, logger):
+    # Models are dropped least recently used first until there is room for
+    # another model and enough RAM is left for the rest of the system.
+    with _RESIDENT_MODELS_LOCK:
+        for path, model in list(_RESIDENT_MODELS.items()):
+            available_bytes = psutil.virtual_memory().available
+            low_memory = available_bytes < required_bytes + LOCAL_MIN_FREE_MEMORY_BYTES
+            too_many = (
+                required_bytes > 0
+                and len(_RESIDENT_MODELS) >= LOCAL_MAX_RESIDENT_MODELS
+            )
+            if not (low_memory or too_many):
+                return
+            if path == keep_path or _is_model_busy(model):
+                continue
+
             logger(
-                "Please ensure you are logged in via 'huggingface-cli login' and have accepted the model's terms on the Hugging Face website.",
-                level="ERROR",
+                f"Unloading {os.path.basename(path)} to make room "
+                f"({available_bytes / 1024**3:.1f} GB of RAM available)."
             )
-        else:
-            logger(f"An HTTP error occurred during download: {e}", level="ERROR")
-        return False
-    except Exception as e:
-        logger(f"Failed to download model: {e}", level="ERROR")
-        return False
+            _unload_local_model(path)
 
 
-def translate_text_with_local_model(text, logger):
+def _use_resident_model(model_path):
     global _LOCAL_MODEL_INSTANCE, _LOADED_MODEL_PATH
 
-    model_filename = os.getenv("GEMINI_MODEL_NAME")
+    with _RESIDENT_MODELS_LOCK:
+        _RESIDENT_MODELS.move_to_end(model_path)
+        model = _RESIDENT_MODELS[model_path]
+        _LOCAL_MODEL_INSTANCE, _LOADED_MODEL_PATH = model["slots"][0], model_path
+    return model
+
+
+def _load_local_model(model_filename, logger, required_tokens=None):
+    # Parallel sequences can miss the cache together after an eviction, and
+    # each would otherwise load its own copy of the weights.
+    with _MODEL_LOAD_LOCK:
+        return _load_resident_model(model_filename, logger, required_tokens)
+
+
+def _load_resident_model(model_filename, logger, required_tokens):
+    model_path = os.path.join(get_models_dir(), model_filename)
+    with _RESIDENT_MODELS_LOCK:
+        model = _RESIDENT_MODELS.get(model_path)
+    if model is not None and required_tokens is None:
+        return _use_resident_model(model_path)
+
+    trained_context = get_trained_context_length(model_path, logger)
+    context_size = choose_context_size(trained_context, required_tokens)
+    if model is not None and model["slots"][0].n_ctx() >= context_size:
+        return _use_resident_model(model_path)
+
+    slot_count = get_local_sequence_count()
+    if trained_context:
+        logger(
+            f"Loading local model: {model_filename} with a context of {context_size} "
+            f"tokens (trained for {trained_context})..."
+        )
+    else:
+        logger(
+            f"Loading local model: {model_filename} with a context of {context_size} tokens..."
+        )
+
+    if model is not None:
+        _unload_local_model(model_path)
+    _evict_resident_models(model_path, os.path.getsize(model_path), logger)
+    rss_before = psutil.Process().memory_info().rss
+    profile = load_tuning_profile(model_path)
+    if profile:
+        logger(f"Using the tuned runtime profile for this machine: {profile}")
+    llama_options = _get_llama_options(slot_count, profile)
+    speculative_mode = check_speculative_mode(
+        LOCAL_SPECULATIVE_MODE, model_path, context_size * slot_count, logger
+    )
+    if speculative_mode:
+        logger(f"Using speculative decoding ({speculative_mode}).")
+    # With mmap the weights are shared, so extra contexts only add their own
+    # KV cache.
+    slots = [
+        Llama(
+            model_path=model_path,
+            n_ctx=context_size,
+            verbose=False,
+            draft_model=create_drafter(
+                speculative_mode, model_path, context_size, llama_options
+            ),
+            **llama_options,
+            **_get_kv_cache_options(logger),
+        )
+        for _ in range(slot_count)
+    ]
+    model = {
+        "slots": slots,
+        "idle_slots": queue.Queue(),
+        "prefix_state": None,
+        "unmapped_bytes": 0,
+    }
+    if slot_count > 1:
+        logger(
+            f"Local model loaded successfully with {slot_count} parallel sequences "
+            f"of {llama_options['n_threads']} threads each.",
+            level="SUCCESS",
+        )
+    else:
+        logger("Local model loaded successfully.", level="SUCCESS")
+
+    try:
+        model["prefix_state"] = _warm_prompt_prefix(slots[0], model_path, logger)
+        for llm in slots[1:]:
+            _restore_prompt_prefix(llm, model["prefix_state"])
+    except Exception as e:
+        logger(f"Could not prepare the prompt prefix cache: {e}", level="WARNING")
+    # KV caches and compute buffers grow the process outside the mapped
+    # weights, whose resident size is read from the mapping when reported.
+    model["unmapped_bytes"] = max(
+        0,
+        psutil.Process().memory_info().rss - rss_before - _get_mapped_bytes(model_path),
+    )
+    for llm in slots:
+        model["idle_slots"].put(llm)
+    with _RESIDENT_MODELS_LOCK:
+        _RESIDENT_MODELS[model_path] = model
+    return _use_resident_model(model_path)
+
+
+def prepare_local_model(required_tokens, logger, model_filename=None):
+    model_filename = model_filename or os.getenv("GEMINI_MODEL_NAME")
     if not model_filename:
-        logger("No local model selected.", level="ERROR")
-        return {"status": "FAILED", "text": None}
+        return None
 
+    try:
+        model = _load_local_model(model_filename, logger, required_tokens)
+        return model["slots"][0].n_ctx()
+    except Exception as e:
+        logger(f"Could not load local model: {e}", level="ERROR")
+        _unload_local_model(os.path.join(get_models_dir(), model_filename))
+        return None
+
+
+def get_resident_models():
+    with _RESIDENT_MODELS_LOCK:
+        resident_models = list(_RESIDENT_MODELS.items())
+    return [
+        {
+            "file": os.path.basename(model_path),
+            "context": model["slots"][0].n_ctx(),
+            "sequences": len(model["slots"]),
+            "memory_bytes": _get_mapped_bytes(model_path) + model["unmapped_bytes"],
+            "active": model_path == _LOADED_MODEL_PATH,
+        }
+        for model_path, model in reversed(resident_models)
+    ]
+
+
+def release_local_model(model_filename):
     model_path = os.path.join(get_models_dir(), model_filename)
+    # Translate threads load and evict models at the same time, so the busy
+    # check and the unload have to see the same resident model.
+    with _RESIDENT_MODELS_LOCK:
+        model = _RESIDENT_MODELS.get(model_path)
+        if model is None:
+            return True
+        if _is_model_busy(model):
+            return False
+        _unload_local_model(model_path)
+        return True
 
+
+def _get_prompt_format(model_path):
     try:
-        if _LOADED_MODEL_PATH != model_path:
-            logger(f"Loading local model: {model_filename}...")
-            temp_llm = Llama(model_path=model_path, n_ctx=0, verbose=False)
-            model_ctx = temp_llm.context_params.n_ctx
-            del temp_llm
-            logger(f"Model context size detected: {model_ctx} tokens.")
-
-            _LOCAL_MODEL_INSTANCE = Llama(
-                model_path=model_path,
-                n_ctx=model_ctx,
-                n_gpu_layers=-1,
-                verbose=False,
-            )
-            _LOADED_MODEL_PATH = model_path
-            logger("Local model loaded successfully.", level="SUCCESS")
+        info = get_model_info(model_path)
+    except (OSError, ValueError):
+        info = None
+
+    if info is not None:
+        # The chat template shows which turn markers the model was trained
+        # with, whatever the file happens to be called.
+        chat_template = info["chat_template"] or ""
+        if "<start_of_turn>" in chat_template:
+            return "Gemma"
+        if "<|im_start|>" in chat_template:
+            return "Qwen"
+        if "[INST]" in chat_template:
+            return "Mistral"
+        architecture = info["architecture"] or ""
+        if architecture.startswith("gemma"):
+            return "Gemma"
+        if architecture.startswith("qwen"):
+            return "Qwen"
 
-        llm = _LOCAL_MODEL_INSTANCE
+    model_name_lower = os.path.basename(model_path).lower()
+    if "mistral" in model_name_lower:
+        return "Mistral"
+    elif "qwen" in model_name_lower:
+        return "Qwen"
+    return "Gemma"
 
-        base_prompt = f"""Translate the following novel chapter into English.
+
+def _build_prompt_prefix(prompt_format):
+    instructions = """Translate the following novel chapter into English.
 If the chapter has a title, enclose the translated title in double asterisks, like this: **Chapter Title**.
 If the chapter has a number, preserve it in the title like this: **Chapter 1: The Beginning**.
+The text may be one part of a longer chapter. Only add a title if the text starts with one.
 Preserve any placeholder tags like `[IMAGE_PLACEHOLDER_N]` exactly as they appear.
 If the input text uses *italics* or **bold**, preserve that formatting in the English translation.
 
----
-{text}
 ---
 """
-        model_name_lower = model_filename.lower()
-        if "mistral" in model_name_lower:
-            chat_prompt = f"[INST] {base_prompt} [/INST]"
-            logger("Using Mistral prompt format.")
-        elif "qwen" in model_name_lower:
-            chat_prompt = f"<|im_start|>system\nYou are a helpful assistant.<|im_end|>\n<|im_start|>user\n{base_prompt}<|im_end|>\n<|im_start|>assistant\n"
-            logger("Using Qwen prompt format.")
-        else:
-            chat_prompt = f"<start_of_turn>user\n{base_prompt}<end_of_turn>\n<start_of_turn>model\n"
-            logger("Using Gemma prompt format.")
-
-        logger("Generating translation with local model... (This may be slow)")
-
-        response = llm(
-            chat_prompt,
-            max_tokens=-1,
-            stop=["<end_of_turn>", "user\n", "[/INST]", "<|im_end|>"],
-            temperature=1.0,
-            top_k=64,
-            top_p=0.95,
-            min_p=0.0,
-            repeat_penalty=1.0,
+    if prompt_format == "Mistral":
+        return f"[INST] {instructions}"
+    elif prompt_format == "Qwen":
+        return f"<|im_start|>system\nYou are a helpful assistant.<|im_end|>\n<|im_start|>user\n{instructions}"
+    return f"<start_of_turn>user\n{instructions}"
+
+
+def _build_prompt_suffix(text, prompt_format):
+    body = f"{text}\n---\n"
+    # The note goes after the shared prefix, so batched requests still reuse
+    # its cached KV state.
+    chapter_count = len(CHAPTER_ID_PATTERN.findall(text))
+    if chapter_count > 1:
+        body = (
+            f"The text contains {chapter_count} chapters. Translate each one, starting it with "
+            "its `[CHAPTER_ID::...]` tag on a line of its own and ending it with a line "
+            "containing only `---`.\n\n" + body
+        )
+    if prompt_format == "Mistral":
+        return f"{body} [/INST]"
+    elif prompt_format == "Qwen":
+        return f"{body}<|im_end|>\n<|im_start|>assistant\n"
+    return f"{body}<end_of_turn>\n<start_of_turn>model\n"
+
+
+def _tokenize_prompt_prefix(llm, prompt_format):
+    return llm.tokenize(
+        _build_prompt_prefix(prompt_format).encode("utf-8"), add_bos=True, special=True
+    )
+
+
+def _tokenize_chat_prompt(llm, text, prompt_format):
+    # The instruction block and the chapter are tokenized separately so every
+    # request starts with exactly the same prefix tokens, which lets llama.cpp
+    # keep that part of the KV cache between chapters.
+    suffix_tokens = llm.tokenize(
+        _build_prompt_suffix(text, prompt_format).encode("utf-8"),
+        add_bos=False,
+        special=True,
+    )
+    return _tokenize_prompt_prefix(llm, prompt_format) + suffix_tokens
+
+
+def _get_runtime_options(llm):
+    return {
+        "llama_cpp": llama_cpp.__version__,
+        "kv_cache": LOCAL_KV_CACHE_TYPE,
+        "n_batch": llm.n_batch,
+    }
+
+
+def _fit_prefix_state(llm, state, prefix_tokens):
+    # Only the prefix tokens are kept, so a state saved with one context size
+    # can be restored into a model loaded with another.
+    input_ids = np.zeros(llm.n_ctx(), dtype=np.intc)
+    input_ids[: len(prefix_tokens)] = prefix_tokens
+    state.input_ids = input_ids
+    # Prefix logits are never sampled from because the chapter text always
+    # follows, so one broadcastable row replaces the full score matrix.
+    state.scores = np.zeros((1, llm.n_vocab()), dtype=np.single)
+    return state
+
+
+def _warm_prompt_prefix(llm, model_path, logger):
+    model_filename = os.path.basename(model_path)
+    prefix_tokens = _tokenize_prompt_prefix(llm, _get_prompt_format(model_path))
+    try:
+        state_key = make_prefix_state_key(
+            model_path, prefix_tokens, _get_runtime_options(llm)
         )
-        translated_text = response["choices"][0]["text"]
+        state = load_prefix_state(model_filename, state_key)
+    except OSError:
+        state_key, state = None, None
+
+    if state is not None:
+        try:
+            state = _fit_prefix_state(llm, state, prefix_tokens)
+            llm.load_state(state)
+            logger(
+                f"Restored the cached {len(prefix_tokens)}-token instruction prefix."
+            )
+            return prefix_tokens, state
+        except (RuntimeError, ValueError):
+            llm.reset()
+
+    start_time = time.time()
+    llm.reset()
+    llm.eval(prefix_tokens)
+    state = _fit_prefix_state(llm, llm.save_state(), prefix_tokens)
+    logger(
+        f"Evaluated the {len(prefix_tokens)}-token instruction prefix in "
+        f"{time.time() - start_time:.1f}s."
+    )
+
+    if state_key is not None:
+        try:
+            save_prefix_state(model_filename, state_key, state)
+        except OSError as e:
+            logger(f"Could not save the prompt prefix cache: {e}", level="WARNING")
+    return prefix_tokens, state
+
+
+def _restore_prompt_prefix(llm, prefix_state):
+    if prefix_state is None:
+        return
+
+    prefix_tokens, state = prefix_state
+    prefix_length = len(prefix_tokens)
+    if llm.n_tokens >= prefix_length:
+        if llm.input_ids[:prefix_length].tolist() == prefix_tokens:
+            return
+    llm.load_state(state)
+
+
+def count_local_tokens(text):
+    if _LOCAL_MODEL_INSTANCE is None:
+        return None
+    return len(_LOCAL_MODEL_INSTANCE.tokenize(text.encode("utf-8"), add_bos=False))
+
+
+def count_local_tokens_many(texts):
+    if _LOCAL_MODEL_INSTANCE is None:
+        return None
+    return [
+        len(_LOCAL_MODEL_INSTANCE.tokenize(text.encode("utf-8"), add_bos=False))
+        for text in texts
+    ]
+
+
+def get_local_input_budget(sample_text):
+    if _LOCAL_MODEL_INSTANCE is None or _LOADED_MODEL_PATH is None:
+        return None
+
+    prompt_format = _get_prompt_format(_LOADED_MODEL_PATH)
+    prompt_tokens = len(_tokenize_chat_prompt(_LOCAL_MODEL_INSTANCE, "", prompt_format))
+    available_tokens = _LOCAL_MODEL_INSTANCE.n_ctx() - prompt_tokens
+    return max(1, int(available_tokens / (1 + get_output_reserve_ratio(sample_text))))
+
+
+def tune_local_model(model_filename, logger):
+    model_path = os.path.join(get_models_dir(), model_filename)
+    logger(f"Tuning llama.cpp runtime settings for {model_filename}...")
+    # The loaded model is released first so trial loads do not compete with
+    # it for memory. The next translation reloads it with the new profile.
+    _unload_local_model()
+    try:
+        return tune_runtime_settings(model_path, logger)
+    except Exception as e:
+        logger(f"Runtime tuning failed: {e}", level="ERROR")
+        return None
+
+
+def benchmark_local_models(model_filenames, logger):
+    # Every model is timed on its own, so none of them stays loaded.
+    _unload_local_model()
+    results = {}
+    for model_filename in model_filenames:
+        model_path = os.path.join(get_models_dir(), model_filename)
+        logger(f"Benchmarking {model_filename}...")
+        # One sequence with the threads a translation would use, so the
+        # figures match what the model does on this machine.
+        llama_options = _get_llama_options(1, load_tuning_profile(model_path))
+        try:
+            stats = benchmark_model(model_path, llama_options)
+        except Exception as e:
+            logger(f"Benchmark of {model_filename} failed: {e}", level="ERROR")
+            continue
+
+        results[model_filename] = stats
+        logger(
+            f"{model_filename}: {stats['prompt_tokens_per_second']} prompt tokens/s, "
+            f"{stats['generation_tokens_per_second']} generated tokens/s.",
+            level="SUCCESS",
+        )
+    return results
+
+
+def _fit_benchmark_prompt(llm, text, prompt_format):
+    prompt_tokens = len(_tokenize_chat_prompt(llm, "", prompt_format))
+    # A small margin covers tokens that merge differently after the cut.
+    text_budget = llm.n_ctx() - prompt_tokens - LOCAL_SPECULATIVE_BENCHMARK_TOKENS - 16
+    text_tokens = llm.tokenize(text.encode("utf-8"), add_bos=False)
+    if len(text_tokens) > text_budget:
+        text = llm.detokenize(text_tokens[:text_budget]).decode("utf-8", "ignore")
+    return _tokenize_chat_prompt(llm, text, prompt_format)
+
+
+def _run_speculative_benchmark(model_path, mode, chat_tokens, llama_options, logger):
+    drafter = create_drafter(
+        mode, model_path, LOCAL_SPECULATIVE_BENCHMARK_CONTEXT, llama_options
+    )
+    llm = Llama(
+        model_path=model_path,
+        n_ctx=LOCAL_SPECULATIVE_BENCHMARK_CONTEXT,
+        verbose=False,
+        draft_model=drafter,
+        **llama_options,
+        **_get_kv_cache_options(logger),
+    )
+    try:
+        start_time = time.perf_counter()
+        text, _, generated_tokens = _generate_streaming(
+            llm,
+            chat_tokens,
+            LOCAL_SPECULATIVE_BENCHMARK_TOKENS,
+            LOCAL_SPECULATIVE_BENCHMARK_TOKENS,
+            None,
+            None,
+            _BENCHMARK_SAMPLING_OPTIONS,
+        )
+        seconds = time.perf_counter() - start_time
+    finally:
+        llm.close()
+        if drafter is not None:
+            drafter.close()
+
+    return {
+        "text": text,
+        "tokens": generated_tokens,
+        "seconds": seconds,
+        "drafted_tokens": drafter.drafted_tokens if drafter else 0,
+        "acceptance_rate": drafter.acceptance_rate if drafter else None,
+    }
+
+
+def benchmark_speculative_decoding(model_filename, sample_text, logger):
+    model_path = os.path.join(get_models_dir(), model_filename)
+    logger(f"Benchmarking speculative decoding for {model_filename}...")
+    # Like tuning, the benchmark loads its own contexts, so the regular
+    # model is released first and reloaded by the next translation.
+    _unload_local_model()
+    llama_options = _get_llama_options(1, load_tuning_profile(model_path))
+
+    try:
+        llm = Llama(
+            model_path=model_path,
+            n_ctx=LOCAL_SPECULATIVE_BENCHMARK_CONTEXT,
+            verbose=False,
+            **llama_options,
+        )
+        try:
+            chat_tokens = _fit_benchmark_prompt(
+                llm, sample_text, _get_prompt_format(model_path)
+            )
+        finally:
+            llm.close()
+        logger(f"Sample prompt: {len(chat_tokens)} tokens.")
+
+        # Prompt evaluation is part of every timing, because drafting makes
+        # llama-cpp-python keep the logits of each prompt position too.
+        baseline = _run_speculative_benchmark(
+            model_path, None, chat_tokens, llama_options, logger
+        )
+        results = {"baseline": baseline}
+        logger(
+            f"Baseline: {baseline['tokens']} tokens in {baseline['seconds']:.1f}s "
+            f"({baseline['tokens'] / baseline['seconds']:.2f} tokens/s)."
+        )
+        for mode in SPECULATIVE_MODES:
+            if not check_speculative_mode(
+                mode, model_path, LOCAL_SPECULATIVE_BENCHMARK_CONTEXT, logger
+            ):
+                continue
+            result = _run_speculative_benchmark(
+                model_path, mode, chat_tokens, llama_options, logger
+            )
+            result["speedup"] = (baseline["seconds"] / max(baseline["tokens"], 1)) / (
+                result["seconds"] / max(result["tokens"], 1)
+            )
+            results[mode] = result
+            logger(
+                f"{mode}: {result['tokens']} tokens in {result['seconds']:.1f}s, "
+                f"{result['acceptance_rate']:.0%} of {result['drafted_tokens']} drafted "
+                f"tokens accepted, {result['speedup']:.2f}x end-to-end speedup.",
+                level="SUCCESS",
+            )
+            if result["text"] != baseline["text"]:
+                logger(
+                    f"{mode} produced a slightly different translation than the baseline.",
+                    level="WARNING",
+                )
+        return {
+            mode: {key: value for key, value in result.items() if key != "text"}
+            for mode, result in results.items()
+        }
+    except Exception as e:
+        logger(f"Speculative decoding benchmark failed: {e}", level="ERROR")
+        return None
+
+
+def _build_output_grammar(text, logger):
+    if not LOCAL_CONSTRAIN_OUTPUT:
+        return None
+    grammar_text = build_output_grammar(text)
+    if grammar_text is None:
+        return None
+    try:
+        return LlamaGrammar.from_string(grammar_text, verbose=False)
+    except (ValueError, RuntimeError) as e:
+        logger(f"Could not build the output grammar: {e}", level="WARNING")
+        return None
+
+
+def _make_cancel_criteria(cancel_event):
+    if cancel_event is None:
+        return None
+    return StoppingCriteriaList([lambda input_ids, logits: cancel_event.is_set()])
+
+
+def _generate_streaming(
+    llm,
+    chat_tokens,
+    max_tokens,
+    expected_tokens,
+    cancel_event,
+    progress_callback,
+    sampling_options=_SAMPLING_OPTIONS,
+    grammar=None,
+    watchdog=None,
+):
+    # Tokens are collected into a partial buffer as they arrive, so a
+    # cancelled request still returns what was generated so far.
+    partial_text, finish_reason = [], None
+    generated_tokens = 0
+    start_time = last_report = time.time()
+    for chunk in llm(
+        chat_tokens,
+        max_tokens=max_tokens,
+        stop=["<end_of_turn>", "user\n", "[/INST]", "<|im_end|>"],
+        stopping_criteria=_make_cancel_criteria(cancel_event),
+        grammar=grammar,
+        stream=True,
+        **sampling_options,
+    ):
+        choice = chunk["choices"][0]
+        partial_text.append(choice["text"])
+        if choice.get("finish_reason"):
+            finish_reason = choice["finish_reason"]
+            continue
+        generated_tokens += 1
+        if watchdog is not None:
+            finish_reason = watchdog.check(choice["text"])
+            if finish_reason:
+                break
+
+        now = time.time()
+        if progress_callback and now - last_report >= LOCAL_STREAM_PROGRESS_INTERVAL:
+            last_report = now
+            tokens_per_second = generated_tokens / max(now - start_time, 1e-6)
+            remaining_tokens = max(0, expected_tokens - generated_tokens)
+            progress_callback(
+                generated_tokens,
+                expected_tokens,
+                tokens_per_second,
+                remaining_tokens / tokens_per_second,
+            )
+    return "".join(partial_text), finish_reason, generated_tokens
+
+
+def _generate_with_watchdog(
+    llm,
+    prefix_state,
+    chat_tokens,
+    text_tokens,
+    output_reserve,
+    cancel_event,
+    progress_callback,
+    grammar,
+    logger,
+):
+    context_room = llm.n_ctx() - len(chat_tokens)
+    # A translation is never many times longer than its source, so output
+    # past that is a runaway and not worth the context it would fill.
+    output_cap = min(
+        context_room,
+        max(LOCAL_MIN_OUTPUT_CAP_TOKENS, int(text_tokens * LOCAL_MAX_OUTPUT_RATIO)),
+    )
+    sampling_options = _SAMPLING_OPTIONS
+    total_tokens = 0
+    for attempt in range(LOCAL_WATCHDOG_RETRIES + 1):
+        _restore_prompt_prefix(llm, prefix_state)
+        speculation_stats = llm.draft_model
+        if isinstance(speculation_stats, SpeculationStats):
+            speculation_stats.reset()
+
+        translated_text, finish_reason, generated_tokens = _generate_streaming(
+            llm,
+            chat_tokens,
+            output_cap,
+            output_reserve,
+            cancel_event,
+            progress_callback,
+            sampling_options,
+            grammar,
+            GenerationWatchdog(),
+        )
+        total_tokens += generated_tokens
+        if isinstance(speculation_stats, SpeculationStats):
+            logger(
+                f"Speculative decoding accepted {speculation_stats.acceptance_rate:.0%} "
+                f"of {speculation_stats.drafted_tokens} drafted tokens."
+            )
+
+        if finish_reason == "length" and output_cap < context_room:
+            finish_reason = "output cap"
+        if finish_reason not in ("repetition", "stalled", "output cap") or (
+            cancel_event is not None and cancel_event.is_set()
+        ):
+            return translated_text, finish_reason, total_tokens
+
+        logger(
+            f"Stopped a runaway generation ({finish_reason}) after {generated_tokens} tokens, "
+            f"saving up to {context_room - generated_tokens} tokens of generation.",
+            level="WARNING",
+        )
+        if attempt < LOCAL_WATCHDOG_RETRIES:
+            logger("Retrying with a lower temperature and a repetition penalty...")
+            sampling_options = _RETRY_SAMPLING_OPTIONS
+    return translated_text, "runaway", total_tokens
+
+
+def translate_text_with_local_model(
+    text, logger, model_filename=None, cancel_event=None, progress_callback=None
+):
+    model_filename = model_filename or os.getenv("GEMINI_MODEL_NAME")
+    if not model_filename:
+        logger("No local model selected.", level="ERROR")
+        return {"status": "FAILED", "text": None}
+
+    model_path = os.path.join(get_models_dir(), model_filename)
+    try:
+        model = _load_local_model(model_filename, logger)
+        idle_slots = model["idle_slots"]
+        llm = idle_slots.get()
+    except Exception as e:
+        logger(f"An error occurred during local inference: {e}", level="ERROR")
+        _unload_local_model(model_path)
+        return {"status": "FAILED", "text": None}
+
+    try:
+        # The context goes back to the pool on every path, or the model
+        # would count as busy forever and never be closed on unload.
+        try:
+            prompt_format = _get_prompt_format(model_path)
+            chat_tokens = _tokenize_chat_prompt(llm, text, prompt_format)
+            logger(f"Using {prompt_format} prompt format.")
+
+            prompt_tokens = len(chat_tokens)
+            text_tokens = len(llm.tokenize(text.encode("utf-8"), add_bos=False))
+            output_reserve = int(text_tokens * get_output_reserve_ratio(text))
+            if prompt_tokens + output_reserve > llm.n_ctx():
+                logger(
+                    f"Text needs {prompt_tokens} prompt tokens plus about {output_reserve} output tokens, "
+                    f"which does not fit the {llm.n_ctx()}-token context.",
+                    level="WARNING",
+                )
+                return {"status": "TOKEN_LIMIT_EXCEEDED", "text": None}
+
+            logger("Generating translation with local model...")
+            # The grammar keeps the title line and every image placeholder in
+            # place, so a generation is never wasted on a broken structure.
+            grammar = _build_output_grammar(text, logger)
+            translated_text, finish_reason, generated_tokens = _generate_with_watchdog(
+                llm,
+                model["prefix_state"],
+                chat_tokens,
+                text_tokens,
+                output_reserve,
+                cancel_event,
+                progress_callback,
+                grammar,
+                logger,
+            )
+        finally:
+            idle_slots.put(llm)
+        _evict_resident_models(model_path, 0, logger)
+
+        if cancel_event is not None and cancel_event.is_set():
+            logger(
+                f"Local generation cancelled after {generated_tokens} tokens.",
+                level="WARNING",
+            )
+            return {
+                "status": "CANCELLED",
+                "text": translated_text,
+                "tokens": generated_tokens,
+            }
+
+        if finish_reason in ("length", "runaway"):
+            if finish_reason == "length":
+                logger(
+                    "Local model ran out of context before finishing the translation.",
+                    level="WARNING",
+                )
+            else:
+                logger(
+                    "Local model kept running away after adjusting its sampling.",
+                    level="WARNING",
+                )
+            return {
+                "status": "OUTPUT_TRUNCATED",
+                "text": translated_text,
+                "tokens": generated_tokens,
+            }
 
         logger("Local translation received.", level="SUCCESS")
-        return {"status": "SUCCESS", "text": translated_text}
+        return {
+            "status": "SUCCESS",
+            "text": translated_text,
+            "tokens": generated_tokens,
+        }
 
     except Exception as e:
         logger(f"An error occurred during local inference: {e}", level="ERROR")
-        _LOCAL_MODEL_INSTANCE, _LOADED_MODEL_PATH = None, None
+        # Other sequences may still be running on the old contexts. They
+        # finish normally and return their slots to the discarded queue.
+        if _RESIDENT_MODELS.get(model_path) is model:
+            _unload_local_model(model_path)
         return {"status": "FAILED", "text": None}
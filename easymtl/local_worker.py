@@ -0,0 +1,411 @@
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import psutil
+
+from .config import (
+    LOCAL_WORKER_CANCEL_TIMEOUT_SECONDS,
+    LOCAL_WORKER_CPU_AFFINITY,
+    LOCAL_WORKER_PRIORITY,
+)
+from .local_budget import get_local_sequence_count
+from .utils import get_models_dir, log_message
+
+_PRIORITY_NICE_VALUES = {"idle": 19, "below_normal": 10, "normal": 0}
+_PRIORITY_CLASS_NAMES = {
+    "idle": "IDLE_PRIORITY_CLASS",
+    "below_normal": "BELOW_NORMAL_PRIORITY_CLASS",
+    "normal": "NORMAL_PRIORITY_CLASS",
+}
+_WORKER_EXITED = object()
+_WORKER = None
+_WORKER_LOCK = threading.Lock()
+_PREPARED_MODEL = None
+
+
+def _apply_process_settings(priority, cpu_affinity, logger):
+    process = psutil.Process()
+    try:
+        if os.name == "nt":
+            process.nice(getattr(psutil, _PRIORITY_CLASS_NAMES[priority]))
+        else:
+            process.nice(_PRIORITY_NICE_VALUES[priority])
+    except (KeyError, OSError, psutil.Error) as e:
+        logger(f"Could not set worker priority '{priority}': {e}", level="WARNING")
+
+    if cpu_affinity:
+        try:
+            process.cpu_affinity(list(cpu_affinity))
+        except (AttributeError, ValueError, OSError, psutil.Error) as e:
+            logger(f"Could not set worker CPU affinity: {e}", level="WARNING")
+
+
+def _run_worker(request_queue, response_queue, cancel_event, priority, cpu_affinity):
+    # llama.cpp is only imported in the worker process, so the GUI process
+    # never loads it.
+    from .local_translator import (
+        benchmark_local_models as _benchmark_models_in_process,
+        benchmark_speculative_decoding as _benchmark_speculative_in_process,
+        count_local_tokens as _count_tokens_in_process,
+        count_local_tokens_many as _count_tokens_many_in_process,
+        get_local_input_budget as _get_input_budget_in_process,
+        get_resident_models as _get_resident_models_in_process,
+        prepare_local_model as _prepare_in_process,
+        release_local_model as _release_in_process,
+        translate_text_with_local_model as _translate_in_process,
+        tune_local_model as _tune_in_process,
+    )
+    from .runtime_tuning import load_model_benchmark as _load_benchmark_in_process
+
+    def make_logger(request_id):
+        def logger(message, level="INFO"):
+            response_queue.put(("log", request_id, (message, level)))
+
+        return logger
+
+    def translate(request_id, model_filename, text):
+        def report_progress(*progress):
+            response_queue.put(("progress", request_id, progress))
+
+        try:
+            result = _translate_in_process(
+                text,
+                make_logger(request_id),
+                model_filename,
+                cancel_event,
+                report_progress,
+            )
+        except Exception as e:
+            make_logger(request_id)(f"Local worker error: {e}", level="ERROR")
+            result = {"status": "FAILED", "text": None}
+        response_queue.put(("result", request_id, result))
+
+    _apply_process_settings(priority, cpu_affinity, make_logger(None))
+    # Translations run on their own threads so token counting stays
+    # responsive while the model is generating.
+    executor = ThreadPoolExecutor(max_workers=get_local_sequence_count())
+    while True:
+        kind, request_id, payload = request_queue.get()
+        if kind == "shutdown":
+            break
+
+        result = None
+        try:
+            if kind == "translate":
+                executor.submit(translate, request_id, *payload)
+                continue
+            elif kind == "prepare":
+                model_filename, required_tokens = payload
+                result = _prepare_in_process(
+                    required_tokens, make_logger(request_id), model_filename
+                )
+            elif kind == "count_tokens":
+                result = _count_tokens_in_process(payload)
+            elif kind == "count_tokens_many":
+                result = _count_tokens_many_in_process(payload)
+            elif kind == "input_budget":
+                result = _get_input_budget_in_process(payload)
+            elif kind == "tune":
+                result = _tune_in_process(payload, make_logger(request_id))
+            elif kind == "resident_models":
+                result = _get_resident_models_in_process()
+            elif kind == "release":
+                result = _release_in_process(payload)
+            elif kind == "model_benchmark":
+                result = _load_benchmark_in_process(
+                    os.path.join(get_models_dir(), payload)
+                )
+            elif kind == "benchmark_models":
+                result = _benchmark_models_in_process(payload, make_logger(request_id))
+            elif kind == "benchmark_speculative":
+                model_filename, sample_text = payload
+                result = _benchmark_speculative_in_process(
+                    model_filename, sample_text, make_logger(request_id)
+                )
+        except Exception as e:
+            make_logger(request_id)(f"Local worker error: {e}", level="ERROR")
+        response_queue.put(("result", request_id, result))
+
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+class LocalInferenceWorker:
+    def __init__(self, logger):
+        self._logger = logger
+        self._context = multiprocessing.get_context("spawn")
+        self._request_queue = self._context.Queue()
+        self._response_queue = self._context.Queue()
+        self._cancel_event = self._context.Event()
+        self._pending = {}
+        self._request_ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._cancel_requested_at = None
+        self._stopping = False
+        self._closed = False
+        self._process = self._context.Process(
+            target=_run_worker,
+            args=(
+                self._request_queue,
+                self._response_queue,
+                self._cancel_event,
+                LOCAL_WORKER_PRIORITY,
+                LOCAL_WORKER_CPU_AFFINITY,
+            ),
+            name="EasyMTL-LocalInference",
+            daemon=True,
+        )
+
+    def start(self):
+        self._process.start()
+        threading.Thread(target=self._read_responses, daemon=True).start()
+
+    def is_alive(self):
+        return self._process.is_alive()
+
+    def _read_responses(self):
+        while True:
+            try:
+                kind, request_id, payload = self._response_queue.get(timeout=0.5)
+            except queue.Empty:
+                if self._process.is_alive():
+                    continue
+                break
+            except (EOFError, OSError):
+                break
+
+            with self._lock:
+                pending = self._pending.get(request_id)
+            if kind == "log":
+                message, level = payload
+                logger = pending[1] if pending else self._logger
+                logger(message, level=level)
+            elif kind == "progress" and pending and pending[2]:
+                pending[2](*payload)
+            elif kind == "result" and pending:
+                with self._lock:
+                    self._pending.pop(request_id, None)
+                pending[0].put(payload)
+
+        if not self._stopping:
+            self._logger(
+                f"Local inference worker exited unexpectedly (exit code {self._process.exitcode}).",
+                level="ERROR",
+            )
+        with self._lock:
+            self._closed = True
+            pending_requests = list(self._pending.values())
+            self._pending.clear()
+        for result_queue, *_ in pending_requests:
+            result_queue.put(_WORKER_EXITED)
+
+    def request(self, kind, payload, logger, progress_callback=None):
+        request_id = next(self._request_ids)
+        result_queue = queue.Queue(maxsize=1)
+        with self._lock:
+            if self._closed:
+                return _WORKER_EXITED
+            # A Stop only applies to the translations it interrupted, so any
+            # other request made once they are done starts uncancelled.
+            if kind != "translate" and not any(
+                pending[3] == "translate" for pending in self._pending.values()
+            ):
+                self.clear_cancel()
+            self._pending[request_id] = (
+                result_queue,
+                logger,
+                progress_callback,
+                kind,
+            )
+            started_at = time.monotonic()
+        self._request_queue.put((kind, request_id, payload))
+
+        while True:
+            try:
+                return result_queue.get(timeout=0.5)
+            except queue.Empty:
+                pass
+
+            # Prompt evaluation cannot be interrupted, so a worker that
+            # ignores the cancel flag for too long is terminated instead.
+            cancel_requested_at = self._cancel_requested_at
+            if (
+                kind == "translate"
+                and cancel_requested_at is not None
+                and cancel_requested_at >= started_at
+                and self._process.is_alive()
+                and time.monotonic() - cancel_requested_at
+                > LOCAL_WORKER_CANCEL_TIMEOUT_SECONDS
+            ):
+                logger(
+                    "Local inference worker did not stop in time. Terminating it.",
+                    level="WARNING",
+                )
+                self.terminate()
+
+    def cancel(self):
+        if self._cancel_requested_at is None:
+            self._cancel_requested_at = time.monotonic()
+        self._cancel_event.set()
+
+    def clear_cancel(self):
+        self._cancel_requested_at = None
+        self._cancel_event.clear()
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    def shutdown(self, timeout=5):
+        self._stopping = True
+        if self._process.is_alive():
+            self._cancel_event.set()
+            self._request_queue.put(("shutdown", None, None))
+            self._process.join(timeout)
+        if self._process.is_alive():
+            self._process.terminate()
+
+    def terminate(self):
+        self._stopping = True
+        if self._process.is_alive():
+            self._process.terminate()
+            self._process.join(5)
+
+
+def _get_worker(logger):
+    global _WORKER
+
+    with _WORKER_LOCK:
+        if _WORKER is not None and _WORKER.is_alive():
+            return _WORKER
+
+        was_running = _WORKER is not None
+        _WORKER = LocalInferenceWorker(logger)
+        _WORKER.start()
+        # A restarted worker reloads the model with the context the current
+        # run asked for instead of the model's largest one.
+        if was_running and _PREPARED_MODEL:
+            model_filename, required_tokens = _PREPARED_MODEL
+            logger(f"Restarting local inference worker with {model_filename}...")
+            _WORKER.request("prepare", (model_filename, required_tokens), logger)
+        return _WORKER
+
+
+def prepare_local_model(required_tokens, logger):
+    global _PREPARED_MODEL
+
+    model_filename = os.getenv("GEMINI_MODEL_NAME")
+    if not model_filename:
+        return None
+
+    _PREPARED_MODEL = (model_filename, required_tokens)
+    worker = _get_worker(logger)
+    worker.clear_cancel()
+    result = worker.request("prepare", _PREPARED_MODEL, logger)
+    return None if result is _WORKER_EXITED else result
+
+
+def translate_text_with_local_model(text, logger, progress_callback=None):
+    model_filename = os.getenv("GEMINI_MODEL_NAME")
+    if not model_filename:
+        logger("No local model selected.", level="ERROR")
+        return {"status": "FAILED", "text": None}
+
+    worker = _get_worker(logger)
+    if worker.is_cancelled():
+        return {"status": "CANCELLED", "text": None}
+
+    result = worker.request(
+        "translate", (model_filename, text), logger, progress_callback
+    )
+    if result is _WORKER_EXITED:
+        status = "CANCELLED" if worker.is_cancelled() else "FAILED"
+        return {"status": status, "text": None}
+    return result
+
+
+def count_local_tokens(text):
+    result = _get_worker(log_message).request("count_tokens", text, log_message)
+    return None if result is _WORKER_EXITED else result
+
+
+def count_local_tokens_many(texts):
+    result = _get_worker(log_message).request("count_tokens_many", texts, log_message)
+    return None if result is _WORKER_EXITED else result
+
+
+def get_local_input_budget(sample_text):
+    result = _get_worker(log_message).request("input_budget", sample_text, log_message)
+    return None if result is _WORKER_EXITED else result
+
+
+def tune_local_model(model_filename, logger):
+    result = _get_worker(logger).request("tune", model_filename, logger)
+    return None if result is _WORKER_EXITED else result
+
+
+def benchmark_local_models(model_filenames, logger):
+    result = _get_worker(logger).request("benchmark_models", model_filenames, logger)
+    return None if result is _WORKER_EXITED else result
+
+
+def load_model_benchmark(model_filename, logger):
+    # The benchmark is keyed by the llama.cpp build, which only the worker
+    # process can inspect.
+    result = _get_worker(logger).request("model_benchmark", model_filename, logger)
+    return None if result is _WORKER_EXITED else result
+
+
+def benchmark_speculative_decoding(model_filename, sample_text, logger):
+    result = _get_worker(logger).request(
+        "benchmark_speculative", (model_filename, sample_text), logger
+    )
+    return None if result is _WORKER_EXITED else result
+
+
+def cancel_local_generation():
+    worker = _WORKER
+    if worker is not None and worker.is_alive():
+        worker.cancel()
+
+
+def clear_local_cancel():
+    worker = _WORKER
+    if worker is not None:
+        worker.clear_cancel()
+
+
+def get_resident_models():
+    # Reporting never starts a worker just to find it has nothing loaded.
+    worker = _WORKER
+    if worker is None or not worker.is_alive():
+        return []
+    result = worker.request("resident_models", None, log_message)
+    return [] if result is _WORKER_EXITED or result is None else result
+
+
+def release_local_model(model_filename):
+    global _PREPARED_MODEL
+
+    if _PREPARED_MODEL and _PREPARED_MODEL[0] == model_filename:
+        _PREPARED_MODEL = None
+    worker = _WORKER
+    if worker is None or not worker.is_alive():
+        return
+
+    # Windows cannot delete a model file that the worker still has mapped, so
+    # a model that is busy translating takes the whole worker down with it.
+    result = worker.request("release", model_filename, log_message)
+    if result is not True:
+        shutdown_local_worker()
+
+
+def shutdown_local_worker():
+    global _WORKER
+
+    with _WORKER_LOCK:
+        if _WORKER is not None:
+            _WORKER.shutdown()
+            _WORKER = None
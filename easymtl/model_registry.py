@@ -0,0 +1,125 @@
+import json
+import os
+import threading
+
+from .gguf import get_context_length, get_file_type_name, read_gguf_header
+from .utils import get_app_data_dir, get_models_dir, scan_for_local_models
+
+MODEL_REGISTRY_FILENAME = "model_registry.json"
+_REGISTRY = None
+_REGISTRY_LOCK = threading.Lock()
+
+
+def _get_registry_path():
+    return os.path.join(get_app_data_dir(), MODEL_REGISTRY_FILENAME)
+
+
+def _get_registry():
+    global _REGISTRY
+
+    if _REGISTRY is None:
+        try:
+            with open(_get_registry_path(), "r", encoding="utf-8") as f:
+                _REGISTRY = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            _REGISTRY = {}
+    return _REGISTRY
+
+
+def _save_registry(registry):
+    registry_path = _get_registry_path()
+    temp_path = registry_path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(registry, f, indent=2)
+    os.replace(temp_path, registry_path)
+
+
+def _read_model_info(model_path):
+    metadata, parameter_count = read_gguf_header(model_path)
+    return {
+        "name": metadata.get("general.name"),
+        "architecture": metadata.get("general.architecture"),
+        "parameters": parameter_count,
+        "quantization": get_file_type_name(metadata.get("general.file_type")),
+        "context_length": get_context_length(metadata),
+        "chat_template": metadata.get("tokenizer.chat_template"),
+        "tokenizer": metadata.get("tokenizer.ggml.model"),
+        "vocab_size": metadata.get("tokenizer.ggml.tokens"),
+        "bos_token_id": metadata.get("tokenizer.ggml.bos_token_id"),
+        "eos_token_id": metadata.get("tokenizer.ggml.eos_token_id"),
+        "file_size": os.path.getsize(model_path),
+    }
+
+
+def get_model_info(model_path):
+    model_path = os.path.abspath(model_path)
+    stat = os.stat(model_path)
+    with _REGISTRY_LOCK:
+        entry = _get_registry().get(model_path)
+    # A replaced or re-downloaded file changes its size or mtime, which makes
+    # the cached header stale.
+    if entry and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+        return entry["info"]
+
+    info = _read_model_info(model_path)
+    with _REGISTRY_LOCK:
+        registry = _get_registry()
+        registry[model_path] = {
+            "mtime": stat.st_mtime,
+            "size": stat.st_size,
+            "info": info,
+        }
+        try:
+            _save_registry(registry)
+        except OSError:
+            pass
+    return info
+
+
+def get_local_model_info(model_filename):
+    return get_model_info(os.path.join(get_models_dir(), model_filename))
+
+
+def forget_model_info(model_filename):
+    model_path = os.path.abspath(os.path.join(get_models_dir(), model_filename))
+    with _REGISTRY_LOCK:
+        registry = _get_registry()
+        if registry.pop(model_path, None) is not None:
+            try:
+                _save_registry(registry)
+            except OSError:
+                pass
+
+
+def list_local_models():
+    models = []
+    for model_filename in scan_for_local_models():
+        try:
+            info = get_local_model_info(model_filename)
+        except (OSError, ValueError):
+            info = None
+        models.append((model_filename, info))
+    return models
+
+
+def format_parameter_count(parameter_count):
+    if parameter_count >= 1e9:
+        return f"{parameter_count / 1e9:.1f}B"
+    return f"{parameter_count / 1e6:.0f}M"
+
+
+def describe_model(info):
+    if info is None:
+        return "Could not read the GGUF header of this file."
+
+    details = [
+        info["name"] or "Unnamed model",
+        f"Architecture: {info['architecture'] or 'unknown'}",
+        f"Parameters: {format_parameter_count(info['parameters'])}",
+        f"Quantization: {info['quantization'] or 'unknown'}",
+        f"Trained context: {info['context_length'] or 'unknown'} tokens",
+        f"File size: {info['file_size'] / 1024**3:.2f} GB",
+    ]
+    if not info["chat_template"]:
+        details.append("No chat template in the file.")
+    return "\n".join(details)
@@ -0,0 +1,165 @@
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .config import (
+    OPENAI_COMPAT_BASE_URL,
+    OPENAI_COMPAT_MAX_CONCURRENT_REQUESTS,
+    OPENAI_COMPAT_MODEL_PREFIX,
+    OPENAI_COMPAT_OUTPUT_TOKEN_LIMIT,
+    OPENAI_COMPAT_TIMEOUT_SECONDS,
+)
+from .translator import build_translation_prompt, trim_to_complete_chapters
+
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
+
+
+def get_base_url():
+    base_url = os.getenv("OPENAI_BASE_URL") or OPENAI_COMPAT_BASE_URL
+    return base_url.rstrip("/") if base_url else None
+
+
+def is_server_model(model_name):
+    return bool(model_name) and model_name.startswith(OPENAI_COMPAT_MODEL_PREFIX)
+
+
+def get_session():
+    global _SESSION
+
+    with _SESSION_LOCK:
+        if _SESSION is None:
+            # Every concurrent request keeps its own keep-alive connection in
+            # the pool, so chunks do not pay for a new connection each.
+            adapter = HTTPAdapter(
+                pool_connections=1,
+                pool_maxsize=max(1, OPENAI_COMPAT_MAX_CONCURRENT_REQUESTS),
+            )
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _SESSION = session
+        return _SESSION
+
+
+def _get_headers():
+    api_key = os.getenv("OPENAI_API_KEY")
+    return {"Authorization": f"Bearer {api_key}"} if api_key else {}
+
+
+def _get_retry_after(response):
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _get_error_message(response):
+    try:
+        error = response.json().get("error", {})
+        message = error.get("message") if isinstance(error, dict) else error
+    except (ValueError, AttributeError):
+        message = None
+    return str(message or response.text[:500] or response.reason)
+
+
+def list_server_models(logger):
+    base_url = get_base_url()
+    if not base_url:
+        return []
+
+    try:
+        response = get_session().get(
+            f"{base_url}/models", headers=_get_headers(), timeout=10
+        )
+        response.raise_for_status()
+        return [
+            OPENAI_COMPAT_MODEL_PREFIX + model["id"]
+            for model in response.json().get("data", [])
+        ]
+    except (requests.RequestException, ValueError, KeyError, TypeError) as e:
+        logger(f"Could not list models on {base_url}: {e}", level="WARNING")
+        return []
+
+
+def translate_text_with_server(text, logger, is_retry=False):
+    base_url = get_base_url()
+    if not base_url:
+        logger("No OpenAI-compatible server URL is configured.", level="ERROR")
+        return {"status": "FAILED", "text": None}
+
+    prompt = build_translation_prompt(text, is_retry)
+    if is_retry:
+        logger("Retrying translation with additional instructions...", level="WARNING")
+    else:
+        logger(f"Sending text to {base_url} for translation...")
+
+    model_name = os.getenv("GEMINI_MODEL_NAME", "")
+    payload = {
+        "model": model_name[len(OPENAI_COMPAT_MODEL_PREFIX) :],
+        "messages": [{"role": "user", "content": prompt}],
+        "max_tokens": OPENAI_COMPAT_OUTPUT_TOKEN_LIMIT,
+    }
+    try:
+        response = get_session().post(
+            f"{base_url}/chat/completions",
+            json=payload,
+            headers=_get_headers(),
+            timeout=OPENAI_COMPAT_TIMEOUT_SECONDS,
+        )
+    except requests.RequestException as e:
+        logger(f"Request to the translation server failed: {e}", level="ERROR")
+        return {"status": "FAILED", "text": None}
+
+    if response.status_code == 429:
+        logger(
+            f"Translation server is busy: {_get_error_message(response)}",
+            level="WARNING",
+        )
+        return {
+            "status": "QUOTA_EXCEEDED",
+            "text": None,
+            "retry_after": _get_retry_after(response),
+        }
+    if response.status_code in (400, 413):
+        error_message = _get_error_message(response)
+        if "context" in error_message.lower() or "token" in error_message.lower():
+            logger(
+                f"Input text is too large for this model: {error_message}",
+                level="ERROR",
+            )
+            return {"status": "TOKEN_LIMIT_EXCEEDED", "text": None}
+    if not response.ok:
+        logger(
+            f"Translation server returned HTTP {response.status_code}: "
+            f"{_get_error_message(response)}",
+            level="ERROR",
+        )
+        return {"status": "FAILED", "text": None}
+
+    try:
+        choice = response.json()["choices"][0]
+        raw_text = choice["message"]["content"]
+        finish_reason = choice.get("finish_reason")
+    except (ValueError, KeyError, IndexError, TypeError):
+        logger("Translation server returned an unexpected response.", level="ERROR")
+        return {"status": "FAILED", "text": None}
+
+    if not raw_text:
+        logger("Server returned success status but no text content.", level="WARNING")
+        return {"status": "FAILED", "text": None}
+
+    if finish_reason == "length":
+        logger(
+            "Output truncated by model. Verifying and trimming to the last complete chapter.",
+            level="WARNING",
+        )
+        return {
+            "status": "OUTPUT_TRUNCATED",
+            "text": trim_to_complete_chapters(raw_text),
+        }
+
+    logger("Translation received successfully.", level="SUCCESS")
+    return {"status": "SUCCESS", "text": raw_text}
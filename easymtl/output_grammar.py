@@ -0,0 +1,86 @@
+import re
+
+PLACEHOLDER_PATTERN = re.compile(r"\[IMAGE_PLACEHOLDER_(\d+)\]")
+CHAPTER_ID_PATTERN = re.compile(r"\[CHAPTER_ID::([^]]+)\]")
+_TITLE_PATTERN = re.compile(r"^\*\*[^*\n]+\*\*$")
+# Free text may use brackets, but never starts another placeholder tag, so
+# the model cannot drop, repeat or renumber the ones the chapter has.
+_TEXT_RULES = r"""
+text ::= text-char*
+text-char ::= [^\[] | "[" [^I] | "[I" [^M]
+title ::= [ \n]* "**" [^*\n]+ "**\n"
+"""
+# In a batch, text also never contains "---" or starts a chapter tag, so
+# every separator and tag that split_batch_output reads comes from the
+# chapter rules. Runs of dashes are at most two long.
+_BATCH_TEXT_RULES = r"""
+text ::= text-char* ("-" | "--")?
+text-char ::= [^\[-] | "[" [^IC\[-] | "[I" [^M\[-] | "[C" [^H\[-] | "-" [^\[-] | "--" [^\[-]
+title ::= [ \n]* "**" title-char+ "**\n"
+title-char ::= [^*\n\[-] | "-" [^*\n\[-] | "--" [^*\n\[-]
+"""
+
+
+def _starts_with_title(text):
+    for line in text.split("\n"):
+        line = line.strip()
+        if not line or line.startswith("[CHAPTER_ID::"):
+            continue
+        return bool(_TITLE_PATTERN.match(line))
+    return False
+
+
+def split_tagged_chapters(text):
+    matches = list(CHAPTER_ID_PATTERN.finditer(text))
+    return [
+        (
+            match.group(1),
+            text[
+                match.end() : matches[i + 1].start() if i + 1 < len(matches) else None
+            ],
+        )
+        for i, match in enumerate(matches)
+    ]
+
+
+def _build_chapter_expression(text, placeholder_rules):
+    # Each placeholder has to appear once, in order and on a line of its
+    # own, which is how create_translated_epub puts the images back.
+    expression = "title text" if _starts_with_title(text) else "title? text"
+    for index in dict.fromkeys(PLACEHOLDER_PATTERN.findall(text)):
+        expression += f" placeholder-{index} text"
+        placeholder_rules[index] = (
+            f'placeholder-{index} ::= "\\n[IMAGE_PLACEHOLDER_{index}]\\n"'
+        )
+    return expression
+
+
+def _escape_literal(text):
+    return text.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def build_output_grammar(text):
+    placeholder_rules = {}
+    chapters = split_tagged_chapters(text)
+    if len(chapters) > 1:
+        # A batch has to come back with every chapter tag, in order and
+        # closed by a separator, which is what split_batch_output reads.
+        rules = []
+        for i, (chapter_id, chapter_text) in enumerate(chapters):
+            expression = _build_chapter_expression(chapter_text, placeholder_rules)
+            rules.append(
+                f'chapter-{i} ::= "[CHAPTER_ID::{_escape_literal(chapter_id)}]\\n" '
+                f'{expression} "\\n---\\n"'
+            )
+        root = " ".join(f"chapter-{i}" for i in range(len(chapters)))
+        text_rules = _BATCH_TEXT_RULES
+    else:
+        if not PLACEHOLDER_PATTERN.search(text) and not _starts_with_title(text):
+            return None
+        rules = []
+        root = _build_chapter_expression(text, placeholder_rules)
+        text_rules = _TEXT_RULES
+    return (
+        "\n".join([f"root ::= {root}", *rules, *placeholder_rules.values()])
+        + text_rules
+    )
@@ -0,0 +1,146 @@
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from .config import PREPROCESS_MAX_WORKERS, PREPROCESS_PARALLEL_MIN_CHAPTERS
+from .epub_handler import extract_chapter_content
+from .translator import estimate_tokens_fast
+
+PART_ID_SEPARATOR = "@@part"
+_SENTENCE_END_PATTERN = re.compile(r"(?<=[.!?。！？…」』])")
+
+
+def preprocess_chapter(chapter_id, raw_content):
+    content, extraction_data = extract_chapter_content(chapter_id, raw_content)
+
+    estimated_count = estimate_tokens_fast(content)
+    if not content.strip() and estimated_count == 0:
+        estimated_count = 0
+    else:
+        estimated_count = max(1, estimated_count)
+
+    return {
+        "chapter_id": chapter_id,
+        "content": content,
+        "tokens": estimated_count,
+        "extraction_data": extraction_data or (chapter_id, []),
+    }
+
+
+def get_preprocess_worker_count(chapter_count):
+    if chapter_count < PREPROCESS_PARALLEL_MIN_CHAPTERS:
+        return 1
+    max_workers = PREPROCESS_MAX_WORKERS or max(1, (os.cpu_count() or 1) - 1)
+    return max(1, min(max_workers, chapter_count))
+
+
+def iter_preprocessed_chapters(chapter_items, stop_event):
+    worker_count = get_preprocess_worker_count(len(chapter_items))
+
+    if worker_count == 1:
+        for item in chapter_items:
+            if stop_event.is_set():
+                return
+            record = preprocess_chapter(item.get_name(), item.get_content())
+            record["item"] = item
+            yield record
+        return
+
+    executor = ProcessPoolExecutor(max_workers=worker_count)
+    try:
+        results = executor.map(
+            preprocess_chapter,
+            [item.get_name() for item in chapter_items],
+            [item.get_content() for item in chapter_items],
+            chunksize=max(1, len(chapter_items) // (worker_count * 8)),
+        )
+        for item, record in zip(chapter_items, results):
+            if stop_event.is_set():
+                return
+            record["item"] = item
+            yield record
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def get_part_id(chapter_id, part_number):
+    return f"{chapter_id}{PART_ID_SEPARATOR}{part_number}"
+
+
+def _estimate_token_counts(texts):
+    return [estimate_tokens_fast(text) for text in texts]
+
+
+def _split_long_line(sentences, sentence_counts, token_limit):
+    pieces, current_piece, current_tokens = [], "", 0
+    for sentence, sentence_tokens in zip(sentences, sentence_counts):
+        if current_piece and current_tokens + sentence_tokens > token_limit:
+            pieces.append((current_piece, current_tokens))
+            current_piece, current_tokens = "", 0
+        current_piece += sentence
+        current_tokens += sentence_tokens
+    if current_piece:
+        pieces.append((current_piece, current_tokens))
+    return pieces
+
+
+def split_chapter_record(record, token_limit, count_tokens=_estimate_token_counts):
+    if not record["content"]:
+        return [record]
+
+    chapter_text = record["content"].split("\n", 1)[-1]
+    if chapter_text.endswith("\n---\n"):
+        chapter_text = chapter_text[: -len("\n---\n")]
+    if count_tokens([chapter_text])[0] <= token_limit:
+        return [record]
+
+    # Extracted text has one paragraph per line, so lines are safe split
+    # points. A paragraph that is too long on its own is split at sentence ends.
+    # Texts are counted a whole list at a time, which keeps a model-backed
+    # count_tokens to three requests per chapter however long it is.
+    lines = chapter_text.split("\n")
+    line_counts = count_tokens(lines)
+    long_line_sentences = {
+        index: _SENTENCE_END_PATTERN.split(line)
+        for index, (line, line_tokens) in enumerate(zip(lines, line_counts))
+        if line_tokens + 1 > token_limit
+    }
+    all_sentences = [
+        sentence for sentences in long_line_sentences.values() for sentence in sentences
+    ]
+    sentence_counts = iter(count_tokens(all_sentences) if all_sentences else [])
+
+    parts, current_lines, current_tokens = [], [], 0
+    for index, (line, line_tokens) in enumerate(zip(lines, line_counts)):
+        pieces = [(line, line_tokens)]
+        if index in long_line_sentences:
+            sentences = long_line_sentences[index]
+            pieces = _split_long_line(
+                sentences, [next(sentence_counts) for _ in sentences], token_limit
+            )
+        for piece, piece_tokens in pieces:
+            piece_tokens += 1
+            if current_lines and current_tokens + piece_tokens > token_limit:
+                parts.append(("\n".join(current_lines), current_tokens))
+                current_lines, current_tokens = [], 0
+            current_lines.append(piece)
+            current_tokens += piece_tokens
+    if current_lines:
+        parts.append(("\n".join(current_lines), current_tokens))
+
+    if len(parts) < 2:
+        return [record]
+
+    part_records = []
+    for part_number, (part_text, part_tokens) in enumerate(parts, start=1):
+        part_id = get_part_id(record["chapter_id"], part_number)
+        part_records.append(
+            {
+                "chapter_id": part_id,
+                "parent_id": record["chapter_id"],
+                "content": f"[CHAPTER_ID::{part_id}]\n{part_text}\n---\n",
+                "tokens": max(1, part_tokens),
+                "extraction_data": None,
+            }
+        )
+    return part_records
@@ -0,0 +1,62 @@
+import hashlib
+import json
+import os
+import pickle
+
+from .utils import get_app_data_dir
+
+PROMPT_CACHE_DIR_NAME = "prompt_cache"
+
+
+def get_prompt_cache_dir():
+    cache_dir = os.path.join(get_app_data_dir(), PROMPT_CACHE_DIR_NAME)
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+
+def get_prefix_state_path(model_filename):
+    return os.path.join(get_prompt_cache_dir(), f"{model_filename}.prefix")
+
+
+def make_prefix_state_key(model_path, prefix_tokens, runtime_options):
+    hasher = hashlib.sha256()
+    hasher.update(",".join(map(str, prefix_tokens)).encode("utf-8"))
+    return {
+        "model_size": os.path.getsize(model_path),
+        "model_mtime": os.path.getmtime(model_path),
+        "prefix": hasher.hexdigest(),
+        "runtime": json.dumps(runtime_options, sort_keys=True, default=str),
+    }
+
+
+def load_prefix_state(model_filename, state_key):
+    state_path = get_prefix_state_path(model_filename)
+    try:
+        with open(state_path, "rb") as f:
+            entry = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        # A state written by another llama-cpp-python version or cut short
+        # by a crash is rebuilt instead of loaded.
+        return None
+
+    if not isinstance(entry, dict) or entry.get("key") != state_key:
+        return None
+    return entry.get("state")
+
+
+def save_prefix_state(model_filename, state_key, state):
+    state_path = get_prefix_state_path(model_filename)
+    temp_path = state_path + ".tmp"
+    with open(temp_path, "wb") as f:
+        pickle.dump({"key": state_key, "state": state}, f, pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, state_path)
+
+
+def delete_prefix_state(model_filename):
+    try:
+        os.remove(get_prefix_state_path(model_filename))
+        return True
+    except FileNotFoundError:
+        return False
@@ -0,0 +1,122 @@
+import threading
+import time
+
+from .config import (
+    DEFAULT_RATE_LIMIT,
+    MODEL_RATE_LIMITS,
+    RATE_LIMIT_AIMD_DECREASE_FACTOR,
+    RATE_LIMIT_AIMD_INCREASE_STEP,
+    RATE_LIMIT_BURST_FRACTION,
+    RATE_LIMIT_DEFAULT_BACKOFF_SECONDS,
+    RATE_LIMIT_MIN_SCALE,
+)
+
+_RATE_LIMITERS = {}
+_RATE_LIMITERS_LOCK = threading.Lock()
+
+
+def get_model_rate_limit(model_name):
+    lower_name = (model_name or "").lower()
+    best_match = None
+    for pattern in MODEL_RATE_LIMITS:
+        if pattern in lower_name and (
+            best_match is None or len(pattern) > len(best_match)
+        ):
+            best_match = pattern
+    return MODEL_RATE_LIMITS[best_match] if best_match else DEFAULT_RATE_LIMIT
+
+
+def get_rate_limiter(model_name):
+    with _RATE_LIMITERS_LOCK:
+        if model_name not in _RATE_LIMITERS:
+            limits = get_model_rate_limit(model_name)
+            _RATE_LIMITERS[model_name] = TokenBucketRateLimiter(
+                limits["rpm"], limits["tpm"]
+            )
+        return _RATE_LIMITERS[model_name]
+
+
+class TokenBucketRateLimiter:
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.rate_scale = 1.0
+        self._request_bucket = self._capacity(requests_per_minute)
+        self._token_bucket = self._capacity(tokens_per_minute)
+        self._blocked_until = 0.0
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _capacity(self, per_minute_limit):
+        return max(1.0, per_minute_limit * RATE_LIMIT_BURST_FRACTION)
+
+    def _refill_rate(self, per_minute_limit):
+        # Burst plus one minute of refill never exceeds the per-minute quota.
+        burst = self._capacity(per_minute_limit)
+        return max(per_minute_limit - burst, 1.0) * self.rate_scale / 60.0
+
+    def _refill(self, now):
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._request_bucket = min(
+            self._capacity(self.requests_per_minute),
+            self._request_bucket
+            + elapsed * self._refill_rate(self.requests_per_minute),
+        )
+        self._token_bucket = min(
+            self._capacity(self.tokens_per_minute),
+            self._token_bucket + elapsed * self._refill_rate(self.tokens_per_minute),
+        )
+
+    def _time_until_available(self, estimated_tokens, now):
+        if now < self._blocked_until:
+            return self._blocked_until - now
+
+        # Oversized requests only wait for a full bucket and then go into debt.
+        tokens_needed = min(estimated_tokens, self._capacity(self.tokens_per_minute))
+        request_wait = max(0.0, 1.0 - self._request_bucket) / self._refill_rate(
+            self.requests_per_minute
+        )
+        token_wait = max(0.0, tokens_needed - self._token_bucket) / self._refill_rate(
+            self.tokens_per_minute
+        )
+        return max(request_wait, token_wait)
+
+    def acquire(self, estimated_tokens, stop_event=None):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                wait_time = self._time_until_available(estimated_tokens, now)
+                if wait_time <= 0:
+                    self._request_bucket -= 1.0
+                    self._token_bucket -= estimated_tokens
+                    return True
+
+            if stop_event is not None and stop_event.is_set():
+                return False
+            time.sleep(min(wait_time, 1.0))
+
+    def on_success(self):
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.rate_scale = min(1.0, self.rate_scale + RATE_LIMIT_AIMD_INCREASE_STEP)
+
+    def on_quota_exceeded(self, retry_after=None):
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.rate_scale = max(
+                RATE_LIMIT_MIN_SCALE, self.rate_scale * RATE_LIMIT_AIMD_DECREASE_FACTOR
+            )
+            self._request_bucket = min(self._request_bucket, 0.0)
+            self._token_bucket = min(self._token_bucket, 0.0)
+
+            pause = (
+                retry_after
+                if retry_after is not None
+                else RATE_LIMIT_DEFAULT_BACKOFF_SECONDS
+            )
+            self._blocked_until = max(self._blocked_until, now + pause)
+            return self._blocked_until - now
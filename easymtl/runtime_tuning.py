@@ -0,0 +1,247 @@
+import hashlib
+import json
+import os
+import platform
+import time
+import psutil
+import llama_cpp
+from llama_cpp import Llama
+
+from .config import (
+    LOCAL_BENCHMARK_GENERATION_TOKENS,
+    LOCAL_OUTPUT_RESERVE_RATIOS,
+    LOCAL_TUNING_CONTEXT,
+    LOCAL_TUNING_GENERATION_TOKENS,
+    LOCAL_WORKER_CPU_AFFINITY,
+)
+from .utils import get_app_data_dir
+
+TUNING_PROFILES_FILENAME = "tuning_profiles.json"
+MODEL_BENCHMARKS_FILENAME = "model_benchmarks.json"
+_TUNING_PARAGRAPH = (
+    "The old innkeeper wiped the counter and glanced at the travellers by the fire. "
+    "Snow had buried the mountain road for three days, and nobody expected the "
+    "caravan from the capital before spring. Still, the young swordsman kept watching "
+    "the door, as if the storm itself might knock and ask for a room. "
+)
+# Long enough to span several batches, so batch sizes make a difference.
+_TUNING_PROMPT = _TUNING_PARAGRAPH * 12
+
+
+def get_available_cpu_count():
+    return len(LOCAL_WORKER_CPU_AFFINITY or []) or os.cpu_count() or 2
+
+
+def get_physical_cpu_count():
+    if LOCAL_WORKER_CPU_AFFINITY:
+        return len(LOCAL_WORKER_CPU_AFFINITY)
+    return psutil.cpu_count(logical=False) or get_available_cpu_count()
+
+
+def supports_gpu_offload():
+    return bool(llama_cpp.llama_supports_gpu_offload())
+
+
+def get_default_gpu_layers():
+    # Offloading is only requested from builds that can actually use a GPU.
+    return -1 if supports_gpu_offload() else 0
+
+
+def get_hardware_fingerprint():
+    return {
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "physical_cores": get_physical_cpu_count(),
+        "logical_cores": get_available_cpu_count(),
+        "memory_gb": round(psutil.virtual_memory().total / 1024**3),
+        "gpu_offload": supports_gpu_offload(),
+        "llama_cpp": llama_cpp.__version__,
+    }
+
+
+def _get_profile_key(model_path):
+    fingerprint = json.dumps(get_hardware_fingerprint(), sort_keys=True)
+    fingerprint_hash = hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()[:16]
+    model_size = os.path.getsize(model_path)
+    return f"{os.path.basename(model_path)}:{model_size}:{fingerprint_hash}"
+
+
+def _load_json(filename):
+    try:
+        with open(
+            os.path.join(get_app_data_dir(), filename), "r", encoding="utf-8"
+        ) as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def _save_json(filename, data):
+    file_path = os.path.join(get_app_data_dir(), filename)
+    temp_path = file_path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(temp_path, file_path)
+
+
+def load_tuning_profile(model_path):
+    try:
+        profile = _load_json(TUNING_PROFILES_FILENAME).get(_get_profile_key(model_path))
+    except OSError:
+        return None
+    return profile["settings"] if profile else None
+
+
+def save_tuning_profile(model_path, settings, stats):
+    profiles = _load_json(TUNING_PROFILES_FILENAME)
+    profiles[_get_profile_key(model_path)] = {
+        "settings": settings,
+        "stats": stats,
+        "hardware": get_hardware_fingerprint(),
+        "tuned_at": time.time(),
+    }
+    _save_json(TUNING_PROFILES_FILENAME, profiles)
+
+
+def load_model_benchmark(model_path):
+    try:
+        return _load_json(MODEL_BENCHMARKS_FILENAME).get(_get_profile_key(model_path))
+    except OSError:
+        return None
+
+
+def _measure_settings(
+    model_path, settings, generation_tokens=LOCAL_TUNING_GENERATION_TOKENS
+):
+    load_start = time.perf_counter()
+    llm = Llama(
+        model_path=model_path,
+        n_ctx=LOCAL_TUNING_CONTEXT,
+        verbose=False,
+        **{"n_gpu_layers": get_default_gpu_layers(), **settings},
+    )
+    try:
+        load_seconds = time.perf_counter() - load_start
+        prompt_tokens = llm.tokenize(_TUNING_PROMPT.encode("utf-8"))
+
+        eval_start = time.perf_counter()
+        llm.eval(prompt_tokens)
+        prompt_seconds = time.perf_counter() - eval_start
+
+        # Generation speed is the cost of decoding one token at a time, so
+        # feeding a fixed token measures it without sampling noise.
+        generation_start = time.perf_counter()
+        for _ in range(generation_tokens):
+            llm.eval(prompt_tokens[-1:])
+        generation_seconds = time.perf_counter() - generation_start
+    finally:
+        llm.close()
+
+    prompt_speed = len(prompt_tokens) / prompt_seconds
+    generation_speed = generation_tokens / generation_seconds
+    # Seconds per source token of a typical chapter: the prompt is read
+    # once and the translation is somewhat longer than the source.
+    output_ratio = LOCAL_OUTPUT_RESERVE_RATIOS["default"]
+    score = 1 / prompt_speed + output_ratio / generation_speed
+    return score, {
+        "prompt_tokens_per_second": round(prompt_speed, 2),
+        "generation_tokens_per_second": round(generation_speed, 2),
+        "load_seconds": round(load_seconds, 2),
+    }
+
+
+def _get_candidate_groups():
+    physical_cores = get_physical_cpu_count()
+    logical_cores = get_available_cpu_count()
+    return [
+        [
+            {"n_threads": threads}
+            for threads in sorted(
+                {
+                    max(1, physical_cores // 2),
+                    max(1, physical_cores - 1),
+                    physical_cores,
+                    logical_cores,
+                }
+            )
+        ],
+        [
+            {"n_threads_batch": threads}
+            for threads in sorted({physical_cores, logical_cores})
+        ],
+        [
+            {"n_batch": n_batch, "n_ubatch": n_ubatch}
+            for n_batch, n_ubatch in (
+                (512, 512),
+                (1024, 512),
+                (1024, 1024),
+                (512, 256),
+                (256, 256),
+            )
+        ],
+        [
+            {"use_mmap": use_mmap, "use_mlock": use_mlock}
+            for use_mmap, use_mlock in ((True, False), (True, True), (False, False))
+            if not use_mlock or llama_cpp.llama_supports_mlock()
+        ],
+    ]
+
+
+def tune_runtime_settings(model_path, logger):
+    logical_cores = get_available_cpu_count()
+    best_settings = {
+        "n_threads": max(1, logical_cores // 2),
+        "n_threads_batch": logical_cores,
+        "n_batch": 512,
+        "n_ubatch": 512,
+        "use_mmap": True,
+        "use_mlock": False,
+    }
+    best_score, best_stats = _measure_settings(model_path, best_settings)
+    logger(
+        f"Baseline: {best_stats['prompt_tokens_per_second']} prompt tokens/s, "
+        f"{best_stats['generation_tokens_per_second']} generated tokens/s."
+    )
+
+    # One option group is tuned at a time, keeping the best of the previous
+    # groups, instead of timing every combination.
+    for candidates in _get_candidate_groups():
+        for candidate in candidates:
+            settings = {**best_settings, **candidate}
+            if settings == best_settings:
+                continue
+            try:
+                score, stats = _measure_settings(model_path, settings)
+            except (RuntimeError, ValueError, OSError) as e:
+                logger(f"Skipping {candidate}: {e}", level="WARNING")
+                continue
+
+            logger(
+                f"{candidate}: {stats['prompt_tokens_per_second']} prompt tokens/s, "
+                f"{stats['generation_tokens_per_second']} generated tokens/s."
+            )
+            if score < best_score:
+                best_score, best_settings, best_stats = score, settings, stats
+
+    save_tuning_profile(model_path, best_settings, best_stats)
+    logger(
+        f"Saved tuning profile: {best_settings} "
+        f"({best_stats['prompt_tokens_per_second']} prompt tokens/s, "
+        f"{best_stats['generation_tokens_per_second']} generated tokens/s).",
+        level="SUCCESS",
+    )
+    return best_settings
+
+
+def benchmark_model(model_path, settings):
+    _, stats = _measure_settings(
+        model_path, settings, LOCAL_BENCHMARK_GENERATION_TOKENS
+    )
+    benchmarks = _load_json(MODEL_BENCHMARKS_FILENAME)
+    benchmarks[_get_profile_key(model_path)] = {
+        **stats,
+        "settings": settings,
+        "benchmarked_at": time.time(),
+    }
+    _save_json(MODEL_BENCHMARKS_FILENAME, benchmarks)
+    return stats
@@ -0,0 +1,166 @@
+import os
+import numpy as np
+import psutil
+from llama_cpp import Llama
+from llama_cpp.llama_speculative import LlamaDraftModel, LlamaPromptLookupDecoding
+
+from .config import (
+    LOCAL_DRAFT_MODELS,
+    LOCAL_DRAFT_TOKENS,
+    LOCAL_PROMPT_LOOKUP_NGRAM_SIZE,
+    LOCAL_PROMPT_LOOKUP_TOKENS,
+    LOCAL_SPECULATIVE_MAX_MEMORY_FRACTION,
+)
+from .model_registry import get_model_info
+from .utils import get_models_dir
+
+SPECULATIVE_MODES = ("prompt_lookup", "draft_model")
+_TOKENIZER_KEYS = ("tokenizer", "vocab_size", "bos_token_id", "eos_token_id")
+
+
+class DraftModelDecoding(LlamaDraftModel):
+    def __init__(self, draft_llm, num_pred_tokens):
+        self.draft_llm = draft_llm
+        self.num_pred_tokens = num_pred_tokens
+
+    def __call__(self, input_ids, /, **kwargs):
+        max_tokens = min(self.num_pred_tokens, self.draft_llm.n_ctx() - len(input_ids))
+        draft_tokens = []
+        if max_tokens <= 0:
+            return np.array(draft_tokens, dtype=np.intc)
+
+        # generate() keeps the longest matching prefix of the draft context, so
+        # only the tokens accepted since the previous draft are evaluated.
+        for token in self.draft_llm.generate(input_ids.tolist(), top_k=1, temp=0.0):
+            draft_tokens.append(token)
+            if len(draft_tokens) >= max_tokens or token == self.draft_llm.token_eos():
+                break
+        return np.array(draft_tokens, dtype=np.intc)
+
+    def close(self):
+        self.draft_llm.close()
+
+
+class SpeculationStats(LlamaDraftModel):
+    def __init__(self, drafter):
+        self.drafter = drafter
+        self.reset()
+
+    def reset(self):
+        self.drafted_tokens = 0
+        self.accepted_tokens = 0
+        self._last_draft = []
+        self._last_length = 0
+
+    @property
+    def acceptance_rate(self):
+        return self.accepted_tokens / self.drafted_tokens if self.drafted_tokens else 0
+
+    def _count_accepted(self, input_ids):
+        # The main model only keeps the leading draft tokens it agreed with,
+        # so the tokens now following the previous input show what it took.
+        kept_tokens = input_ids[self._last_length :]
+        for drafted, kept in zip(self._last_draft, kept_tokens):
+            if drafted != kept:
+                break
+            self.accepted_tokens += 1
+
+    def __call__(self, input_ids, /, **kwargs):
+        self._count_accepted(input_ids)
+        draft_tokens = self.drafter(input_ids, **kwargs)
+        self.drafted_tokens += len(draft_tokens)
+        self._last_draft = draft_tokens.tolist()
+        self._last_length = len(input_ids)
+        return draft_tokens
+
+    def close(self):
+        if hasattr(self.drafter, "close"):
+            self.drafter.close()
+
+
+def get_draft_model_path(model_path):
+    draft_filename = LOCAL_DRAFT_MODELS.get(os.path.basename(model_path))
+    if not draft_filename:
+        return None
+    draft_path = os.path.join(get_models_dir(), draft_filename)
+    return draft_path if os.path.exists(draft_path) else None
+
+
+def _get_tokenizer_signature(info):
+    return tuple(info[key] for key in _TOKENIZER_KEYS)
+
+
+def check_speculative_mode(mode, model_path, total_context, logger):
+    if not mode:
+        return None
+    if mode not in SPECULATIVE_MODES:
+        logger(
+            f"Unknown speculative decoding mode '{mode}'. Decoding normally.",
+            level="WARNING",
+        )
+        return None
+
+    try:
+        info = get_model_info(model_path)
+    except (OSError, ValueError) as e:
+        logger(f"Could not read GGUF metadata: {e}", level="WARNING")
+        return None
+
+    # llama-cpp-python keeps the logits of every position while drafting, a
+    # context-sized matrix that large vocabularies can make too big for RAM.
+    score_bytes = total_context * (info["vocab_size"] or 0) * 4
+    memory_limit = (
+        psutil.virtual_memory().available * LOCAL_SPECULATIVE_MAX_MEMORY_FRACTION
+    )
+    if score_bytes > memory_limit:
+        logger(
+            f"Speculative decoding needs about {score_bytes / 1024**3:.1f} GB for logits "
+            f"at this context size. Decoding normally.",
+            level="WARNING",
+        )
+        return None
+
+    if mode == "draft_model":
+        model_filename = os.path.basename(model_path)
+        draft_path = get_draft_model_path(model_path)
+        if draft_path is None:
+            logger(
+                f"No downloaded draft model is configured for {model_filename}. "
+                f"Decoding normally.",
+                level="WARNING",
+            )
+            return None
+        try:
+            draft_info = get_model_info(draft_path)
+        except (OSError, ValueError) as e:
+            logger(f"Could not read draft model metadata: {e}", level="WARNING")
+            return None
+        # Draft tokens are fed to the main model as they are, so both models
+        # must use exactly the same vocabulary.
+        if _get_tokenizer_signature(draft_info) != _get_tokenizer_signature(info):
+            logger(
+                f"{os.path.basename(draft_path)} does not share the tokenizer of "
+                f"{model_filename} and cannot draft for it. Decoding normally.",
+                level="WARNING",
+            )
+            return None
+    return mode
+
+
+def create_drafter(mode, model_path, context_size, llama_options):
+    if mode == "prompt_lookup":
+        return SpeculationStats(
+            LlamaPromptLookupDecoding(
+                max_ngram_size=LOCAL_PROMPT_LOOKUP_NGRAM_SIZE,
+                num_pred_tokens=LOCAL_PROMPT_LOOKUP_TOKENS,
+            )
+        )
+    if mode == "draft_model":
+        draft_llm = Llama(
+            model_path=get_draft_model_path(model_path),
+            n_ctx=context_size,
+            verbose=False,
+            **llama_options,
+        )
+        return SpeculationStats(DraftModelDecoding(draft_llm, LOCAL_DRAFT_TOKENS))
+    return None
@@ -0,0 +1,120 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from .config import PROMPT_VERSION, TRANSLATION_CACHE_MAX_BYTES
+from .openai_translator import get_base_url, is_server_model
+from .utils import get_app_data_dir
+
+CACHE_FILENAME = "translation_cache.sqlite3"
+_CACHE_CONNECTION = None
+_CACHE_LOCK = threading.Lock()
+_CACHE_STATS = {"hits": 0, "misses": 0}
+
+
+def _get_connection():
+    global _CACHE_CONNECTION
+
+    if _CACHE_CONNECTION is None:
+        db_path = os.path.join(get_app_data_dir(), CACHE_FILENAME)
+        connection = sqlite3.connect(db_path, check_same_thread=False)
+        connection.execute("""CREATE TABLE IF NOT EXISTS translations (
+                cache_key TEXT PRIMARY KEY,
+                translation TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            )""")
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS idx_translations_last_used ON translations (last_used)"
+        )
+        connection.commit()
+        _CACHE_CONNECTION = connection
+    return _CACHE_CONNECTION
+
+
+def get_chapter_text(chapter_content):
+    if chapter_content.startswith("[CHAPTER_ID::"):
+        return chapter_content.split("\n", 1)[-1]
+    return chapter_content
+
+
+def make_cache_key(chapter_text, model_name):
+    # Different servers can serve different weights under the same model id.
+    if is_server_model(model_name):
+        model_name = f"{model_name}@{get_base_url()}"
+    hasher = hashlib.sha256()
+    hasher.update(f"v{PROMPT_VERSION}\0{model_name}\0".encode("utf-8"))
+    hasher.update(chapter_text.encode("utf-8"))
+    return hasher.hexdigest()
+
+
+def get_cached_translation(chapter_text, model_name):
+    cache_key = make_cache_key(chapter_text, model_name)
+    try:
+        with _CACHE_LOCK:
+            connection = _get_connection()
+            row = connection.execute(
+                "SELECT translation FROM translations WHERE cache_key = ?",
+                (cache_key,),
+            ).fetchone()
+            if row is None:
+                _CACHE_STATS["misses"] += 1
+                return None
+
+            connection.execute(
+                "UPDATE translations SET last_used = ? WHERE cache_key = ?",
+                (time.time(), cache_key),
+            )
+            connection.commit()
+            _CACHE_STATS["hits"] += 1
+            return row[0]
+    except sqlite3.Error:
+        _CACHE_STATS["misses"] += 1
+        return None
+
+
+def store_translation(chapter_text, model_name, translation, logger=None):
+    cache_key = make_cache_key(chapter_text, model_name)
+    size = len(translation.encode("utf-8"))
+    try:
+        with _CACHE_LOCK:
+            connection = _get_connection()
+            connection.execute(
+                "INSERT OR REPLACE INTO translations (cache_key, translation, size, last_used) VALUES (?, ?, ?, ?)",
+                (cache_key, translation, size, time.time()),
+            )
+            _evict_least_recently_used(connection)
+            connection.commit()
+    except sqlite3.Error as e:
+        if logger:
+            logger(f"Could not write to translation cache: {e}", level="WARNING")
+
+
+def _evict_least_recently_used(connection):
+    total_size = connection.execute(
+        "SELECT COALESCE(SUM(size), 0) FROM translations"
+    ).fetchone()[0]
+    if total_size <= TRANSLATION_CACHE_MAX_BYTES:
+        return
+
+    rows = connection.execute(
+        "SELECT cache_key, size FROM translations ORDER BY last_used ASC"
+    ).fetchall()
+    evicted_keys = []
+    for cache_key, size in rows:
+        if total_size <= TRANSLATION_CACHE_MAX_BYTES:
+            break
+        evicted_keys.append((cache_key,))
+        total_size -= size
+    connection.executemany("DELETE FROM translations WHERE cache_key = ?", evicted_keys)
+
+
+def get_cache_stats():
+    return dict(_CACHE_STATS)
+
+
+def reset_cache_stats():
+    _CACHE_STATS["hits"] = 0
+    _CACHE_STATS["misses"] = 0
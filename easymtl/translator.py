@@ -144,12 +144,22 @@ def list_models(logger):
         return [DEFAULT_MODEL]
 
 
-def translate_text_with_gemini(text, logger, is_retry=False):
-    client, error = get_client()
-    if error:
-        logger(error, level="ERROR")
-        return {"status": "FAILED", "text": None}
+def _get_retry_after(error):
+    details = error.details if isinstance(error.details, dict) else {}
+    details = details.get("error", details)
+    for detail in details.get("details", []) or []:
+        if isinstance(detail, dict) and detail.get("@type", "").endswith("RetryInfo"):
+            match = re.match(r"([\d.]+)s", str(detail.get("retryDelay", "")))
+            if match:
+                return float(match.group(1))
 
+    match = re.search(r"retry in ([\d.]+)\s*s", str(error.message), re.IGNORECASE)
+    if match:
+        return float(match.group(1))
+    return None
+
+
+def build_translation_prompt(text, is_retry=False):
     prompt = f"""Translate the following novel chapters into English.
 Follow these rules precisely:
 1.  Preserve the `[CHAPTER_ID::...]` tag at the beginning of each chapter.
@@ -159,6 +169,7 @@ Follow these rules precisely:
 5.  Preserve any placeholder tags like `[IMAGE_PLACEHOLDER_N]` exactly as they appear.
 6.  **Maintain markdown formatting:** If the input text uses *italics* or **bold**, preserve that formatting in the translation.
 7.  Keep the content of each chapter separate, preserving the '---' markers.
+8.  A chapter whose ID ends in `@@partN` continues a longer chapter. Only add a title if its text starts with one.
 
 ---
 {text}
@@ -167,6 +178,29 @@ Follow these rules precisely:
     if is_retry:
         retry_note = "IMPORTANT: Your previous response was not formatted correctly. Please pay close attention to the instructions and ensure you return the exact same number of chapters separated by '---' as you received.\n\n"
         prompt = retry_note + prompt
+    return prompt
+
+
+def trim_to_complete_chapters(raw_text):
+    # The chapter after the last tag may have been cut off, so only the
+    # chapters before it are kept.
+    id_pattern = re.compile(r"\[CHAPTER_ID::([^]]+)\]")
+    matches = list(id_pattern.finditer(raw_text))
+    if len(matches) > 1:
+        return raw_text[: matches[-1].start()]
+    elif not matches:
+        return ""
+    return raw_text
+
+
+def translate_text_with_gemini(text, logger, is_retry=False):
+    client, error = get_client()
+    if error:
+        logger(error, level="ERROR")
+        return {"status": "FAILED", "text": None}
+
+    prompt = build_translation_prompt(text, is_retry)
+    if is_retry:
         logger("Retrying translation with additional instructions...", level="WARNING")
     else:
         logger("Sending text to Gemini for translation. This may take a while...")
@@ -212,16 +246,10 @@ Follow these rules precisely:
                 "Output truncated by model. Verifying and trimming to the last complete chapter.",
                 level="WARNING",
             )
-            id_pattern = re.compile(r"\[CHAPTER_ID::([^]]+)\]")
-            matches = list(id_pattern.finditer(raw_text))
-
-            if len(matches) > 1:
-                last_match_start = matches[-1].start()
-                final_text_to_parse = raw_text[:last_match_start]
-            elif not matches:
-                final_text_to_parse = ""
-
-            return {"status": "OUTPUT_TRUNCATED", "text": final_text_to_parse}
+            return {
+                "status": "OUTPUT_TRUNCATED",
+                "text": trim_to_complete_chapters(raw_text),
+            }
 
         elif finish_reason.name == "STOP":
             logger("Translation received successfully.", level="SUCCESS")
@@ -242,7 +270,11 @@ Follow these rules precisely:
             or "resource exhausted" in error_message
         ):
             logger(f"Google API Quota hit: {e.message}", level="WARNING")
-            return {"status": "QUOTA_EXCEEDED", "text": None}
+            return {
+                "status": "QUOTA_EXCEEDED",
+                "text": None,
+                "retry_after": _get_retry_after(e),
+            }
 
         elif (
             "400" in error_message
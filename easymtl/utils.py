@@ -5,16 +5,24 @@ import sys
 import tempfile
 import dearpygui.dearpygui as dpg
 from platformdirs import user_data_dir
+from huggingface_hub import hf_hub_download
+from huggingface_hub.utils import GatedRepoError, HfHubHTTPError
 
 from easymtl.config import AVAILABLE_GEMMA_MODELS
 
 
 APP_NAME = "EasyMTL"
 APP_AUTHOR = "FlamingWater"
-MODELS_DIR = os.path.join(user_data_dir(APP_NAME, APP_AUTHOR), "models")
+APP_DATA_DIR = user_data_dir(APP_NAME, APP_AUTHOR)
+MODELS_DIR = os.path.join(APP_DATA_DIR, "models")
 _REVERSE_MODEL_MAP = None
 
 
+def get_app_data_dir():
+    os.makedirs(APP_DATA_DIR, exist_ok=True)
+    return APP_DATA_DIR
+
+
 def get_models_dir():
     os.makedirs(MODELS_DIR, exist_ok=True)
     return MODELS_DIR
@@ -51,6 +59,42 @@ def delete_local_model(filename, logger):
         return False
 
 
+def download_model_from_hub(repo_id, filename, logger):
+    models_dir = get_models_dir()
+
+    try:
+        logger(f"Starting download of {filename} from {repo_id}...")
+
+        hf_hub_download(
+            repo_id=repo_id,
+            filename=filename,
+            local_dir=models_dir,
+        )
+
+        logger(f"Successfully downloaded {filename}!", level="SUCCESS")
+        return True
+    except GatedRepoError as e:
+        logger(f"Access denied. This is a gated model.", level="ERROR")
+        logger(
+            "Please visit the model page on Hugging Face, accept the terms, and log in via your terminal using 'huggingface-cli login'.",
+            level="ERROR",
+        )
+        return False
+    except HfHubHTTPError as e:
+        if "401" in str(e):
+            logger(f"Authentication error (401).", level="ERROR")
+            logger(
+                "Please ensure you are logged in via 'huggingface-cli login' and have accepted the model's terms on the Hugging Face website.",
+                level="ERROR",
+            )
+        else:
+            logger(f"An HTTP error occurred during download: {e}", level="ERROR")
+        return False
+    except Exception as e:
+        logger(f"Failed to download model: {e}", level="ERROR")
+        return False
+
+
 def get_reverse_model_map():
     global _REVERSE_MODEL_MAP
     if _REVERSE_MODEL_MAP is None:
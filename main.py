@@ -1,5 +1,8 @@
+import multiprocessing
+
 from easymtl.__main__ import run_app
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     run_app()
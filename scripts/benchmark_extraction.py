@@ -0,0 +1,133 @@
+import os
+import sys
+import time
+from colorama import Fore, Style, init as colorama_init
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, PROJECT_ROOT)
+
+from bs4 import BeautifulSoup
+from ebooklib import epub, ITEM_DOCUMENT
+from easymtl.epub_handler import _extract_chapter_with_lxml
+
+colorama_init(autoreset=True)
+
+SYNTHETIC_CHAPTER_COUNT = 200
+SYNTHETIC_PARAGRAPHS_PER_CHAPTER = 120
+ROUNDS = 3
+
+
+# The BeautifulSoup extractor the lxml version replaced, kept as the baseline.
+def _extract_chapter_with_bs4(content):
+    soup = BeautifulSoup(content, "html.parser")
+    body = soup.find("body")
+    if not body:
+        return None, []
+
+    image_tags_for_chapter = []
+    for i, img in enumerate(body.find_all("img")):
+        placeholder = f"\n[IMAGE_PLACEHOLDER_{i}]\n"
+        image_tags_for_chapter.append(str(img))
+        img.replace_with(placeholder)
+
+    for tag in body.find_all(["b", "strong"]):
+        text = tag.get_text()
+        if text.strip():
+            tag.replace_with(f"**{text}**")
+
+    for tag in body.find_all(["i", "em"]):
+        text = tag.get_text()
+        if text.strip():
+            tag.replace_with(f"*{text}*")
+
+    return body.get_text(separator="\n", strip=True), image_tags_for_chapter
+
+
+def build_synthetic_chapters():
+    paragraph = (
+        "<p>She looked at the <b>old tower</b> and whispered, "
+        "<i>“we should not be here”</i>, before the <em>wind</em> "
+        "carried her words into the <strong>dark <i>forest</i></strong>.</p>\n"
+    )
+    chapters = []
+    for chapter_index in range(SYNTHETIC_CHAPTER_COUNT):
+        body = f"<h1>Chapter {chapter_index + 1}: <b>The Tower</b></h1>\n"
+        for paragraph_index in range(SYNTHETIC_PARAGRAPHS_PER_CHAPTER):
+            body += paragraph
+            if paragraph_index % 40 == 0:
+                body += f'<p><img src="../Images/{chapter_index}_{paragraph_index}.jpg" alt="illustration"/></p>\n'
+        chapters.append(
+            (
+                f"chapter_{chapter_index}.xhtml",
+                f"""<?xml version='1.0' encoding='utf-8'?>
+<html xmlns="http://www.w3.org/1999/xhtml">
+<head><title>Chapter {chapter_index + 1}</title></head>
+<body>{body}</body>
+</html>""".encode(
+                    "utf-8"
+                ),
+            )
+        )
+    return chapters
+
+
+def load_epub_chapters(epub_path):
+    book = epub.read_epub(epub_path)
+    return [
+        (item.get_name(), item.get_content())
+        for item in book.get_items_of_type(ITEM_DOCUMENT)
+    ]
+
+
+def time_engine(extract_function, chapters):
+    best_time, results = None, []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        results = [extract_function(content) for _, content in chapters]
+        elapsed = time.perf_counter() - start
+        best_time = elapsed if best_time is None else min(best_time, elapsed)
+    return best_time, results
+
+
+def main():
+    if len(sys.argv) > 1:
+        print(Style.BRIGHT + Fore.CYAN + f"Loading chapters from {sys.argv[1]}...")
+        chapters = load_epub_chapters(sys.argv[1])
+    else:
+        print(Style.BRIGHT + Fore.CYAN + "No EPUB given. Using synthetic chapters...")
+        chapters = build_synthetic_chapters()
+
+    total_bytes = sum(len(content) for _, content in chapters)
+    print(
+        Fore.CYAN
+        + f"{len(chapters)} chapters, {total_bytes / 1024 / 1024:.1f} MB of markup, best of {ROUNDS} rounds."
+    )
+
+    bs4_time, bs4_results = time_engine(_extract_chapter_with_bs4, chapters)
+    lxml_time, lxml_results = time_engine(_extract_chapter_with_lxml, chapters)
+
+    mismatches = [
+        chapter_id
+        for (chapter_id, _), bs4_result, lxml_result in zip(
+            chapters, bs4_results, lxml_results
+        )
+        if bs4_result != lxml_result
+    ]
+
+    print(Fore.GREEN + f"BeautifulSoup (html.parser): {bs4_time:.3f}s")
+    print(Fore.GREEN + f"lxml single pass:            {lxml_time:.3f}s")
+    print(Style.BRIGHT + Fore.MAGENTA + f"Speedup: {bs4_time / lxml_time:.1f}x")
+
+    if mismatches:
+        print(
+            Fore.YELLOW
+            + f"Output differs for {len(mismatches)} chapters (usually malformed markup that lxml repairs):"
+        )
+        for chapter_id in mismatches[:10]:
+            print(Fore.YELLOW + f"  {chapter_id}")
+    else:
+        print(Fore.GREEN + "Output is identical for all chapters.")
+
+
+if __name__ == "__main__":
+    main()
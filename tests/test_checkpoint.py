@@ -0,0 +1,76 @@
+import json
+import os
+
+import pytest
+
+from easymtl import checkpoint
+
+
+@pytest.fixture
+def epub_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(checkpoint, "get_app_data_dir", lambda: str(tmp_path))
+    book_path = tmp_path / "book.epub"
+    book_path.write_bytes(b"epub")
+    return str(book_path)
+
+
+def test_journal_round_trip(epub_path):
+    journal_path = checkpoint.get_journal_path(epub_path, 1, 10, "model.gguf")
+    identity = checkpoint.get_journal_identity(epub_path, 1, 10, "model.gguf")
+    checkpoint.create_journal(journal_path, identity)
+    checkpoint.append_to_journal(journal_path, {"c1": ("key1", "First.")})
+    checkpoint.append_to_journal(
+        journal_path, {"c2": ("key2", "Second."), "c1": ("key3", "Again.")}
+    )
+
+    assert checkpoint.load_journal(journal_path) == {
+        "c1": ("key3", "Again."),
+        "c2": ("key2", "Second."),
+    }
+    with open(journal_path, encoding="utf-8") as f:
+        assert json.loads(f.readline()) == {"identity": identity}
+
+
+def test_create_journal_keeps_existing_entries(epub_path):
+    journal_path = checkpoint.get_journal_path(epub_path, 1, 10, "model.gguf")
+    identity = checkpoint.get_journal_identity(epub_path, 1, 10, "model.gguf")
+    checkpoint.create_journal(journal_path, identity)
+    checkpoint.append_to_journal(journal_path, {"c1": ("key1", "First.")})
+    checkpoint.create_journal(journal_path, identity)
+
+    assert checkpoint.load_journal(journal_path) == {"c1": ("key1", "First.")}
+
+
+def test_half_written_and_keyless_entries_are_ignored(epub_path):
+    journal_path = checkpoint.get_journal_path(epub_path, 1, 10, "model.gguf")
+    checkpoint.append_to_journal(journal_path, {"c1": ("key1", "First.")})
+    with open(journal_path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"chapter_id": "c2", "text": "No key."}) + "\n")
+        f.write('{"chapter_id": "c3", "key": "k')
+
+    assert checkpoint.load_journal(journal_path) == {"c1": ("key1", "First.")}
+
+
+def test_missing_journal_loads_empty(epub_path):
+    journal_path = checkpoint.get_journal_path(epub_path, 1, 10, "model.gguf")
+
+    assert checkpoint.load_journal(journal_path) == {}
+    assert not checkpoint.delete_journal(journal_path)
+
+
+def test_journal_path_depends_on_range_and_model(epub_path):
+    journal_path = checkpoint.get_journal_path(epub_path, 1, 10, "model.gguf")
+
+    assert journal_path == checkpoint.get_journal_path(epub_path, 1, 10, "model.gguf")
+    assert journal_path != checkpoint.get_journal_path(epub_path, 2, 10, "model.gguf")
+    assert journal_path != checkpoint.get_journal_path(epub_path, 1, 10, "other.gguf")
+
+
+def test_journal_path_changes_with_the_book(epub_path):
+    journal_path = checkpoint.get_journal_path(epub_path, 1, 10, "model.gguf")
+    with open(epub_path, "ab") as f:
+        f.write(b"edited")
+    stat = os.stat(epub_path)
+    os.utime(epub_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    assert journal_path != checkpoint.get_journal_path(epub_path, 1, 10, "model.gguf")
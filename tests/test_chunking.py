@@ -0,0 +1,86 @@
+import pytest
+
+from easymtl.chunking import (
+    count_greedy_chunks,
+    get_plan_stats,
+    iter_planned_chunks,
+    plan_chunks,
+)
+
+
+def make_chapters(token_counts):
+    return [
+        {"chapter_id": f"chapter_{i}", "tokens": tokens}
+        for i, tokens in enumerate(token_counts)
+    ]
+
+
+def chunk_tokens(chunks):
+    return [sum(data["tokens"] for data in chunk_data) for chunk_data in chunks]
+
+
+def test_plan_keeps_the_first_fit_request_count():
+    chapters = make_chapters([60, 60, 60, 10, 10, 10])
+    chunks = plan_chunks(chapters, 100, 20)
+
+    assert len(chunks) == count_greedy_chunks(chapters, 100, 20) == 3
+    assert [data for chunk_data in chunks for data in chunk_data] == chapters
+
+
+def test_plan_balances_chunk_sizes():
+    # First-fit would send 100 + 40, the plan sends 60 + 80.
+    chapters = make_chapters([30, 30, 30, 10, 40])
+    chunks = plan_chunks(chapters, 100, 20)
+
+    assert len(chunks) == count_greedy_chunks(chapters, 100, 20)
+    assert chunk_tokens(chunks) == [60, 80]
+
+
+def test_plan_respects_the_chapter_limit():
+    chunks = plan_chunks(make_chapters([1] * 7), 100, 3)
+
+    assert [len(chunk_data) for chunk_data in chunks] == [3, 3, 1]
+
+
+def test_oversized_chapter_gets_its_own_chunk():
+    chunks = plan_chunks(make_chapters([10, 500, 10]), 100, 20)
+
+    assert [len(chunk_data) for chunk_data in chunks] == [1, 1, 1]
+
+
+def test_empty_plan():
+    assert plan_chunks([], 100, 20) == []
+    assert list(iter_planned_chunks(iter([]), 100, 20, 8)) == []
+
+
+@pytest.mark.parametrize("window_chunks", [1, 2, 8])
+def test_windowed_plan_matches_first_fit(window_chunks):
+    token_counts = [(i * 37) % 90 + 5 for i in range(60)]
+    chapters = make_chapters(token_counts)
+    chunks = list(iter_planned_chunks(iter(chapters), 100, 5, window_chunks))
+
+    assert [data for chunk_data in chunks for data in chunk_data] == chapters
+    assert len(chunks) == count_greedy_chunks(chapters, 100, 5)
+    assert all(len(chunk_data) <= 5 for chunk_data in chunks)
+    assert all(tokens <= 100 for tokens in chunk_tokens(chunks))
+
+
+def test_first_chunk_is_sent_before_the_window_fills():
+    analyzed = []
+
+    def iter_chapters():
+        for data in make_chapters([60, 60, 60, 60]):
+            analyzed.append(data["chapter_id"])
+            yield data
+
+    first_chunk = next(iter_planned_chunks(iter_chapters(), 100, 20, 8))
+
+    assert [data["chapter_id"] for data in first_chunk] == ["chapter_0"]
+    assert analyzed == ["chapter_0", "chapter_1"]
+
+
+def test_plan_stats():
+    chunks = [make_chapters([40, 40]), make_chapters([20])]
+
+    assert get_plan_stats(chunks, 100) == (2, 0.5, 80)
+    assert get_plan_stats([], 100) == (0, 0.0, 0)
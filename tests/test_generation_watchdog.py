@@ -0,0 +1,41 @@
+from easymtl.config import LOCAL_WATCHDOG_STALL_TOKENS
+from easymtl.generation_watchdog import GenerationWatchdog
+
+
+def run_watchdog(tokens):
+    watchdog = GenerationWatchdog()
+    for token_text in tokens:
+        verdict = watchdog.check(token_text)
+        if verdict:
+            return verdict
+    return None
+
+
+def test_normal_text_passes():
+    tokens = [f"Sentence number {i} says something new. " for i in range(200)]
+
+    assert run_watchdog(tokens) is None
+
+
+def test_repeated_phrase_is_a_loop():
+    assert run_watchdog(["I am sorry. "] * 100) == "repetition"
+
+
+def test_long_repeated_paragraph_is_a_loop():
+    paragraph = "".join(f"word{i} " for i in range(40))
+
+    assert run_watchdog([paragraph] * 10) == "repetition"
+
+
+def test_blank_tokens_stall():
+    tokens = ["Text."] + ["\n"] * LOCAL_WATCHDOG_STALL_TOKENS
+
+    assert run_watchdog(tokens) == "stalled"
+
+
+def test_visible_text_resets_the_stall_count():
+    tokens = []
+    for i in range(3):
+        tokens += ["\n"] * (LOCAL_WATCHDOG_STALL_TOKENS - 1) + [f"Paragraph {i}."]
+
+    assert run_watchdog(tokens) is None
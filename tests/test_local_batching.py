@@ -0,0 +1,95 @@
+from easymtl.local_batching import (
+    is_complete_batch_output,
+    join_batch_content,
+    plan_local_units,
+    split_batch_output,
+)
+from easymtl.translator import parse_translated_text
+
+
+def make_chapter(chapter_id, text, tokens=10):
+    return {
+        "chapter_id": chapter_id,
+        "content": f"[CHAPTER_ID::{chapter_id}]\n{text}\n---\n",
+        "tokens": tokens,
+    }
+
+
+def count_words(texts):
+    return [len(text.split()) for text in texts]
+
+
+def test_complete_batch_output_is_accepted():
+    text = "[CHAPTER_ID::a]\nFirst.\n---\n[CHAPTER_ID::b]\nSecond.\n---\n"
+    batch_map = parse_translated_text(text)
+    assert is_complete_batch_output(text, batch_map, ["a", "b"])
+
+
+def test_missing_chapter_tag_is_rejected():
+    text = "[CHAPTER_ID::a]\nFirst.\n---\nSecond.\n---\n"
+    batch_map = parse_translated_text(text)
+    assert not is_complete_batch_output(text, batch_map, ["a", "b"])
+
+
+def test_separator_inside_a_chapter_is_rejected():
+    text = "[CHAPTER_ID::a]\nFirst.\n---\nStill first.\n---\n[CHAPTER_ID::b]\nSecond.\n---\n"
+    batch_map = parse_translated_text(text)
+    assert not is_complete_batch_output(text, batch_map, ["a", "b"])
+
+
+def test_empty_chapter_is_rejected():
+    text = "[CHAPTER_ID::a]\n\n---\n[CHAPTER_ID::b]\nSecond.\n---\n"
+    batch_map = parse_translated_text(text)
+    assert not is_complete_batch_output(text, batch_map, ["a", "b"])
+
+
+def test_batches_split_back_into_their_chapters():
+    chapters = [
+        make_chapter(f"chapter_{i}.xhtml", f"Chapter {i} has some words in it.")
+        for i in range(5)
+    ]
+    units = plan_local_units(chapters, {}, 20, count_words)
+
+    assert [data["chapter_id"] for unit in units for data in unit] == [
+        data["chapter_id"] for data in chapters
+    ]
+    assert any(len(unit) > 1 for unit in units)
+
+    translation_map = {}
+    for unit in units:
+        chapter_ids = [data["chapter_id"] for data in unit]
+        batch_map = split_batch_output(join_batch_content(unit), chapter_ids)
+        assert batch_map is not None
+        translation_map.update(batch_map)
+
+    assert translation_map == {
+        data["chapter_id"]: f"Chapter {i} has some words in it."
+        for i, data in enumerate(chapters)
+    }
+
+
+def test_batches_are_packed_by_the_model_token_count():
+    # The estimate says every chapter fits, but the model's tokenizer counts
+    # ten tokens each, so only two fit a batch of twenty.
+    chapters = [make_chapter(str(i), "one two three four", tokens=1) for i in range(4)]
+    units = plan_local_units(chapters, {}, 20, lambda texts: [10] * len(texts))
+
+    assert [len(unit) for unit in units] == [2, 2]
+
+
+def test_cached_chapters_are_not_batched():
+    chapters = [make_chapter(str(i), "text") for i in range(4)]
+    units = plan_local_units(chapters, {"1": "cached"}, 100, count_words)
+
+    assert [[data["chapter_id"] for data in unit] for unit in units] == [
+        ["0"],
+        ["1"],
+        ["2", "3"],
+    ]
+
+
+def test_chapters_are_not_batched_without_token_counts():
+    chapters = [make_chapter(str(i), "text") for i in range(4)]
+    units = plan_local_units(chapters, {}, 100, lambda texts: None)
+
+    assert [len(unit) for unit in units] == [1, 1, 1, 1]
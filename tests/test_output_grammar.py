@@ -0,0 +1,56 @@
+from easymtl.output_grammar import build_output_grammar, split_tagged_chapters
+
+
+def test_plain_chapter_needs_no_grammar():
+    assert build_output_grammar("Just some text.") is None
+
+
+def test_placeholders_are_required_in_order():
+    grammar = build_output_grammar(
+        "Text.\n[IMAGE_PLACEHOLDER_0]\nMore.\n[IMAGE_PLACEHOLDER_1]\n"
+    )
+
+    assert grammar.startswith(
+        "root ::= title? text placeholder-0 text placeholder-1 text\n"
+    )
+    assert 'placeholder-0 ::= "\\n[IMAGE_PLACEHOLDER_0]\\n"' in grammar
+    assert 'placeholder-1 ::= "\\n[IMAGE_PLACEHOLDER_1]\\n"' in grammar
+
+
+def test_title_line_is_required_when_the_source_has_one():
+    grammar = build_output_grammar("**Chapter One**\nText.")
+
+    assert grammar.startswith("root ::= title text\n")
+
+
+def test_split_tagged_chapters():
+    text = "[CHAPTER_ID::a]\nFirst.\n---\n[CHAPTER_ID::b]\nSecond.\n---\n"
+
+    assert split_tagged_chapters(text) == [
+        ("a", "\nFirst.\n---\n"),
+        ("b", "\nSecond.\n---\n"),
+    ]
+
+
+def test_batch_grammar_has_a_rule_per_chapter():
+    text = (
+        "[CHAPTER_ID::a]\n**One**\nFirst.\n---\n"
+        "[CHAPTER_ID::b]\nSecond.\n[IMAGE_PLACEHOLDER_0]\n---\n"
+    )
+    grammar = build_output_grammar(text)
+
+    assert grammar.startswith("root ::= chapter-0 chapter-1\n")
+    assert grammar.count('"\\n---\\n"') == 2
+    assert 'chapter-0 ::= "[CHAPTER_ID::a]\\n" title text' in grammar
+    assert (
+        'chapter-1 ::= "[CHAPTER_ID::b]\\n" title? text placeholder-0 text' in grammar
+    )
+
+
+def test_batch_text_cannot_contain_separators_or_tags():
+    text = "[CHAPTER_ID::a]\nFirst.\n---\n[CHAPTER_ID::b]\nSecond.\n---\n"
+
+    assert 'text-char ::= [^\\[-] | "[" [^IC\\[-]' in build_output_grammar(text)
+    assert "text-char ::= [^\\[] |" in build_output_grammar(
+        "Text.\n[IMAGE_PLACEHOLDER_0]\n"
+    )
@@ -0,0 +1,64 @@
+from easymtl.preprocessing import get_part_id, split_chapter_record
+
+
+def count_words(texts):
+    return [len(text.split()) for text in texts]
+
+
+def make_record(chapter_id, lines):
+    return {
+        "chapter_id": chapter_id,
+        "content": f"[CHAPTER_ID::{chapter_id}]\n" + "\n".join(lines) + "\n---\n",
+        "tokens": 1,
+        "extraction_data": (chapter_id, []),
+    }
+
+
+def get_part_text(part):
+    return part["content"].split("\n", 1)[1][: -len("\n---\n")]
+
+
+def test_short_chapter_is_not_split():
+    record = make_record("a", ["one two three", "four five"])
+
+    assert split_chapter_record(record, 10, count_tokens=count_words) == [record]
+
+
+def test_empty_chapter_is_not_split():
+    record = {"chapter_id": "a", "content": "", "tokens": 0}
+
+    assert split_chapter_record(record, 1, count_tokens=count_words) == [record]
+
+
+def test_chapter_is_split_at_paragraphs():
+    lines = ["one two three four", "five six seven", "eight nine ten eleven"]
+    parts = split_chapter_record(make_record("a", lines), 9, count_tokens=count_words)
+
+    assert [part["chapter_id"] for part in parts] == [
+        get_part_id("a", 1),
+        get_part_id("a", 2),
+    ]
+    assert all(part["parent_id"] == "a" for part in parts)
+    assert "\n".join(get_part_text(part) for part in parts) == "\n".join(lines)
+    assert all(part["tokens"] <= 9 for part in parts)
+
+
+def test_long_paragraph_is_split_at_sentence_ends():
+    line = "One two three. Four five six. Seven eight nine."
+    parts = split_chapter_record(make_record("a", [line]), 5, count_tokens=count_words)
+
+    assert len(parts) == 3
+    assert "".join(get_part_text(part) for part in parts) == line
+
+
+def test_counts_are_requested_a_list_at_a_time():
+    requests = []
+
+    def count_tokens(texts):
+        requests.append(texts)
+        return count_words(texts)
+
+    lines = ["word " * 20, "One two. Three four. " * 10, "word"]
+    split_chapter_record(make_record("a", lines), 12, count_tokens=count_tokens)
+
+    assert len(requests) == 3
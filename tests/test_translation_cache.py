@@ -0,0 +1,65 @@
+import pytest
+
+from easymtl import translation_cache
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(translation_cache, "get_app_data_dir", lambda: str(tmp_path))
+    monkeypatch.setattr(translation_cache, "_CACHE_CONNECTION", None)
+    yield
+    if translation_cache._CACHE_CONNECTION is not None:
+        translation_cache._CACHE_CONNECTION.close()
+
+
+def test_stored_translation_is_returned():
+    translation_cache.store_translation("Text.", "model", "Translated.")
+
+    assert translation_cache.get_cached_translation("Text.", "model") == "Translated."
+    assert translation_cache.get_cached_translation("Text.", "other") is None
+    assert translation_cache.get_cached_translation("Other.", "model") is None
+
+
+def test_cache_key_depends_on_text_and_model():
+    key = translation_cache.make_cache_key("Text.", "model")
+
+    assert key == translation_cache.make_cache_key("Text.", "model")
+    assert key != translation_cache.make_cache_key("Text!", "model")
+    assert key != translation_cache.make_cache_key("Text.", "other")
+
+
+def test_server_models_are_keyed_by_server(monkeypatch):
+    monkeypatch.setenv("OPENAI_BASE_URL", "http://one:8080/v1")
+    key = translation_cache.make_cache_key("Text.", "openai:model")
+    monkeypatch.setenv("OPENAI_BASE_URL", "http://two:8080/v1")
+
+    assert key != translation_cache.make_cache_key("Text.", "openai:model")
+
+
+def test_chapter_tag_is_not_part_of_the_text():
+    assert translation_cache.get_chapter_text("[CHAPTER_ID::a]\nText.") == "Text."
+    assert translation_cache.get_chapter_text("Text.") == "Text."
+
+
+def test_least_recently_used_entries_are_evicted(monkeypatch):
+    monkeypatch.setattr(translation_cache, "TRANSLATION_CACHE_MAX_BYTES", 20)
+    clock = iter(range(100))
+    monkeypatch.setattr(translation_cache.time, "time", lambda: next(clock))
+
+    translation_cache.store_translation("first", "model", "a" * 8)
+    translation_cache.store_translation("second", "model", "b" * 8)
+    assert translation_cache.get_cached_translation("first", "model") == "a" * 8
+    translation_cache.store_translation("third", "model", "c" * 8)
+
+    assert translation_cache.get_cached_translation("second", "model") is None
+    assert translation_cache.get_cached_translation("first", "model") == "a" * 8
+    assert translation_cache.get_cached_translation("third", "model") == "c" * 8
+
+
+def test_hits_and_misses_are_counted():
+    translation_cache.reset_cache_stats()
+    translation_cache.store_translation("Text.", "model", "Translated.")
+    translation_cache.get_cached_translation("Text.", "model")
+    translation_cache.get_cached_translation("Other.", "model")
+
+    assert translation_cache.get_cache_stats() == {"hits": 1, "misses": 1}